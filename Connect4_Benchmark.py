@@ -0,0 +1,255 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+from Connect4_Logica import TAMANHO_BORDA, BordaBitboard, LogicaJogo, MoedaLogica
+from Connect4_Main import Borda, JogadorQLearningPlayer, TreinoSemInterface
+
+TIPOS_BORDA = {
+    "linhas": lambda numero_linhas, numero_colunas: Borda(numero_linhas, numero_colunas, sem_interface=True),
+    "grafo": lambda numero_linhas, numero_colunas: Borda(numero_linhas, numero_colunas, sem_interface=True,
+                                                         deteccao_grafo=True),
+    "bitboard": BordaBitboard,
+}
+
+
+def sequencias_aleatorias(numero_linhas, numero_colunas, partidas, semente,
+                          sequencia_vitoria=LogicaJogo.SEQUENCIA_VITORIA_LENGTH):
+    """Gera as colunas de partidas aleatórias completas, para que todos os tipos de borda joguem as mesmas jogadas"""
+    gerador = random.Random(semente)
+    sequencias = []
+    for _ in range(partidas):
+        borda = BordaBitboard(numero_linhas, numero_colunas)
+        logica_jogo = LogicaJogo(borda, sequencia_vitoria)
+        tipo_moeda = 1
+        colunas = []
+        while True:
+            coluna = gerador.choice(borda.get_acoes_disponiveis())
+            borda.insere_na_coluna(coluna, tipo_moeda)
+            colunas.append(coluna)
+            if borda.ultima_jogada_venceu(logica_jogo) or borda.checa_borda_preenchida():
+                break
+            tipo_moeda = 3 - tipo_moeda
+        sequencias.append(colunas)
+    return sequencias
+
+
+def bench_insere_moeda(numero_linhas, numero_colunas, tipo_borda, partidas, semente,
+                       sequencia_vitoria=LogicaJogo.SEQUENCIA_VITORIA_LENGTH):
+    """Latência de insere_moeda, que inclui LogicaJogo.checa_fim_de_jogo"""
+    sequencias = sequencias_aleatorias(numero_linhas, numero_colunas, partidas, semente, sequencia_vitoria)
+    tempo = 0.0
+    chamadas = 0
+    for colunas in sequencias:
+        borda = TIPOS_BORDA[tipo_borda](numero_linhas, numero_colunas)
+        logica_jogo = LogicaJogo(borda, sequencia_vitoria)
+        moedas = []
+        for (i, coluna) in enumerate(colunas):
+            moeda = MoedaLogica(1 + i % 2)
+            moeda.set_coluna(coluna)
+            moedas.append(moeda)
+        inicio = time.perf_counter()
+        for moeda in moedas:
+            borda.insere_moeda(moeda, None, logica_jogo)
+        tempo += time.perf_counter() - inicio
+        chamadas += len(moedas)
+    return {'chamadas': chamadas, 'us_por_chamada': 1e6 * tempo / chamadas}
+
+
+def bench_consultas_borda(numero_linhas, numero_colunas, tipo_borda, partidas, semente):
+    """Custo de get_acoes_disponiveis, get_estado e get_chave em cada posição de partidas aleatórias"""
+    sequencias = sequencias_aleatorias(numero_linhas, numero_colunas, partidas, semente)
+    tempos = {'get_acoes_disponiveis': 0.0, 'get_estado': 0.0, 'get_chave': 0.0}
+    chamadas = 0
+    for colunas in sequencias:
+        borda = TIPOS_BORDA[tipo_borda](numero_linhas, numero_colunas)
+        logica_jogo = LogicaJogo(borda)
+        for (i, coluna) in enumerate(colunas):
+            moeda = MoedaLogica(1 + i % 2)
+            moeda.set_coluna(coluna)
+            borda.insere_moeda(moeda, None, logica_jogo)
+            for nome in tempos:
+                metodo = getattr(borda, nome)
+                inicio = time.perf_counter()
+                metodo()
+                tempos[nome] += time.perf_counter() - inicio
+            chamadas += 1
+    resultado = {'chamadas': chamadas}
+    for (nome, tempo) in tempos.items():
+        resultado['us_por_chamada_' + nome] = 1e6 * tempo / chamadas
+    return resultado
+
+
+def bench_qlearner(numero_linhas, numero_colunas, tipo_borda, partidas, semente, **opcoes_jogador):
+    """Tempo por chamada de escolher_acao e aprender em partidas Q contra Q, incluindo a leitura do estado"""
+    random.seed(semente)
+    treino = TreinoSemInterface(tipo_borda=tipo_borda, numero_linhas=numero_linhas, numero_colunas=numero_colunas,
+                                **opcoes_jogador)
+    tempos = {'escolher_acao': 0.0, 'aprender': 0.0}
+    chamadas = 0
+    for _ in range(partidas):
+        treino.inicializa_variaveis()
+        borda = treino.borda_do_jogo
+        tipo_atual = random.randint(1, 2)
+        fim_de_jogo = False
+        while not fim_de_jogo:
+            jogador = (treino.p1 if treino.p1.get_tipo_moeda() == tipo_atual else treino.p2).jogador
+            acoes = borda.get_acoes_disponiveis()
+            inicio = time.perf_counter()
+            acao = jogador.escolher_acao(jogador.le_estado(borda), acoes)
+            tempos['escolher_acao'] += time.perf_counter() - inicio
+            moeda = MoedaLogica(tipo_atual)
+            moeda.set_coluna(acao)
+            fim_de_jogo = borda.insere_moeda(moeda, None, treino.logica_jogo)
+            inicio = time.perf_counter()
+            jogador.aprender(borda, acoes, acao, fim_de_jogo, treino.logica_jogo)
+            tempos['aprender'] += time.perf_counter() - inicio
+            chamadas += 1
+            tipo_atual = 3 - tipo_atual
+        treino.p1.fim_de_partida(treino.logica_jogo)
+        treino.p2.fim_de_partida(treino.logica_jogo)
+    resultado = {'chamadas': chamadas}
+    for (nome, tempo) in tempos.items():
+        resultado['us_por_chamada_' + nome] = 1e6 * tempo / chamadas
+    return resultado
+
+
+def bench_partidas(numero_linhas, numero_colunas, tipo_borda, partidas, semente, tipo_jogador, **opcoes_jogador):
+    """Partidas por segundo do treino sem interface"""
+    random.seed(semente)
+    treino = TreinoSemInterface(tipo_jogador, tipo_jogador, tipo_borda=tipo_borda, numero_linhas=numero_linhas,
+                                numero_colunas=numero_colunas, **opcoes_jogador)
+    inicio = time.perf_counter()
+    treino.treinar(partidas)
+    tempo = time.perf_counter() - inicio
+    return {'partidas': partidas, 'partidas_por_segundo': partidas / tempo}
+
+
+def bench_memoria_tabela_q(numero_linhas, numero_colunas, tipo_borda, partidas, semente, **opcoes_jogador):
+    """Estados e bytes da tabela Q compacta a cada 1000 partidas Q contra Q"""
+    random.seed(semente)
+    treino = TreinoSemInterface(tipo_borda=tipo_borda, numero_linhas=numero_linhas, numero_colunas=numero_colunas,
+                                tabela_compacta=True, **opcoes_jogador)
+    treino.treinar(partidas)
+    tabela_q = treino.p1.jogador.q
+    return {'partidas': partidas, 'estados_por_1k_partidas': 1000.0 * len(tabela_q) / partidas,
+            'bytes_por_1k_partidas': 1000.0 * tabela_q.bytes_usados() / partidas}
+
+
+def melhor_resultado(resultados):
+    """Junta as repetições de uma medida ficando com o melhor valor de cada uma (menor tempo, maior taxa)"""
+    melhor = dict(resultados[0])
+    for resultado in resultados[1:]:
+        for (medida, valor) in resultado.items():
+            if isinstance(valor, float):
+                melhor[medida] = max(melhor[medida], valor) if medida.endswith('por_segundo') else \
+                    min(melhor[medida], valor)
+    return melhor
+
+
+def executa(tamanhos, escala, semente, repeticoes, tamanhos_escalabilidade=(),
+            sequencia_vitoria=LogicaJogo.SEQUENCIA_VITORIA_LENGTH):
+    """Roda as medidas de tamanhos e, para tamanhos_escalabilidade, apenas a de insere_moeda (detecção de vitória)"""
+    resultados = []
+
+    def registra(nome, tamanho, tipo_borda, funcao, *args, **kwargs):
+        repeticoes_medida = []
+        for _ in range(repeticoes):
+            random.seed(semente)
+            repeticoes_medida.append(funcao(tamanho[0], tamanho[1], tipo_borda, *args, **kwargs))
+        resultado = melhor_resultado(repeticoes_medida)
+        resultado.update({'nome': nome, 'borda': "%dx%d" % tamanho, 'tipo_borda': tipo_borda})
+        resultados.append(resultado)
+        print(json.dumps(resultado), file=sys.stderr)
+
+    for tamanho in tamanhos:
+        for tipo_borda in TIPOS_BORDA:
+            registra('insere_moeda', tamanho, tipo_borda, bench_insere_moeda, 200 * escala, semente)
+            registra('consultas_borda', tamanho, tipo_borda, bench_consultas_borda, 100 * escala, semente)
+            registra('qlearner_tupla', tamanho, tipo_borda, bench_qlearner, 100 * escala, semente)
+            registra('qlearner_zobrist', tamanho, tipo_borda, bench_qlearner, 100 * escala, semente,
+                     chave_zobrist=True, tabela_compacta=True)
+            registra('partidas_random', tamanho, tipo_borda, bench_partidas, 200 * escala, semente, "random")
+            registra('partidas_qlearner', tamanho, tipo_borda, bench_partidas, 200 * escala, semente, "qlearner",
+                     chave_zobrist=True)
+        registra('memoria_tabela_q_tupla', tamanho, "bitboard", bench_memoria_tabela_q, 1000 * escala, semente)
+        registra('memoria_tabela_q_zobrist', tamanho, "bitboard", bench_memoria_tabela_q, 1000 * escala, semente,
+                 chave_zobrist=True)
+
+    for tamanho in tamanhos_escalabilidade:
+        for tipo_borda in TIPOS_BORDA:
+            registra('escalabilidade_insere_moeda_%d' % sequencia_vitoria, tamanho, tipo_borda, bench_insere_moeda,
+                     20 * escala, semente, sequencia_vitoria)
+
+    return {
+        'versao': 1,
+        'semente': semente,
+        'escala': escala,
+        'repeticoes': repeticoes,
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'resultados': resultados,
+    }
+
+
+def compara(atual, anterior, tolerancia):
+    """Imprime a razão entre as medidas das duas execuções e retorna as que pioraram mais que a tolerância"""
+    anteriores = {(r['nome'], r['borda'], r['tipo_borda']): r for r in anterior['resultados']}
+    regressoes = []
+    for resultado in atual['resultados']:
+        base = anteriores.get((resultado['nome'], resultado['borda'], resultado['tipo_borda']))
+        if base is None:
+            continue
+        for (medida, valor) in resultado.items():
+            if not isinstance(valor, float) or not base.get(medida):
+                continue
+            razao = valor / base[medida]
+            # para tempos e memória menor é melhor, para taxas (por segundo) maior é melhor
+            piorou = razao < 1 - tolerancia if medida.endswith('por_segundo') else razao > 1 + tolerancia
+            print("%-26s %-6s %-9s %-40s %8.3f%s" % (resultado['nome'], resultado['borda'], resultado['tipo_borda'],
+                                                      medida, razao, "  REGRESSAO" if piorou else ""))
+            if piorou:
+                regressoes.append((resultado['nome'], resultado['borda'], resultado['tipo_borda'], medida, razao))
+    return regressoes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tamanhos', default="%dx%d,6x7,8x9" % TAMANHO_BORDA, action="store",
+                        help="Tamanhos de borda (linhas x colunas) separados por vírgula")
+    parser.add_argument('--escalabilidade', default="", action="store",
+                        help="Tamanhos de borda, separados por vírgula, em que só a detecção de vitória é medida")
+    parser.add_argument('--sequencia-vitoria', default=LogicaJogo.SEQUENCIA_VITORIA_LENGTH, type=int, action="store",
+                        help="Moedas seguidas para vencer nas medidas de escalabilidade")
+    parser.add_argument('--escala', default=1, type=int, action="store",
+                        help="Multiplica o número de partidas de cada medida")
+    parser.add_argument('--repeticoes', default=3, type=int, action="store",
+                        help="Quantas vezes cada medida é repetida; fica o melhor valor")
+    parser.add_argument('--semente', default=1234, type=int, action="store",
+                        help="Semente usada por todas as medidas")
+    parser.add_argument('--saida', default=None, action="store",
+                        help="Arquivo JSON com os resultados; sem ele o JSON é impresso na saída padrão")
+    parser.add_argument('--comparar', default=None, action="store",
+                        help="JSON de uma execução anterior a ser comparado com esta")
+    parser.add_argument('--tolerancia', default=0.10, type=float, action="store",
+                        help="Piora relativa a partir da qual uma medida é considerada uma regressão")
+    args = parser.parse_args()
+
+    tamanhos = [tuple(int(x) for x in tamanho.split('x')) for tamanho in args.tamanhos.split(',') if tamanho]
+    tamanhos_escalabilidade = [tuple(int(x) for x in tamanho.split('x'))
+                               for tamanho in args.escalabilidade.split(',') if tamanho]
+    resultado = executa(tamanhos, args.escala, args.semente, args.repeticoes, tamanhos_escalabilidade,
+                        args.sequencia_vitoria)
+    if args.saida:
+        with open(args.saida, 'w') as arquivo:
+            json.dump(resultado, arquivo, indent=2)
+    else:
+        print(json.dumps(resultado, indent=2))
+
+    if args.comparar:
+        with open(args.comparar) as arquivo:
+            regressoes = compara(resultado, json.load(arquivo), args.tolerancia)
+        sys.exit(1 if regressoes else 0)
@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from Connect4_Servidor import PORTA_PADRAO
+
+
+async def pede(leitor, escritor, pedido):
+    escritor.write(json.dumps(pedido).encode() + b'\n')
+    await escritor.drain()
+    resposta = json.loads(await leitor.readline())
+    if 'erro' in resposta:
+        raise ValueError(resposta['erro'])
+    return resposta
+
+
+async def cliente_carga(host, porta, partidas_por_conexao, sessoes_simultaneas, gerador, latencias):
+    """Uma conexão que joga partidas_por_conexao partidas, sessoes_simultaneas delas intercaladas ao mesmo tempo,
+    com jogadas aleatórias; a latência de cada pedido jogar é guardada em latencias"""
+    (leitor, escritor) = await asyncio.open_connection(host, porta, limit=1 << 16)
+    restantes = partidas_por_conexao
+    abertas = []
+    try:
+        while restantes > 0 or abertas:
+            while restantes > 0 and len(abertas) < sessoes_simultaneas:
+                resposta = await pede(leitor, escritor, {'comando': 'nova_partida',
+                                                         'cliente_comeca': gerador.random() < 0.5})
+                restantes -= 1
+                if not resposta['fim']:
+                    abertas.append(resposta)
+            sessoes = abertas
+            abertas = []
+            for resposta in sessoes:
+                colunas = [j for (j, valor) in enumerate(resposta['estado'][0]) if valor == 0]
+                inicio = time.perf_counter()
+                resposta = await pede(leitor, escritor, {'comando': 'jogar', 'sessao': resposta['sessao'],
+                                                         'coluna': gerador.choice(colunas)})
+                latencias.append(time.perf_counter() - inicio)
+                if not resposta['fim']:
+                    abertas.append(resposta)
+    finally:
+        escritor.close()
+
+
+def percentis(latencias):
+    amostras = sorted(latencias)
+    if not amostras:
+        return {}
+    return {nome: 1000.0 * amostras[min(len(amostras) - 1, int(p * len(amostras)))]
+            for (nome, p) in (('p50', 0.50), ('p90', 0.90), ('p99', 0.99), ('max', 1.0))}
+
+
+async def carga(host, porta, conexoes, partidas_por_conexao, sessoes_simultaneas, semente):
+    latencias = []
+    inicio = time.perf_counter()
+    await asyncio.gather(*[cliente_carga(host, porta, partidas_por_conexao, sessoes_simultaneas,
+                                         random.Random(semente + i), latencias) for i in range(conexoes)])
+    tempo = time.perf_counter() - inicio
+    (leitor, escritor) = await asyncio.open_connection(host, porta)
+    estatisticas_servidor = await pede(leitor, escritor, {'comando': 'estatisticas'})
+    escritor.close()
+    partidas = conexoes * partidas_por_conexao
+    return {
+        'conexoes': conexoes,
+        'sessoes_simultaneas': conexoes * sessoes_simultaneas,
+        'partidas': partidas,
+        'jogadas': len(latencias),
+        'tempo': tempo,
+        'sessoes_por_segundo': partidas / tempo if tempo > 0 else 0.0,
+        'jogadas_por_segundo': len(latencias) / tempo if tempo > 0 else 0.0,
+        'latencia_cliente_ms': percentis(latencias),
+        'servidor': estatisticas_servidor,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1', action="store")
+    parser.add_argument('--porta', default=PORTA_PADRAO, type=int, action="store")
+    parser.add_argument('--conexoes', default=50, type=int, action="store",
+                        help="Número de conexões abertas ao mesmo tempo")
+    parser.add_argument('--sessoes-por-conexao', default=20, type=int, action="store",
+                        help="Partidas intercaladas ao mesmo tempo em cada conexão")
+    parser.add_argument('--partidas', default=100, type=int, action="store",
+                        help="Partidas jogadas por conexão")
+    parser.add_argument('--semente', default=0, type=int, action="store")
+    parser.add_argument('--saida', default=None, action="store",
+                        help="Arquivo JSON com o resultado do teste de carga")
+    args = parser.parse_args()
+
+    resultado = asyncio.run(carga(args.host, args.porta, args.conexoes, args.partidas, args.sessoes_por_conexao,
+                                  args.semente))
+    print("%d partidas (%d sessões simultâneas) em %.2f s | %.1f sessões/s | %.1f jogadas/s"
+          % (resultado['partidas'], resultado['sessoes_simultaneas'], resultado['tempo'],
+             resultado['sessoes_por_segundo'], resultado['jogadas_por_segundo']))
+    for (origem, latencia) in (('cliente', resultado['latencia_cliente_ms']),
+                               ('servidor', resultado['servidor']['latencia_ms'])):
+        print("latência %-8s p50 %.3f ms | p90 %.3f ms | p99 %.3f ms | max %.3f ms"
+              % (origem, latencia['p50'], latencia['p90'], latencia['p99'], latencia['max']))
+    if args.saida:
+        with open(args.saida, 'w') as arquivo:
+            json.dump(resultado, arquivo, indent=2)
@@ -0,0 +1,83 @@
+import os
+import pickle
+import threading
+
+
+class CheckpointTreino(object):
+    """Grava o estado de um treino a cada intervalo partidas, sem parar o treino"""
+    VERSAO = 1
+
+    def __init__(self, caminho, intervalo=1000):
+        self.caminho = caminho
+        self.intervalo = intervalo
+        self.processo = None
+        self.thread = None
+        self.gravados = 0
+        self.falhas = 0
+
+    def devido(self, partidas_jogadas):
+        return self.intervalo > 0 and partidas_jogadas % self.intervalo == 0
+
+    def grava(self, estado):
+        self.espera()
+        estado = dict(estado, versao=CheckpointTreino.VERSAO)
+        if hasattr(os, 'fork'):
+            pid = os.fork()
+            if pid == 0:
+                codigo = 1
+                try:
+                    self.escreve(estado)
+                    codigo = 0
+                finally:
+                    # sem os._exit o filho executaria o resto do treino e esvaziaria os buffers do pai
+                    os._exit(codigo)
+            self.processo = pid
+        else:
+            self.thread = threading.Thread(target=self.escreve,
+                                           args=(pickle.dumps(estado, pickle.HIGHEST_PROTOCOL),))
+            self.thread.start()
+
+    def escreve(self, conteudo):
+        """conteudo é o estado ou os seus bytes já serializados"""
+        temporario = '%s.%d.tmp' % (self.caminho, os.getpid())
+        with open(temporario, 'wb') as arquivo:
+            if isinstance(conteudo, bytes):
+                arquivo.write(conteudo)
+            else:
+                pickle.dump(conteudo, arquivo, pickle.HIGHEST_PROTOCOL)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, self.caminho)
+
+    def espera(self):
+        """Espera a gravação em andamento, se houver, terminar"""
+        if self.processo is not None:
+            (_, status) = os.waitpid(self.processo, 0)
+            self.processo = None
+            if status == 0:
+                self.gravados += 1
+            else:
+                self.falhas += 1
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+            self.gravados += 1
+
+    class Leitor(pickle.Unpickler):
+        """Lê as classes gravadas pelo Connect4_Main rodando como script do módulo Connect4_Main"""
+
+        def find_class(self, modulo, nome):
+            if modulo == '__main__':
+                modulo = 'Connect4_Main'
+            return super().find_class(modulo, nome)
+
+    @staticmethod
+    def carrega(caminho):
+        with open(caminho, 'rb') as arquivo:
+            try:
+                estado = CheckpointTreino.Leitor(arquivo).load()
+            except (pickle.UnpicklingError, EOFError):
+                raise ValueError('Checkpoint inválido: %s' % caminho)
+        if not isinstance(estado, dict) or estado.get('versao') != CheckpointTreino.VERSAO:
+            raise ValueError('Checkpoint de versão desconhecida: %s' % caminho)
+        return estado
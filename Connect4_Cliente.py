@@ -0,0 +1,66 @@
+import argparse
+import json
+import socket
+
+from Connect4_Servidor import PORTA_PADRAO
+
+SIMBOLOS = {0: '.', 1: 'O', 2: 'X'}
+
+
+class ClienteConnect4(object):
+    """Cliente síncrono do protocolo de Connect4_Servidor: uma mensagem JSON por linha"""
+
+    def __init__(self, host='127.0.0.1', porta=PORTA_PADRAO):
+        self.conexao = socket.create_connection((host, porta))
+        self.arquivo = self.conexao.makefile('rwb')
+
+    def pede(self, **pedido):
+        self.arquivo.write(json.dumps(pedido).encode() + b'\n')
+        self.arquivo.flush()
+        resposta = json.loads(self.arquivo.readline())
+        if 'erro' in resposta:
+            raise ValueError(resposta['erro'])
+        return resposta
+
+    def fechar(self):
+        self.arquivo.close()
+        self.conexao.close()
+
+
+def desenha_estado(estado):
+    print(" ".join(str(j) for j in range(len(estado[0]))))
+    for linha in estado:
+        print(" ".join(SIMBOLOS[valor] for valor in linha))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1', action="store")
+    parser.add_argument('--porta', default=PORTA_PADRAO, type=int, action="store")
+    parser.add_argument('--pc-comeca', action="store_true", help="O computador faz a primeira jogada")
+    args = parser.parse_args()
+
+    cliente = ClienteConnect4(args.host, args.porta)
+    resposta = cliente.pede(comando='nova_partida', cliente_comeca=not args.pc_comeca)
+    print("você joga com %s" % SIMBOLOS[resposta['moeda']])
+    moeda = resposta['moeda']
+    while not resposta['fim']:
+        desenha_estado(resposta['estado'])
+        try:
+            coluna = int(input("coluna: "))
+            resposta = cliente.pede(comando='jogar', sessao=resposta['sessao'], coluna=coluna)
+        except ValueError as e:
+            print(e)
+            continue
+        except EOFError:
+            break
+        if 'coluna_pc' in resposta:
+            print("computador jogou na coluna %d" % resposta['coluna_pc'])
+    desenha_estado(resposta['estado'])
+    if not resposta['fim']:
+        cliente.pede(comando='encerrar', sessao=resposta['sessao'])
+    elif resposta['ganhador'] == 0:
+        print("Houve um Empate!")
+    else:
+        print("Você ganhou!" if resposta['ganhador'] == moeda else "O computador ganhou!")
+    cliente.fechar()
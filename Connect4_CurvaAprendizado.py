@@ -0,0 +1,103 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from Connect4_Logica import TAMANHO_BORDA, LogicaJogo
+from Connect4_Main import TreinoSemInterface
+from Connect4_Torneio import le_agente, torneio
+
+
+def taxa_contra(relatorio):
+    """Pontos do primeiro agente do torneio no desafio contra o segundo: vitória vale 1 e empate meio"""
+    par = relatorio['pares'][0]
+    total = par['vitorias_a'] + par['empates'] + par['vitorias_b']
+    return (par['vitorias_a'] + 0.5 * par['empates']) / total
+
+
+def curva(opcoes, pontos, adversario_treino, adversario_avaliacao, partidas_avaliacao, semente, processos,
+          numero_linhas, numero_colunas, sequencia_vitoria):
+    """Treina um qlearner com as opcoes e, ao chegar a cada número de partidas em pontos, joga o jogador 1 do
+    treino, sem explorar, contra o adversario_avaliacao com Connect4_Torneio; retorna [(partidas, taxa)]"""
+    random.seed(semente)
+    treino = TreinoSemInterface(tipo_jogador_p2=adversario_treino, tipo_borda="bitboard", numero_linhas=numero_linhas,
+                                numero_colunas=numero_colunas, sequencia_vitoria=sequencia_vitoria,
+                                chave_zobrist=True, **opcoes)
+    (descritor, caminho) = tempfile.mkstemp(suffix='.c4qt')
+    os.close(descritor)
+    resultado = []
+    try:
+        for partidas in pontos:
+            treino.treinar(partidas - treino.partidas_jogadas)
+            treino.p1.jogador.salvar_tabela(caminho)
+            opcoes_agente = {'tabela': caminho, 'valor_inicial_q': treino.p1.jogador.valor_inicial_q}
+            (nome, tipo, opcoes_adversario) = adversario_avaliacao
+            relatorio = torneio([("aprendiz", "qlearner", opcoes_agente), (nome, tipo, opcoes_adversario)],
+                                "desafio", partidas_avaliacao, processos, semente, numero_linhas, numero_colunas,
+                                sequencia_vitoria)
+            resultado.append((partidas, taxa_contra(relatorio)))
+    finally:
+        os.remove(caminho)
+    return resultado
+
+
+def partidas_ate_alvo(pontos_medios, alvo):
+    for (partidas, taxa) in pontos_medios:
+        if taxa >= alvo:
+            return partidas
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara quantas partidas de treino cada configuração do qlearner "
+                                                 "precisa para chegar a uma taxa de pontos contra um adversário")
+    parser.add_argument('configuracoes', nargs='+', action="store",
+                        help="Configurações no formato nome=opcao=valor,... com argumentos de "
+                             "JogadorQLearningPlayer; por exemplo um_passo= e traco=lambda_td=0.9")
+    parser.add_argument('--pontos', default="1000,2000,3000,4000,5000,10000,15000,20000", action="store",
+                        help="Números de partidas de treino em que o jogador é avaliado")
+    parser.add_argument('--alvo', default=0.8, type=float, action="store",
+                        help="Taxa de pontos contra o adversário da avaliação que as configurações devem alcançar")
+    parser.add_argument('--adversario-treino', default="qlearner", choices=["qlearner", "random", "solver", "mcts"],
+                        action="store", help="Segundo jogador do treino")
+    parser.add_argument('--adversario', default="random", action="store",
+                        help="Agente da avaliação, no formato de Connect4_Torneio")
+    parser.add_argument('--partidas-avaliacao', default=600, type=int, action="store",
+                        help="Partidas de cada avaliação, alternando quem começa")
+    parser.add_argument('--repeticoes', default=3, type=int, action="store",
+                        help="Treinos de cada configuração, com sementes consecutivas; a curva é a média deles")
+    parser.add_argument('--processos', default=1, type=int, action="store",
+                        help="Processos que jogam as partidas de cada avaliação")
+    parser.add_argument('--semente', default=1, type=int, action="store")
+    parser.add_argument('--linhas', default=TAMANHO_BORDA[0], type=int, action="store",
+                        help="Número de linhas da borda")
+    parser.add_argument('--colunas', default=TAMANHO_BORDA[1], type=int, action="store",
+                        help="Número de colunas da borda")
+    parser.add_argument('--sequencia-vitoria', default=LogicaJogo.SEQUENCIA_VITORIA_LENGTH, type=int, action="store",
+                        help="Número de moedas seguidas necessárias para vencer")
+    parser.add_argument('--saida', default=None, action="store",
+                        help="Arquivo JSON com as curvas")
+    args = parser.parse_args()
+
+    pontos = [int(p) for p in args.pontos.split(',')]
+    adversario = le_agente(args.adversario)
+    relatorio = {'alvo': args.alvo, 'adversario': args.adversario, 'configuracoes': []}
+    for especificacao in args.configuracoes:
+        (nome, _, texto_opcoes) = especificacao.partition('=')
+        (_, _, opcoes) = le_agente("qlearner:" + texto_opcoes)
+        inicio = time.perf_counter()
+        curvas = [curva(opcoes, pontos, args.adversario_treino, adversario, args.partidas_avaliacao,
+                        args.semente + repeticao, args.processos, args.linhas, args.colunas, args.sequencia_vitoria)
+                  for repeticao in range(args.repeticoes)]
+        medias = [(partidas, sum(c[i][1] for c in curvas) / len(curvas)) for (i, partidas) in enumerate(pontos)]
+        alcancado = partidas_ate_alvo(medias, args.alvo)
+        relatorio['configuracoes'].append({'nome': nome, 'opcoes': opcoes, 'curvas': curvas, 'media': medias,
+                                           'partidas_ate_alvo': alcancado,
+                                           'tempo': time.perf_counter() - inicio})
+        print("%-16s %s | alvo %.2f: %s" % (nome, " ".join("%d:%.2f" % ponto for ponto in medias), args.alvo,
+                                             "%d partidas" % alcancado if alcancado else "não alcançado"))
+    if args.saida:
+        with open(args.saida, 'w') as arquivo:
+            json.dump(relatorio, arquivo, indent=2)
@@ -0,0 +1,147 @@
+import json
+import time
+
+from Connect4_Logica import BordaBitboard, LogicaJogo
+from Connect4_Main import Borda, JogadorPC, JogadorQLearningPlayer, TreinoSemInterface, VisaoJogo
+
+
+class Instrumentacao(object):
+    """Temporizadores e contadores por fase do laço do jogo, ligados apenas sob demanda"""
+    FASES = (
+        (JogadorPC, 'movimento_completo'),
+        (Borda, 'insere_moeda'),
+        (BordaBitboard, 'insere_moeda'),
+        (Borda, 'atualizar_espaco_rastreado'),
+        (Borda, 'get_estado'),
+        (LogicaJogo, 'pesquisa_ganhador'),
+        (LogicaJogo, 'checa_linhas'),
+        (VisaoJogo, 'desenha_quadro'),
+    )
+    # métodos chamados no início de cada partida, usados para contar as partidas e achar os jogadores
+    INICIO_PARTIDA = (TreinoSemInterface, VisaoJogo)
+
+    ativa = None
+
+    def __init__(self, arquivo=None, intervalo=0):
+        self.arquivo = arquivo
+        self.intervalo = intervalo
+        self.fases = {}
+        self.cache_q = [0, 0]  # [acertos, faltas] das consultas de getQ
+        self.crescimento_q = []  # [(partidas, [tamanho da tabela Q de cada jogador])]
+        self.jogadores = []
+        self.partidas = 0
+        self.originais = []
+        self.inicio = None
+
+    def ativar(self):
+        if Instrumentacao.ativa is not None:
+            raise RuntimeError('Já existe uma instrumentação ativa')
+        Instrumentacao.ativa = self
+        self.inicio = time.perf_counter()
+        for (classe, nome_metodo) in Instrumentacao.FASES:
+            self.substitui(classe, nome_metodo, self.mede(classe.__name__ + '.' + nome_metodo,
+                                                          classe.__dict__[nome_metodo]))
+        self.substitui(JogadorQLearningPlayer, 'getQ', self.mede_getQ(JogadorQLearningPlayer.__dict__['getQ']))
+        for classe in Instrumentacao.INICIO_PARTIDA:
+            self.substitui(classe, 'inicializa_variaveis', self.conta_partida(classe.__dict__['inicializa_variaveis']))
+        return self
+
+    def desativar(self):
+        for (classe, nome_metodo, original) in reversed(self.originais):
+            setattr(classe, nome_metodo, original)
+        self.originais = []
+        Instrumentacao.ativa = None
+
+    def __enter__(self):
+        return self.ativar()
+
+    def __exit__(self, tipo, valor, traceback):
+        self.desativar()
+
+    def substitui(self, classe, nome_metodo, metodo):
+        self.originais.append((classe, nome_metodo, classe.__dict__[nome_metodo]))
+        setattr(classe, nome_metodo, metodo)
+
+    def mede(self, nome, metodo):
+        fase = self.fases.setdefault(nome, [0, 0.0])
+        relogio = time.perf_counter
+
+        def medido(*args, **kwargs):
+            inicio = relogio()
+            try:
+                return metodo(*args, **kwargs)
+            finally:
+                fase[0] += 1
+                fase[1] += relogio() - inicio
+        return medido
+
+    def mede_getQ(self, metodo):
+        fase = self.fases.setdefault('JogadorQLearningPlayer.getQ', [0, 0.0])
+        cache_q = self.cache_q
+        relogio = time.perf_counter
+
+        def getQ(jogador, estado, acao):
+            # a consulta extra à tabela fica fora do tempo medido
+            cache_q[0 if (estado, acao) in jogador.q else 1] += 1
+            inicio = relogio()
+            valor = metodo(jogador, estado, acao)
+            fase[0] += 1
+            fase[1] += relogio() - inicio
+            return valor
+        return getQ
+
+    def conta_partida(self, metodo):
+        def inicializa_variaveis(objeto, *args, **kwargs):
+            # todas as partidas iniciadas antes desta já terminaram
+            if self.intervalo and self.partidas and self.partidas % self.intervalo == 0:
+                self.grava()
+            self.partidas += 1
+            resultado = metodo(objeto, *args, **kwargs)
+            self.jogadores = [jogador_pc.jogador for jogador_pc in (objeto.p1, objeto.p2)
+                              if isinstance(jogador_pc, JogadorPC)]
+            return resultado
+        return inicializa_variaveis
+
+    def instantaneo(self):
+        """Retorna um dicionário com os contadores acumulados até agora"""
+        tamanhos_q = [len(jogador.q) for jogador in self.jogadores if isinstance(jogador, JogadorQLearningPlayer)]
+        if not self.crescimento_q or self.crescimento_q[-1][0] != self.partidas:
+            self.crescimento_q.append((self.partidas, tamanhos_q))
+        fases = {}
+        for (nome, (chamadas, tempo)) in self.fases.items():
+            if chamadas:
+                fases[nome] = {'chamadas': chamadas, 'tempo_total': tempo, 'us_por_chamada': 1e6 * tempo / chamadas}
+        consultas_q = self.cache_q[0] + self.cache_q[1]
+        return {
+            'tempo': time.perf_counter() - self.inicio,
+            'partidas': self.partidas,
+            'fases': fases,
+            'tabela_q': {
+                'estados': tamanhos_q,
+                'acertos': self.cache_q[0],
+                'faltas': self.cache_q[1],
+                'taxa_acerto': self.cache_q[0] / consultas_q if consultas_q else 0.0,
+                'crescimento': self.crescimento_q,
+            },
+            'jogadores': [jogador.estatisticas() for jogador in self.jogadores if hasattr(jogador, 'estatisticas')],
+        }
+
+    def grava(self):
+        """Acrescenta um instantâneo ao arquivo, ou imprime o resumo se não houver arquivo"""
+        if self.arquivo is None:
+            print(self.resumo())
+            return
+        with open(self.arquivo, 'a') as arquivo:
+            arquivo.write(json.dumps(self.instantaneo()) + '\n')
+
+    def resumo(self):
+        instantaneo = self.instantaneo()
+        linhas = ["instrumentação: %d partidas em %.2f s" % (instantaneo['partidas'], instantaneo['tempo'])]
+        for (nome, fase) in sorted(instantaneo['fases'].items(), key=lambda item: -item[1]['tempo_total']):
+            linhas.append("  %-40s %10d chamadas %10.3f s %10.2f us/chamada" % (
+                nome, fase['chamadas'], fase['tempo_total'], fase['us_por_chamada']))
+        tabela_q = instantaneo['tabela_q']
+        if tabela_q['acertos'] or tabela_q['faltas']:
+            linhas.append("  tabela q: estados %s | acertos: %d | faltas: %d | taxa de acerto: %.1f%%" % (
+                tabela_q['estados'], tabela_q['acertos'], tabela_q['faltas'], 100 * tabela_q['taxa_acerto']))
+        return "\n".join(linhas)
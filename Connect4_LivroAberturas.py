@@ -0,0 +1,214 @@
+import argparse
+import bisect
+import multiprocessing
+import os
+import struct
+import sys
+import time
+from array import array
+
+from Connect4_Logica import TAMANHO_BORDA, BordaBitboard, LogicaJogo, TabelaZobrist
+from Connect4_Solver import JogadorSolver
+
+# cada posição avaliada é acrescentada ao arquivo parcial, que permite continuar uma geração interrompida
+REGISTRO = struct.Struct('<QBi')
+
+solver_do_processo = None
+
+
+class LivroAberturas():
+    """Melhores jogadas das primeiras posições da partida, geradas por Connect4_LivroAberturas.py"""
+    ASSINATURA = b'C4LA'
+    VERSAO = 1
+    CABECALHO = struct.Struct('<4sIIIQ')
+
+    def __init__(self, caminho):
+        with open(caminho, 'rb') as arquivo:
+            cabecalho = arquivo.read(LivroAberturas.CABECALHO.size)
+            if len(cabecalho) < LivroAberturas.CABECALHO.size:
+                raise ValueError('Arquivo de livro de aberturas inválido: %s' % caminho)
+            (assinatura, versao, self.numero_linhas, self.numero_colunas, numero_posicoes) = \
+                LivroAberturas.CABECALHO.unpack(cabecalho)
+            # cada posição ocupa 8 bytes da chave, 1 da coluna e 4 do valor
+            tamanho = LivroAberturas.CABECALHO.size + 13 * numero_posicoes
+            if (assinatura != LivroAberturas.ASSINATURA or versao != LivroAberturas.VERSAO or
+                    os.fstat(arquivo.fileno()).st_size != tamanho):
+                raise ValueError('Arquivo de livro de aberturas inválido: %s' % caminho)
+            self.chaves = array('Q')
+            self.chaves.fromfile(arquivo, numero_posicoes)
+            self.colunas = array('B')
+            self.colunas.fromfile(arquivo, numero_posicoes)
+            self.valores = array('i')
+            self.valores.fromfile(arquivo, numero_posicoes)
+        if sys.byteorder != 'little':
+            self.chaves.byteswap()
+            self.valores.byteswap()
+        self.zobrist = TabelaZobrist.para_dimensoes(self.numero_linhas, self.numero_colunas)
+        self.consultas = 0
+        self.acertos = 0
+
+    def __len__(self):
+        return len(self.chaves)
+
+    @staticmethod
+    def chave_da_posicao(zobrist, estado, tipo_moeda):
+        """Retorna (chave canônica, espelhado) do estado visto por quem joga com tipo_moeda"""
+        numero_colunas = len(estado[0])
+        chave = 0
+        chave_espelhada = 0
+        for (i, linha) in enumerate(estado):
+            for (j, valor) in enumerate(linha):
+                if valor:
+                    tipo_relativo = 1 if valor == tipo_moeda else 2
+                    chave ^= zobrist.valores[tipo_relativo][i][j]
+                    chave_espelhada ^= zobrist.valores[tipo_relativo][i][numero_colunas - 1 - j]
+        if chave_espelhada < chave:
+            return (chave_espelhada, True)
+        return (chave, False)
+
+    @staticmethod
+    def grava(caminho, numero_linhas, numero_colunas, posicoes):
+        """Grava {chave canônica: (coluna, valor)} no formato lido por LivroAberturas"""
+        chaves = array('Q', sorted(posicoes))
+        colunas = array('B', [posicoes[chave][0] for chave in chaves])
+        valores = array('i', [posicoes[chave][1] for chave in chaves])
+        if sys.byteorder != 'little':
+            chaves.byteswap()
+            valores.byteswap()
+        caminho_temporario = caminho + '.tmp'
+        with open(caminho_temporario, 'wb') as arquivo:
+            arquivo.write(LivroAberturas.CABECALHO.pack(LivroAberturas.ASSINATURA, LivroAberturas.VERSAO,
+                                                        numero_linhas, numero_colunas, len(chaves)))
+            chaves.tofile(arquivo)
+            colunas.tofile(arquivo)
+            valores.tofile(arquivo)
+        os.replace(caminho_temporario, caminho)
+
+    def consulta(self, estado, tipo_moeda):
+        """Retorna a coluna do livro para quem joga com tipo_moeda no estado, ou None se a posição não está nele"""
+        if len(estado) != self.numero_linhas or len(estado[0]) != self.numero_colunas:
+            return None
+        self.consultas += 1
+        (chave, espelhado) = LivroAberturas.chave_da_posicao(self.zobrist, estado, tipo_moeda)
+        i = bisect.bisect_left(self.chaves, chave)
+        if i == len(self.chaves) or self.chaves[i] != chave:
+            return None
+        self.acertos += 1
+        coluna = self.colunas[i]
+        return self.numero_colunas - 1 - coluna if espelhado else coluna
+
+
+def enumera_posicoes(numero_linhas, numero_colunas, profundidade,
+                     sequencia_vitoria=LogicaJogo.SEQUENCIA_VITORIA_LENGTH):
+    """Retorna [(chave canônica, estado canônico, tipo da moeda de quem joga)] das posições com menos de
+    profundidade jogadas a partir da borda vazia, sem posições repetidas, espelhadas ou já terminadas"""
+    zobrist = TabelaZobrist.para_dimensoes(numero_linhas, numero_colunas)
+    borda = BordaBitboard(numero_linhas, numero_colunas)
+    logica_jogo = LogicaJogo(borda, sequencia_vitoria)
+    vistas = set()
+    posicoes = []
+
+    def visita(jogadas):
+        tipo_moeda = 1 if jogadas % 2 == 0 else 2
+        estado = borda.get_estado()
+        (chave, espelhado) = LivroAberturas.chave_da_posicao(zobrist, estado, tipo_moeda)
+        if chave in vistas:
+            return
+        vistas.add(chave)
+        if espelhado:
+            estado = tuple(linha[::-1] for linha in estado)
+        posicoes.append((chave, estado, tipo_moeda))
+
+        if jogadas + 1 >= profundidade:
+            return
+        for coluna in borda.get_acoes_disponiveis():
+            borda.insere_na_coluna(coluna, tipo_moeda)
+            if not borda.ultima_jogada_venceu(logica_jogo) and not borda.checa_borda_preenchida():
+                visita(jogadas + 1)
+            borda.remove_ultima_moeda()
+
+    visita(0)
+    return posicoes
+
+
+def inicializa_processo(opcoes_solver):
+    global solver_do_processo
+    solver_do_processo = JogadorSolver(1, **opcoes_solver)
+
+
+def avalia_posicao(posicao):
+    (chave, estado, tipo_moeda) = posicao
+    solver_do_processo.set_tipo_moeda(tipo_moeda)
+    acoes = [j for j in range(len(estado[0])) if estado[0][j] == 0]
+    coluna = solver_do_processo.escolher_acao(estado, acoes)
+    return (chave, coluna, solver_do_processo.valor_escolhido)
+
+
+def le_parcial(caminho):
+    resultados = {}
+    if os.path.exists(caminho):
+        with open(caminho, 'rb') as arquivo:
+            dados = arquivo.read()
+        for inicio in range(0, len(dados) - len(dados) % REGISTRO.size, REGISTRO.size):
+            (chave, coluna, valor) = REGISTRO.unpack_from(dados, inicio)
+            resultados[chave] = (coluna, valor)
+    return resultados
+
+
+def gera_livro(saida, numero_linhas, numero_colunas, profundidade, processos, opcoes_solver, intervalo_relatorio=100):
+    caminho_parcial = saida + '.parcial'
+    resultados = le_parcial(caminho_parcial)
+    posicoes = enumera_posicoes(numero_linhas, numero_colunas, profundidade,
+                                opcoes_solver.get('sequencia_vitoria', LogicaJogo.SEQUENCIA_VITORIA_LENGTH))
+    pendentes = [posicao for posicao in posicoes if posicao[0] not in resultados]
+    print("posições: %d | já avaliadas: %d | pendentes: %d" % (len(posicoes), len(posicoes) - len(pendentes),
+                                                                len(pendentes)))
+
+    inicio = time.perf_counter()
+    with open(caminho_parcial, 'ab') as parcial:
+        # descarta um registro incompleto deixado por uma geração interrompida no meio da escrita
+        tamanho = parcial.seek(0, os.SEEK_END)
+        parcial.truncate(tamanho - tamanho % REGISTRO.size)
+        pool = multiprocessing.Pool(processos, inicializa_processo, (opcoes_solver,))
+        try:
+            for (avaliadas, (chave, coluna, valor)) in enumerate(pool.imap_unordered(avalia_posicao, pendentes), 1):
+                resultados[chave] = (coluna, valor)
+                parcial.write(REGISTRO.pack(chave, coluna, valor))
+                if avaliadas % intervalo_relatorio == 0:
+                    parcial.flush()
+                    print("%d/%d posições | %.1f posições/s" % (avaliadas, len(pendentes),
+                                                                avaliadas / (time.perf_counter() - inicio)))
+        finally:
+            pool.terminate()
+            pool.join()
+
+    LivroAberturas.grava(saida, numero_linhas, numero_colunas,
+                         {chave: resultados[chave] for (chave, _, _) in posicoes})
+    os.remove(caminho_parcial)
+    print("livro gravado em %s com %d posições" % (saida, len(posicoes)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('saida', action="store", help="Arquivo do livro de aberturas")
+    parser.add_argument('--profundidade', default=4, type=int, action="store",
+                        help="Número de jogadas a partir da borda vazia cobertas pelo livro")
+    parser.add_argument('--processos', default=multiprocessing.cpu_count(), type=int, action="store",
+                        help="Número de processos que avaliam as posições")
+    parser.add_argument('--profundidade-solver', default=10, type=int, action="store",
+                        help="Profundidade máxima da busca do solver em cada posição")
+    parser.add_argument('--limite-nodos-solver', default=None, type=int, action="store",
+                        help="Número máximo de nodos visitados pelo solver em cada posição")
+    parser.add_argument('--linhas', default=TAMANHO_BORDA[0], type=int, action="store",
+                        help="Número de linhas da borda")
+    parser.add_argument('--colunas', default=TAMANHO_BORDA[1], type=int, action="store",
+                        help="Número de colunas da borda; o livro guarda a coluna em um byte, então no máximo 256")
+    parser.add_argument('--sequencia-vitoria', default=LogicaJogo.SEQUENCIA_VITORIA_LENGTH, type=int, action="store",
+                        help="Número de moedas seguidas necessárias para vencer")
+    args = parser.parse_args()
+    if args.colunas > 256:
+        parser.error("--colunas deve ser no máximo 256, pois o livro guarda a coluna em um byte")
+
+    gera_livro(args.saida, args.linhas, args.colunas, args.profundidade, args.processos,
+               {'profundidade_maxima': args.profundidade_solver, 'limite_nodos': args.limite_nodos_solver,
+                'sequencia_vitoria': args.sequencia_vitoria})
@@ -0,0 +1,351 @@
+import random
+
+TAMANHO_BORDA = (7, 6)
+
+
+class ColunaPreenchidaTotalmente(Exception):
+
+    def __init__(self, valor):
+        self.valor = valor
+
+    def __str__(self):
+        return repr(self.valor)
+
+
+class TabelaZobrist():
+    """Números aleatórios de 64 bits por (tipo da moeda, linha, coluna), de semente fixa, que geram as chaves"""
+    SEMENTE = 20190604
+    tabelas = {}
+
+    def __init__(self, numero_linhas, numero_colunas):
+        gerador = random.Random(TabelaZobrist.SEMENTE)
+        self.valores = [[[gerador.getrandbits(64) if tipo_moeda else 0 for j in range(numero_colunas)]
+                         for i in range(numero_linhas)] for tipo_moeda in range(3)]
+
+    @staticmethod
+    def para_dimensoes(numero_linhas, numero_colunas):
+        """Retorna a tabela compartilhada pelas bordas com essas dimensões"""
+        dimensoes = (numero_linhas, numero_colunas)
+        if dimensoes not in TabelaZobrist.tabelas:
+            TabelaZobrist.tabelas[dimensoes] = TabelaZobrist(numero_linhas, numero_colunas)
+        return TabelaZobrist.tabelas[dimensoes]
+
+    def valor(self, tipo_moeda, linha_index, coluna_index):
+        return self.valores[tipo_moeda][linha_index][coluna_index]
+
+    def chave_do_estado(self, estado):
+        """Calcula do zero a chave de um estado no formato de Borda.get_estado"""
+        chave = 0
+        for i, linha in enumerate(estado):
+            for j, tipo_moeda in enumerate(linha):
+                chave ^= self.valores[tipo_moeda][i][j]
+        return chave
+
+
+class BordaBitboard():
+    """Borda apenas lógica com as posições de cada jogador em bitboards de numero_linhas + 1 bits por coluna"""
+
+    def __init__(self, numero_linhas, numero_colunas):
+        self.numero_linhas = numero_linhas
+        self.numero_colunas = numero_colunas
+        self.altura_coluna = numero_linhas + 1
+        self.total_espacos = numero_linhas * numero_colunas
+        self.mascara_base = 0
+        self.mascara_borda = 0
+        for j in range(numero_colunas):
+            self.mascara_base |= 1 << (j * self.altura_coluna)
+            self.mascara_borda |= ((1 << numero_linhas) - 1) << (j * self.altura_coluna)
+        # deslocamentos para as direções vertical, horizontal e as duas diagonais
+        self.direcoes = (1, self.altura_coluna, self.altura_coluna - 1, self.altura_coluna + 1)
+
+        self.posicoes = [0, 0, 0]  # indexado pelo tipo da moeda, a posição 0 não é usada
+        # cópia em matriz das posições, mantida apenas para get_estado ser tão barato quanto em Borda
+        self.estado = [[0 for j in range(numero_colunas)] for i in range(numero_linhas)]
+        self.alturas = [0] * numero_colunas
+        self.historico = []
+        self.numero_espacos_preenchidos = 0
+        self.ultimo_valor = 0
+        self.zobrist = TabelaZobrist.para_dimensoes(numero_linhas, numero_colunas)
+        self.chave = 0
+        self.chave_espelhada = 0
+
+    def reset(self):
+        """Esvazia a borda para uma nova partida reaproveitando as listas"""
+        self.posicoes[1] = 0
+        self.posicoes[2] = 0
+        for linha in self.estado:
+            for j in range(self.numero_colunas):
+                linha[j] = 0
+        for j in range(self.numero_colunas):
+            self.alturas[j] = 0
+        del self.historico[:]
+        self.numero_espacos_preenchidos = 0
+        self.ultimo_valor = 0
+        self.chave = 0
+        self.chave_espelhada = 0
+
+    def checa_coluna_preenchida(self, numero_coluna):
+        return self.alturas[numero_coluna] == self.numero_linhas
+
+    def insere_moeda(self, moeda, background, logica_jogo):
+        """Insere a moeda na borda, mantendo a mesma interface de Borda.insere_moeda"""
+        numero_coluna = moeda.get_coluna()
+        if self.checa_coluna_preenchida(numero_coluna):
+            raise ColunaPreenchidaTotalmente('Coluna já está preenchida!')
+
+        linha_index = self.determina_linha_para_inserir(numero_coluna)
+        self.insere_na_coluna(numero_coluna, moeda.get_tipo_moeda())
+        moeda.solta(background, linha_index)
+
+        return logica_jogo.checa_fim_de_jogo()
+
+    def insere_na_coluna(self, numero_coluna, tipo_moeda):
+        """Joga uma moeda na coluna em O(1), sem checar se a coluna está preenchida"""
+        linha_index = self.numero_linhas - 1 - self.alturas[numero_coluna]
+        self.posicoes[tipo_moeda] |= 1 << (numero_coluna * self.altura_coluna + self.alturas[numero_coluna])
+        self.estado[linha_index][numero_coluna] = tipo_moeda
+        self.chave ^= self.zobrist.valor(tipo_moeda, linha_index, numero_coluna)
+        self.chave_espelhada ^= self.zobrist.valor(tipo_moeda, linha_index, self.numero_colunas - 1 - numero_coluna)
+        self.alturas[numero_coluna] += 1
+        self.historico.append((numero_coluna, tipo_moeda))
+        self.numero_espacos_preenchidos += 1
+        self.ultimo_valor = tipo_moeda
+
+    def remove_ultima_moeda(self):
+        """Desfaz a última jogada em O(1) e retorna a coluna em que ela foi feita"""
+        (numero_coluna, tipo_moeda) = self.historico.pop()
+        self.alturas[numero_coluna] -= 1
+        linha_index = self.numero_linhas - 1 - self.alturas[numero_coluna]
+        self.posicoes[tipo_moeda] ^= 1 << (numero_coluna * self.altura_coluna + self.alturas[numero_coluna])
+        self.estado[linha_index][numero_coluna] = 0
+        self.chave ^= self.zobrist.valor(tipo_moeda, linha_index, numero_coluna)
+        self.chave_espelhada ^= self.zobrist.valor(tipo_moeda, linha_index, self.numero_colunas - 1 - numero_coluna)
+        self.numero_espacos_preenchidos -= 1
+        self.ultimo_valor = self.historico[-1][1] if self.historico else 0
+
+        return numero_coluna
+
+    def determina_linha_para_inserir(self, numero_coluna):
+        return self.numero_linhas - 1 - self.alturas[numero_coluna]
+
+    def get_dimensoes(self):
+        return (self.numero_linhas, self.numero_colunas)
+
+    def checa_borda_preenchida(self):
+        return (self.total_espacos == self.numero_espacos_preenchidos)
+
+    def get_colunas_jogadas(self):
+        return [coluna for (coluna, _) in self.historico]
+
+    def get_representacao(self):
+        return self.posicoes
+
+    def get_mascara_ocupada(self):
+        return self.posicoes[1] | self.posicoes[2]
+
+    def get_mascara_acoes(self):
+        """Retorna os bits dos espaços onde a próxima moeda de cada coluna cairia"""
+        return (self.get_mascara_ocupada() + self.mascara_base) & self.mascara_borda
+
+    def get_acoes_disponiveis(self):
+        return [j for j in range(self.numero_colunas) if self.alturas[j] < self.numero_linhas]
+
+    def get_estado(self):
+        return tuple(tuple(x) for x in self.estado)
+
+    def get_estado_anterior(self):
+        """Retorna o estado antes da última jogada sem precisar desfazê-la"""
+        estado_anterior = [tuple(x) for x in self.estado]
+        if self.historico:
+            numero_coluna = self.historico[-1][0]
+            linha_index = self.numero_linhas - self.alturas[numero_coluna]
+            linha = list(estado_anterior[linha_index])
+            linha[numero_coluna] = 0
+            estado_anterior[linha_index] = tuple(linha)
+
+        return tuple(estado_anterior)
+
+    def get_chave(self):
+        return self.chave
+
+    def get_chave_anterior(self):
+        if not self.historico:
+            return self.chave
+        (numero_coluna, tipo_moeda) = self.historico[-1]
+        linha_index = self.numero_linhas - self.alturas[numero_coluna]
+
+        return self.chave ^ self.zobrist.valor(tipo_moeda, linha_index, numero_coluna)
+
+    def get_chave_espelhada(self):
+        return self.chave_espelhada
+
+    def get_chave_espelhada_anterior(self):
+        if not self.historico:
+            return self.chave_espelhada
+        (numero_coluna, tipo_moeda) = self.historico[-1]
+        linha_index = self.numero_linhas - self.alturas[numero_coluna]
+
+        return self.chave_espelhada ^ self.zobrist.valor(tipo_moeda, linha_index,
+                                                         self.numero_colunas - 1 - numero_coluna)
+
+    def get_ultima_informacao_preenchida(self):
+        if not self.historico:
+            return ([], 0)
+        numero_coluna = self.historico[-1][0]
+        linha_index = self.numero_linhas - self.alturas[numero_coluna]
+
+        return ([(linha_index, numero_coluna)], self.ultimo_valor)
+
+    def ultima_jogada_venceu(self, logica_jogo):
+        if not self.historico:
+            return False
+
+        return self.checa_sequencia(self.posicoes[self.ultimo_valor], logica_jogo.sequencia_vitoria)
+
+    def checa_sequencia(self, posicao, tamanho_sequencia):
+        """Retorna Verdadeiro se a posição possui tamanho_sequencia bits seguidos em alguma direção"""
+        for direcao in self.direcoes:
+            sequencia = posicao
+            for k in range(1, tamanho_sequencia):
+                sequencia &= posicao >> (direcao * k)
+                if not sequencia:
+                    break
+            if sequencia:
+                return True
+
+        return False
+
+
+class MoedaLogica():
+    """Moeda sem Surface, usada quando as partidas são jogadas sem interface gráfica"""
+
+    def __init__(self, tipo_moeda):
+        self.tipo_moeda = tipo_moeda
+        self.coluna = 0
+        self.linha = None
+
+    def set_coluna(self, coluna):
+        self.coluna = coluna
+
+    def get_coluna(self):
+        return self.coluna
+
+    def set_linha(self, linha):
+        self.linha = linha
+
+    def get_linha(self):
+        return self.linha
+
+    def mover_direita(self, background, step=1):
+        self.set_coluna(self.coluna + 1)
+
+    def mover_esquerda(self, background):
+        self.set_coluna(self.coluna - 1)
+
+    def solta(self, background, numero_linha):
+        self.set_linha(numero_linha)
+
+    def get_tipo_moeda(self):
+        return self.tipo_moeda
+
+    def desenha(self, background):
+        pass
+
+
+class LogicaJogo():
+    """Seta as condições de vitória e determina o vencedor"""
+    SEQUENCIA_VITORIA_LENGTH = 4
+    # (linha, coluna) das direções horizontal, vertical e das duas diagonais
+    DIRECOES = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+    def __init__(self, borda, sequencia_vitoria=SEQUENCIA_VITORIA_LENGTH):
+        self.borda = borda
+        (numero_linhas, numero_colunas) = self.borda.get_dimensoes()
+        self.linhas_bordas = numero_linhas
+        self.colunas_bordas = numero_colunas
+        self.sequencia_vitoria = sequencia_vitoria
+        self.valor_ganhador = 0
+
+    def reset(self):
+        self.valor_ganhador = 0
+
+    def checa_fim_de_jogo(self):
+        """Checa se o jogo terminou, que pode ter sido por um empato ou um dos 2 jogadores tiver ganhado"""
+        jogador_ganhador = self.borda.ultima_jogada_venceu(self)
+        if jogador_ganhador:
+            (_, self.valor_ganhador) = self.borda.get_ultima_informacao_preenchida()
+
+        return ( jogador_ganhador or self.borda.checa_borda_preenchida() )
+
+    def pesquisa_ganhador(self, ultimo_nodo_visitado, representacao):
+        """"Determina se algum dos 2 jogadores ganhou"""
+        for indices in ultimo_nodo_visitado:
+            nodo_atual = representacao[indices[0]][indices[1]]
+            if (nodo_atual.top_left_score == self.sequencia_vitoria or
+                    nodo_atual.top_score == self.sequencia_vitoria or
+                    nodo_atual.top_right_score == self.sequencia_vitoria or
+                    nodo_atual.left_score == self.sequencia_vitoria or
+                    nodo_atual.right_score == self.sequencia_vitoria or
+                    nodo_atual.bottom_left_score == self.sequencia_vitoria or
+                    nodo_atual.bottom_score == self.sequencia_vitoria or
+                    nodo_atual.bottom_right_score == self.sequencia_vitoria):
+                return True
+
+        return False
+
+    def checa_linhas(self, estado, linha_index, coluna_index):
+        """Determina se a moeda em (linha_index, coluna_index) completou uma sequência de vitória"""
+        tipo_moeda = estado[linha_index][coluna_index]
+        for (di, dj) in LogicaJogo.DIRECOES:
+            contagem = 1
+            for sentido in (1, -1):
+                i = linha_index + di * sentido
+                j = coluna_index + dj * sentido
+                while (0 <= i < self.linhas_bordas and 0 <= j < self.colunas_bordas and estado[i][j] == tipo_moeda
+                       and contagem < self.sequencia_vitoria):
+                    contagem += 1
+                    i += di * sentido
+                    j += dj * sentido
+            if contagem >= self.sequencia_vitoria:
+                return True
+
+        return False
+
+    def determina_nome_ganhador(self):
+        if (self.valor_ganhador == 1):
+            return "AZUL"
+        elif (self.valor_ganhador == 2):
+            return "VERMELHO"
+        else:
+            return "Empate"
+
+    def get_ganhador(self):
+        """"Retorna o valor do tipo da moeda do ganhador"""
+        return self.valor_ganhador
+
+
+class Player():
+
+    def __init__(self, tipo_moeda):
+        self.tipo_moeda = tipo_moeda
+
+    def movimento_completo(self):
+        """Faz uma mudança e atualiza qualquer parâmetro de aprendizado, se houver"""
+        pass
+
+    def fim_de_partida(self, logica_jogo, terminada=True):
+        """Chamado para os dois jogadores ao fim de cada partida; terminada é falso em uma partida abandonada"""
+        pass
+
+    def get_tipo_moeda(self):
+        return self.tipo_moeda
+
+    def set_tipo_moeda(self, tipo_moeda):
+        self.tipo_moeda = tipo_moeda
+
+    def le_estado(self, borda):
+        """Retorna a representação do estado atual da borda usada pelo jogador"""
+        return borda.get_estado()
+
+    def le_estado_anterior(self, borda):
+        return borda.get_estado_anterior()
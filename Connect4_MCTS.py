@@ -0,0 +1,264 @@
+import math
+import random
+import time
+from array import array
+
+from Connect4_Logica import BordaBitboard, LogicaJogo, Player
+
+
+class ArvoreMCTS():
+    """Nodos da árvore do JogadorMCTS em arrays paralelos, um índice por nodo"""
+
+    def __init__(self):
+        self.visitas = array('l')
+        self.vitorias = array('d')
+        self.primeiro_filho = array('l')
+        self.numero_filhos = array('l')
+        self.coluna = array('l')
+        self.terminal = array('b')
+
+    def __len__(self):
+        return len(self.visitas)
+
+    def adiciona_nodo(self, coluna, terminal=0, visitas=0, vitorias=0.0):
+        self.visitas.append(visitas)
+        self.vitorias.append(vitorias)
+        self.primeiro_filho.append(-1)
+        self.numero_filhos.append(0)
+        self.coluna.append(coluna)
+        self.terminal.append(terminal)
+        return len(self.visitas) - 1
+
+    def filho_da_coluna(self, nodo, coluna):
+        primeiro = self.primeiro_filho[nodo]
+        if primeiro < 0:
+            return None
+        for filho in range(primeiro, primeiro + self.numero_filhos[nodo]):
+            if self.coluna[filho] == coluna:
+                return filho
+        return None
+
+    def subarvore(self, raiz):
+        """Copia a subárvore de raiz para uma nova ArvoreMCTS, onde ela passa a ser o nodo 0"""
+        nova = ArvoreMCTS()
+        nova.adiciona_nodo(self.coluna[raiz], self.terminal[raiz], self.visitas[raiz], self.vitorias[raiz])
+        pendentes = [(raiz, 0)]
+        while pendentes:
+            (antigo, novo) = pendentes.pop()
+            primeiro = self.primeiro_filho[antigo]
+            if primeiro < 0:
+                continue
+            nova.primeiro_filho[novo] = len(nova)
+            nova.numero_filhos[novo] = self.numero_filhos[antigo]
+            for filho in range(primeiro, primeiro + self.numero_filhos[antigo]):
+                pendentes.append((filho, nova.adiciona_nodo(self.coluna[filho], self.terminal[filho],
+                                                            self.visitas[filho], self.vitorias[filho])))
+        return nova
+
+
+class JogadorMCTS(Player):
+    """Busca em árvore Monte Carlo com seleção UCT e simulações aleatórias"""
+
+    def __init__(self, tipo_moeda, tempo_limite=None, limite_playouts=2000, constante_uct=1.4,
+                 limite_nodos_arvore=500000, playout_heuristico=True,
+                 sequencia_vitoria=LogicaJogo.SEQUENCIA_VITORIA_LENGTH):
+        Player.__init__(self, tipo_moeda)
+        self.tempo_limite = tempo_limite
+        self.limite_playouts = limite_playouts
+        self.constante_uct = constante_uct
+        self.limite_nodos_arvore = limite_nodos_arvore
+        self.playout_heuristico = playout_heuristico
+        self.sequencia_vitoria = sequencia_vitoria
+        self.dimensoes = None
+        self.arvore = None
+        self.raiz_guardada = None
+        self.estado_esperado = None
+        self.playouts_total = 0
+        self.tempo_total = 0.0
+        self.jogadas_com_reuso = 0
+        self.jogadas = 0
+        self.maior_arvore = 0
+
+    def prepara_dimensoes(self, numero_linhas, numero_colunas):
+        if self.dimensoes == (numero_linhas, numero_colunas):
+            return
+        self.dimensoes = (numero_linhas, numero_colunas)
+        self.borda = BordaBitboard(numero_linhas, numero_colunas)
+        altura_coluna = self.borda.altura_coluna
+        self.total_espacos = numero_linhas * numero_colunas
+        self.base = [1 << (j * altura_coluna) for j in range(numero_colunas)]
+        self.mascaras_colunas = [((1 << numero_linhas) - 1) << (j * altura_coluna) for j in range(numero_colunas)]
+        self.topos = [1 << (numero_linhas - 1 + j * altura_coluna) for j in range(numero_colunas)]
+        self.arvore = None
+
+    def posicao_do_estado(self, estado):
+        """Converte um estado de Borda.get_estado em (moedas de quem joga, moedas ocupadas, número de jogadas)"""
+        self.prepara_dimensoes(len(estado), len(estado[0]))
+        numero_linhas = len(estado)
+        posicao = 0
+        mascara = 0
+        for (i, linha) in enumerate(estado):
+            for (j, tipo_moeda) in enumerate(linha):
+                if tipo_moeda:
+                    bit = 1 << (j * self.borda.altura_coluna + numero_linhas - 1 - i)
+                    mascara |= bit
+                    if tipo_moeda == self.tipo_moeda:
+                        posicao |= bit
+        return (posicao, mascara, bin(mascara).count('1'))
+
+    def raiz_para_estado(self, estado):
+        """Reaproveita a subárvore guardada se o estado for o esperado mais uma jogada do adversário"""
+        if self.raiz_guardada is None or self.estado_esperado is None or len(estado) != len(self.estado_esperado):
+            return None
+        diferencas = [(i, j) for (i, linha) in enumerate(estado) for (j, tipo_moeda) in enumerate(linha)
+                      if tipo_moeda != self.estado_esperado[i][j]]
+        if len(diferencas) != 1 or self.estado_esperado[diferencas[0][0]][diferencas[0][1]] != 0:
+            return None
+        return self.arvore.filho_da_coluna(self.raiz_guardada, diferencas[0][1])
+
+    def joga(self, posicao, mascara, coluna):
+        """Retorna (posição de quem joga a seguir, nova máscara, Verdadeiro se a jogada venceu)"""
+        jogada = (mascara + self.base[coluna]) & self.mascaras_colunas[coluna]
+        posicao_jogador = posicao | jogada
+        nova_mascara = mascara | jogada
+        venceu = self.borda.checa_sequencia(posicao_jogador, self.sequencia_vitoria)
+        return (posicao_jogador ^ nova_mascara, nova_mascara, venceu)
+
+    def expande(self, nodo, posicao, mascara, jogadas):
+        arvore = self.arvore
+        colunas = [j for j in range(len(self.base)) if not mascara & self.topos[j]]
+        arvore.primeiro_filho[nodo] = len(arvore)
+        arvore.numero_filhos[nodo] = len(colunas)
+        for coluna in colunas:
+            (_, _, venceu) = self.joga(posicao, mascara, coluna)
+            terminal = 1 if venceu else (2 if jogadas + 1 == self.total_espacos else 0)
+            arvore.adiciona_nodo(coluna, terminal)
+
+    def seleciona(self, nodo):
+        arvore = self.arvore
+        log_visitas = math.log(arvore.visitas[nodo] + 1)
+        melhor = -1
+        melhor_valor = -1.0
+        primeiro = arvore.primeiro_filho[nodo]
+        for filho in range(primeiro, primeiro + arvore.numero_filhos[nodo]):
+            visitas = arvore.visitas[filho]
+            if visitas == 0:
+                return filho
+            valor = arvore.vitorias[filho] / visitas + self.constante_uct * math.sqrt(log_visitas / visitas)
+            if valor > melhor_valor:
+                melhor_valor = valor
+                melhor = filho
+        return melhor
+
+    def simula(self, posicao, mascara, jogadas):
+        """Joga até o fim e retorna 0 se quem joga primeiro venceu, 1 se o outro venceu e None se empatou"""
+        jogador = 0
+        while jogadas < self.total_espacos:
+            colunas = [j for j in range(len(self.base)) if not mascara & self.topos[j]]
+            if self.playout_heuristico:
+                for j in colunas:
+                    jogada = (mascara + self.base[j]) & self.mascaras_colunas[j]
+                    if self.borda.checa_sequencia(posicao | jogada, self.sequencia_vitoria):
+                        return jogador
+            (posicao, mascara, venceu) = self.joga(posicao, mascara, random.choice(colunas))
+            jogadas += 1
+            if venceu:
+                return jogador
+            jogador = 1 - jogador
+        return None
+
+    def iteracao(self, posicao, mascara, jogadas):
+        """Seleção, expansão, simulação e retropropagação a partir da raiz (nodo 0)"""
+        arvore = self.arvore
+        caminho = [0]
+        nodo = 0
+        vencedor = None
+        while True:
+            terminal = arvore.terminal[nodo]
+            if terminal:
+                # a jogada que levou ao nodo foi do jogador (profundidade - 1) % 2
+                vencedor = (len(caminho) - 2) % 2 if terminal == 1 else None
+                break
+            if arvore.primeiro_filho[nodo] < 0:
+                if len(arvore) + len(self.base) <= self.limite_nodos_arvore and \
+                        (arvore.visitas[nodo] > 0 or nodo == 0):
+                    self.expande(nodo, posicao, mascara, jogadas)
+                else:
+                    resultado = self.simula(posicao, mascara, jogadas)
+                    vencedor = None if resultado is None else (len(caminho) - 1 + resultado) % 2
+                    break
+            nodo = self.seleciona(nodo)
+            (posicao, mascara, _) = self.joga(posicao, mascara, arvore.coluna[nodo])
+            jogadas += 1
+            caminho.append(nodo)
+
+        for (profundidade, nodo) in enumerate(caminho):
+            arvore.visitas[nodo] += 1
+            if vencedor is None:
+                arvore.vitorias[nodo] += 0.5
+            elif profundidade > 0 and vencedor == (profundidade - 1) % 2:
+                arvore.vitorias[nodo] += 1.0
+
+    def escolher_acao(self, estado, acoes):
+        inicio = time.perf_counter()
+        (posicao, mascara, jogadas) = self.posicao_do_estado(estado)
+        nova_raiz = self.raiz_para_estado(estado) if self.arvore is not None else None
+        if nova_raiz is not None:
+            self.arvore = self.arvore.subarvore(nova_raiz)
+            self.jogadas_com_reuso += 1
+        else:
+            self.arvore = ArvoreMCTS()
+            self.arvore.adiciona_nodo(-1)
+        if self.arvore.primeiro_filho[0] < 0:
+            # a raiz sempre tem filhos para escolher, mesmo se o orçamento não permitir nenhuma simulação
+            self.expande(0, posicao, mascara, jogadas)
+
+        playouts = 0
+        while True:
+            if self.tempo_limite is not None:
+                if time.perf_counter() - inicio >= self.tempo_limite:
+                    break
+            elif playouts >= self.limite_playouts:
+                break
+            self.iteracao(posicao, mascara, jogadas)
+            playouts += 1
+
+        arvore = self.arvore
+        primeiro = arvore.primeiro_filho[0]
+        filhos = [filho for filho in range(primeiro, primeiro + arvore.numero_filhos[0]) if arvore.coluna[filho] in acoes]
+        melhor = max(filhos, key=lambda filho: (arvore.terminal[filho] == 1, arvore.visitas[filho]))
+        acao_escolhida = arvore.coluna[melhor]
+
+        # guarda a subárvore da jogada feita e o estado em que o adversário vai jogar
+        self.raiz_guardada = melhor
+        linha_index = len(estado) - 1 - bin(mascara & self.mascaras_colunas[acao_escolhida]).count('1')
+        estado_esperado = [list(linha) for linha in estado]
+        estado_esperado[linha_index][acao_escolhida] = self.tipo_moeda
+        self.estado_esperado = tuple(tuple(linha) for linha in estado_esperado)
+
+        self.playouts_total += playouts
+        self.maior_arvore = max(self.maior_arvore, len(arvore))
+        self.jogadas += 1
+        self.tempo_total += time.perf_counter() - inicio
+        return acao_escolhida
+
+    def aprender(self, borda, acoes, acao_escolhida, fim_de_jogo, logica_jogo):
+        """A árvore da MCTS é refeita a cada partida, o jogador não aprende entre partidas"""
+        if fim_de_jogo:
+            self.arvore = None
+            self.raiz_guardada = None
+            self.estado_esperado = None
+
+    def estatisticas(self):
+        return {
+            'playouts': self.playouts_total,
+            'playouts_por_segundo': self.playouts_total / self.tempo_total if self.tempo_total > 0 else 0.0,
+            'maior_arvore': self.maior_arvore,
+            'jogadas_com_reuso': self.jogadas_com_reuso,
+            'jogadas': self.jogadas,
+        }
+
+    def resumo(self):
+        return "mcts: %(playouts)d playouts | %(playouts_por_segundo).0f playouts/s | maior árvore: " \
+               "%(maior_arvore)d | árvore reaproveitada em %(jogadas_com_reuso)d de %(jogadas)d jogadas" % \
+               self.estatisticas()
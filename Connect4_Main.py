@@ -1,27 +1,58 @@
 import pygame
 import random
 import argparse
+import os
+import sys
+import time
+from array import array
+
+from Connect4_Checkpoint import CheckpointTreino
+from Connect4_LivroAberturas import LivroAberturas
+from Connect4_Logica import (TAMANHO_BORDA, BordaBitboard, ColunaPreenchidaTotalmente, LogicaJogo, MoedaLogica, Player,
+                             TabelaZobrist)
+from Connect4_MCTS import JogadorMCTS
+from Connect4_RegistroPartidas import RegistroPartidas
+from Connect4_Solver import JogadorSolver
+from Connect4_TabelasQ import TabelaQArquivo, TabelaQCompacta, TabelaQLimitada
 
 AZUL = (0, 0, 255)
 BRANCO = (255, 255, 255)
 PRETO = (0, 0, 0)
 VERMELHO = (255, 0, 0)
 VERDE = (0, 255, 0)
-TAMANHO_BORDA = (7, 6)
 
 
-class ColunaPreenchidaTotalmente(Exception):
+class FundoRastreado(pygame.Surface):
+    """Surface do background que guarda os retângulos alterados por blit e fill desde o último quadro"""
 
-    def __init__(self, valor):
-        self.valor = valor
+    def __init__(self, *args):
+        pygame.Surface.__init__(self, *args)
+        self.retangulos_sujos = []
 
-    def __str__(self):
-        return repr(self.valor)
+    def blit(self, source, dest, area=None, special_flags=0):
+        retangulo = pygame.Surface.blit(self, source, dest, area, special_flags)
+        self.retangulos_sujos.append(retangulo)
+        return retangulo
+
+    def fill(self, color, rect=None, special_flags=0):
+        retangulo = pygame.Surface.fill(self, color, rect, special_flags)
+        self.retangulos_sujos.append(retangulo)
+        return retangulo
+
+    def retira_retangulos_sujos(self):
+        """Retorna os retângulos alterados e esvazia a lista; um preenchimento da tela inteira substitui os demais"""
+        retangulos = self.retangulos_sujos
+        self.retangulos_sujos = []
+        tela = self.get_rect()
+        if any(retangulo.contains(tela) for retangulo in retangulos):
+            return [tela]
+        return retangulos
 
 
 class EspacoMoedas():
     """Representa um espaço no quadro"""
     TAMANHO = 80
+    sprites = {}  # Surfaces já convertidas, uma por tamanho de espaço
 
     def __init__(self, linha_index, coluna_index, width, height, x1, y1):
         """Inicializa um espaço em uma determinada posição no quadro"""
@@ -30,7 +61,6 @@ class EspacoMoedas():
         self.coluna_index = coluna_index
         self.width = width
         self.height = height
-        self.surface = pygame.Surface((width * 2, height * 2))
         self.x_pos = x1
         self.y_pos = y1
 
@@ -49,15 +79,30 @@ class EspacoMoedas():
     def get_content(self):
         return self.content
 
+    @staticmethod
+    def sprite(width, height):
+        """Retorna a Surface de um espaço vazio, desenhada e convertida uma única vez por tamanho"""
+        if (width, height) not in EspacoMoedas.sprites:
+            surface = pygame.Surface((width, height))
+            pygame.draw.rect(surface, VERDE, (0, 0, width, height))
+            pygame.draw.rect(surface, BRANCO, (1, 1, width - 2, height - 2))
+            EspacoMoedas.sprites[(width, height)] = surface.convert()
+        return EspacoMoedas.sprites[(width, height)]
+
     def desenha(self, background):
-        pygame.draw.rect(self.surface, VERDE, (0, 0, self.width, self.height))
-        pygame.draw.rect(self.surface, BRANCO, (1, 1, self.width - 2, self.height - 2))
-        self.surface = self.surface.convert()
-        background.blit(self.surface, (self.x_pos, self.y_pos))
+        background.blit(EspacoMoedas.sprite(self.width, self.height), (self.x_pos, self.y_pos))
 
 
 class RastreadorNodo():
     """Representa o nodo na representação gráfica interna do tabuleiro do jogo"""
+    __slots__ = ('top_left', 'top_right', 'top', 'left', 'right', 'bottom_left', 'bottom', 'bottom_right',
+                 'top_left_score', 'top_right_score', 'top_score', 'left_score', 'right_score', 'bottom_left_score',
+                 'bottom_score', 'bottom_right_score', 'value')
+    # (vizinho, pontuação, vizinho oposto, passo da linha, passo da coluna) de cada uma das 8 direções
+    DIRECOES = (('top_left', 'top_left_score', 'bottom_right', -1, -1), ('top', 'top_score', 'bottom', -1, 0),
+                ('top_right', 'top_right_score', 'bottom_left', -1, 1), ('left', 'left_score', 'right', 0, -1),
+                ('right', 'right_score', 'left', 0, 1), ('bottom_left', 'bottom_left_score', 'top_right', 1, -1),
+                ('bottom', 'bottom_score', 'top', 1, 0), ('bottom_right', 'bottom_right_score', 'top_left', 1, 1))
 
     def __init__(self):
         """Inicializa com ponteiros para os nodos em todas as 8 direções ao redor"""
@@ -69,6 +114,10 @@ class RastreadorNodo():
         self.bottom_left = None
         self.bottom = None
         self.bottom_right = None
+        self.reset()
+
+    def reset(self):
+        """Volta as pontuações e o valor ao estado inicial, mantendo os ponteiros para os nodos vizinhos"""
         self.top_left_score = 1
         self.top_right_score = 1
         self.top_score = 1
@@ -78,17 +127,21 @@ class RastreadorNodo():
         self.bottom_score = 1
         self.bottom_right_score = 1
         self.value = 0
-        self.visited = False
 
 
 class Borda():
     MARGEM_X = 350
     MARGEM_Y = 150
 
-    def __init__(self, numero_linhas, numero_colunas):
-        self.container = [[EspacoMoedas(i, j, EspacoMoedas.TAMANHO, EspacoMoedas.TAMANHO,
-                                        j * EspacoMoedas.TAMANHO + Borda.MARGEM_X,
-                                        i * EspacoMoedas.TAMANHO + Borda.MARGEM_Y) for j in range(numero_colunas)] for i in range(numero_linhas)]
+    def __init__(self, numero_linhas, numero_colunas, sem_interface=False, deteccao_grafo=False, margem_x=MARGEM_X,
+                 margem_y=MARGEM_Y):
+        """Com sem_interface=True só a lógica da borda é criada; deteccao_grafo=True usa o grafo de RastreadorNodo"""
+        if sem_interface:
+            self.container = None
+        else:
+            self.container = [[EspacoMoedas(i, j, EspacoMoedas.TAMANHO, EspacoMoedas.TAMANHO,
+                                            j * EspacoMoedas.TAMANHO + margem_x,
+                                            i * EspacoMoedas.TAMANHO + margem_y) for j in range(numero_colunas)] for i in range(numero_linhas)]
         self.numero_linhas = numero_linhas
         self.numero_colunas = numero_colunas
         self.total_espacos = numero_linhas * numero_colunas
@@ -97,9 +150,24 @@ class Borda():
         self.ultimo_valor = 0
 
         self.estado = [[0 for j in range(numero_colunas)] for i in range(numero_linhas)]
+        self.alturas = [0] * numero_colunas  # moedas em cada coluna, para não percorrer a coluna a cada jogada
+        self.colunas_jogadas = []  # coluna de cada jogada da partida, na ordem
         self.estado_anterior = None
         self.movimento_anterior = (None, None, None)
-
+        self.zobrist = TabelaZobrist.para_dimensoes(numero_linhas, numero_colunas)
+        self.chave = 0
+        self.chave_anterior = 0
+        self.chave_espelhada = 0
+        self.chave_espelhada_anterior = 0
+
+        self.representacao = None
+        if deteccao_grafo:
+            self.constroi_representacao()
+
+    def constroi_representacao(self):
+        """Cria o grafo de RastreadorNodo, com cada nodo ligado aos vizinhos nas 8 direções"""
+        numero_linhas = self.numero_linhas
+        numero_colunas = self.numero_colunas
         self.representacao = [[RastreadorNodo() for j in range(numero_colunas)] for i in range(numero_linhas)]
         for i in range(numero_linhas):
             linha_index_anterior = i - 1
@@ -127,6 +195,31 @@ class Borda():
                 if linha_index_proxima < numero_linhas and coluna_index_proxima < numero_colunas:
                     nodo_atual.bottom_right = self.representacao[linha_index_proxima][coluna_index_proxima]
 
+    def reset(self):
+        """Esvazia a borda para uma nova partida reaproveitando os espaços, os nodos e as matrizes de estado"""
+        if self.container is not None:
+            for linha in self.container:
+                for espaco in linha:
+                    espaco.content = 0
+        for i in range(self.numero_linhas):
+            for j in range(self.numero_colunas):
+                self.estado[i][j] = 0
+                if self.estado_anterior is not None:
+                    self.estado_anterior[i][j] = 0
+                if self.representacao is not None:
+                    self.representacao[i][j].reset()
+        for j in range(self.numero_colunas):
+            self.alturas[j] = 0
+        del self.colunas_jogadas[:]
+        self.numero_espacos_preenchidos = 0
+        self.ultimo_nodo_visitado = []
+        self.ultimo_valor = 0
+        self.movimento_anterior = (None, None, None)
+        self.chave = 0
+        self.chave_anterior = 0
+        self.chave_espelhada = 0
+        self.chave_espelhada_anterior = 0
+
     def desenha(self, background):
         """Desenha a borda inteira na tela"""
         for i in range(self.numero_linhas):
@@ -138,11 +231,7 @@ class Borda():
 
     def checa_coluna_preenchida(self, numero_coluna):
         """Retorna Verdadeiro se o numero da coluna na borda está preenchido"""
-        for i in range(len(self.container)):
-            # se um espaço não estiver preenchido então a coluna não está preenchida
-            if not self.container[i][numero_coluna].checa_espaco_preenchido():
-                return False
-        return True
+        return self.alturas[numero_coluna] == self.numero_linhas
 
     def insere_moeda(self, moeda, background, logica_jogo):
         """Insere a moeda na borda e atualiza o seu estado e representação interna"""
@@ -150,15 +239,26 @@ class Borda():
         numero_coluna = moeda.get_coluna()
         if not self.checa_coluna_preenchida(numero_coluna):
             linha_index = self.determina_linha_para_inserir(numero_coluna)
-            self.container[linha_index][numero_coluna].set_moeda(moeda)
+            if self.container is not None:
+                self.container[linha_index][numero_coluna].set_moeda(moeda)
             if self.movimento_anterior[0] == None:
-                self.estado_anterior = [[0 for j in range(self.numero_colunas)] for i in range(self.numero_linhas)]
+                # depois de um reset a matriz já existe e está zerada
+                if self.estado_anterior is None:
+                    self.estado_anterior = [[0 for j in range(self.numero_colunas)] for i in range(self.numero_linhas)]
             else:
                 (linha_anterior, coluna_anterior, valor) = self.movimento_anterior
                 self.estado_anterior[linha_anterior][coluna_anterior] = valor
             self.movimento_anterior = (linha_index, numero_coluna, moeda.get_tipo_moeda())
             self.estado[linha_index][numero_coluna] = moeda.get_tipo_moeda()
-            self.atualizar_espaco_rastreado(linha_index, numero_coluna, moeda.get_tipo_moeda())
+            self.alturas[numero_coluna] += 1
+            self.colunas_jogadas.append(numero_coluna)
+            self.chave_anterior = self.chave
+            self.chave ^= self.zobrist.valor(moeda.get_tipo_moeda(), linha_index, numero_coluna)
+            self.chave_espelhada_anterior = self.chave_espelhada
+            self.chave_espelhada ^= self.zobrist.valor(moeda.get_tipo_moeda(), linha_index,
+                                                       self.numero_colunas - 1 - numero_coluna)
+            if self.representacao is not None:
+                self.atualizar_espaco_rastreado(linha_index, numero_coluna, moeda.get_tipo_moeda())
             self.numero_espacos_preenchidos += 1
             self.ultimo_valor = moeda.get_tipo_moeda()
             moeda.solta(background, linha_index)
@@ -170,11 +270,7 @@ class Borda():
         return result
 
     def determina_linha_para_inserir(self, numero_coluna):
-        for i in range(len(self.container)):
-            if self.container[i][numero_coluna].checa_espaco_preenchido():
-                return i - 1
-
-        return self.numero_linhas - 1
+        return self.numero_linhas - 1 - self.alturas[numero_coluna]
 
     def get_dimensoes(self):
         return (self.numero_linhas, self.numero_colunas)
@@ -182,6 +278,9 @@ class Borda():
     def checa_borda_preenchida(self):
         return (self.total_espacos == self.numero_espacos_preenchidos)
 
+    def get_colunas_jogadas(self):
+        return list(self.colunas_jogadas)
+
     def get_representacao(self):
         return self.representacao
 
@@ -202,91 +301,77 @@ class Borda():
 
         return result
 
+    def get_chave(self):
+        """Retorna a chave Zobrist do estado atual, atualizada a cada moeda inserida"""
+        return self.chave
+
+    def get_chave_anterior(self):
+        return self.chave_anterior
+
+    def get_chave_espelhada(self):
+        """Retorna a chave Zobrist do estado espelhado da esquerda para a direita"""
+        return self.chave_espelhada
+
+    def get_chave_espelhada_anterior(self):
+        return self.chave_espelhada_anterior
+
     def get_ultima_informacao_preenchida(self):
         return (self.ultimo_nodo_visitado, self.ultimo_valor)
 
+    def ultima_jogada_venceu(self, logica_jogo):
+        """Retorna Verdadeiro se a última moeda inserida completou uma sequência de vitória"""
+        if self.representacao is not None:
+            return logica_jogo.pesquisa_ganhador(self.ultimo_nodo_visitado, self.representacao)
+        (linha_index, coluna_index, _) = self.movimento_anterior
+        if linha_index is None:
+            return False
+        return logica_jogo.checa_linhas(self.estado, linha_index, coluna_index)
+
     def atualizar_espaco_rastreado(self, i, j, tipo_moeada):
-        self.ultimo_nodo_visitado = []
+        self.ultimo_nodo_visitado = [(i, j)]
         nodo_inicial = self.representacao[i][j]
         nodo_inicial.value = tipo_moeada
-        self.atravessa(nodo_inicial, tipo_moeada, i, j, self.ultimo_nodo_visitado)
-        # reseta todos os nodos se eles não foram visitados
-        for indices in self.ultimo_nodo_visitado:
-            self.representacao[indices[0]][indices[1]].visited = False
-
-    def atravessa(self, nodo_atual, valor_desejado, i, j, nodos_visitados):
-        """Atualiza recursivamente as pontuações dos nodos relevantes com base em seus nós adjacentes"""
-
-        nodo_atual.visited = True
-        nodos_visitados.append((i, j))
-        if nodo_atual.top_left:
-            nodo_top_left = nodo_atual.top_left
-            if nodo_top_left.value == valor_desejado:
-                nodo_atual.top_left_score = nodo_top_left.top_left_score + 1
-                if not nodo_top_left.visited:
-                    self.atravessa(nodo_top_left, valor_desejado, i - 1, j - 1, nodos_visitados)
-
-        if nodo_atual.top:
-            nodo_top = nodo_atual.top
-            if nodo_top.value == valor_desejado:
-                nodo_atual.top_score = nodo_top.top_score + 1
-                if not nodo_top.visited:
-                    self.atravessa(nodo_top, valor_desejado, i - 1, j, nodos_visitados)
-
-        if nodo_atual.top_right:
-            nodo_top_rigth = nodo_atual.top_right
-            if nodo_top_rigth.value == valor_desejado:
-                nodo_atual.top_right_score = nodo_top_rigth.top_right_score + 1
-                if not nodo_top_rigth.visited:
-                    self.atravessa(nodo_top_rigth, valor_desejado, i - 1, j + 1, nodos_visitados)
-
-        if nodo_atual.left:
-            nodo_left = nodo_atual.left
-            if nodo_left.value == valor_desejado:
-                nodo_atual.left_score = nodo_left.left_score + 1
-                if not nodo_left.visited:
-                    self.atravessa(nodo_left, valor_desejado, i, j - 1, nodos_visitados)
-
-        if nodo_atual.right:
-            nodo_rigth = nodo_atual.right
-            if nodo_rigth.value == valor_desejado:
-                nodo_atual.right_score = nodo_rigth.right_score + 1
-                if not nodo_rigth.visited:
-                    self.atravessa(nodo_rigth, valor_desejado, i, j + 1, nodos_visitados)
-
-        if nodo_atual.bottom_left:
-            nodo_bottom_left = nodo_atual.bottom_left
-            if nodo_bottom_left.value == valor_desejado:
-                nodo_atual.bottom_left_score = nodo_bottom_left.bottom_left_score + 1
-                if not nodo_bottom_left.visited:
-                    self.atravessa(nodo_bottom_left, valor_desejado, i + 1, j - 1, nodos_visitados)
-
-        if nodo_atual.bottom:
-            nodo_bottom = nodo_atual.bottom
-            if nodo_bottom.value == valor_desejado:
-                nodo_atual.bottom_score = nodo_bottom.bottom_score + 1
-                if not nodo_bottom.visited:
-                    self.atravessa(nodo_bottom, valor_desejado, i + 1, j, nodos_visitados)
-
-        if nodo_atual.bottom_right:
-            nodo_bottom_right = nodo_atual.bottom_right
-            if nodo_bottom_right.value == valor_desejado:
-                nodo_atual.bottom_right_score = nodo_bottom_right.bottom_right_score + 1
-                if not nodo_bottom_right.visited:
-                    self.atravessa(nodo_bottom_right, valor_desejado, i + 1, j + 1, nodos_visitados)
+        for (direcao, nome_pontuacao, oposta, di, dj) in RastreadorNodo.DIRECOES:
+            # só mudam as pontuações do nodo inserido e dos nodos iguais seguidos atrás dele nessa direção
+            vizinho = getattr(nodo_inicial, direcao)
+            pontuacao = 1
+            if vizinho is not None and vizinho.value == tipo_moeada:
+                pontuacao += getattr(vizinho, nome_pontuacao)
+            (nodo_atual, linha_index, coluna_index) = (nodo_inicial, i, j)
+            while True:
+                setattr(nodo_atual, nome_pontuacao, pontuacao)
+                nodo_atual = getattr(nodo_atual, oposta)
+                if nodo_atual is None or nodo_atual.value != tipo_moeada:
+                    break
+                pontuacao += 1
+                linha_index -= di
+                coluna_index -= dj
+                self.ultimo_nodo_visitado.append((linha_index, coluna_index))
 
 
 class Moeda():
     RAIO = 30
+    sprites = {}  # Surfaces já convertidas, uma por (cor da moeda, cor do fundo)
 
     def __init__(self, tipo_moeda):
         self.tipo_moeda = tipo_moeda
-        self.surface = pygame.Surface((EspacoMoedas.TAMANHO - 3, EspacoMoedas.TAMANHO - 3))
+        self.fundo = PRETO  # cor em volta da moeda: preto acima da borda, branco dentro dela
         if self.tipo_moeda == 1:
             self.cor = AZUL
         else:
             self.cor = VERMELHO
 
+    @staticmethod
+    def sprite(cor, fundo):
+        """Retorna a Surface de uma moeda da cor sobre o fundo (sem moeda se cor for None), criada uma única vez"""
+        if (cor, fundo) not in Moeda.sprites:
+            surface = pygame.Surface((EspacoMoedas.TAMANHO - 3, EspacoMoedas.TAMANHO - 3))
+            surface.fill(fundo)
+            if cor is not None:
+                pygame.draw.circle(surface, cor, (EspacoMoedas.TAMANHO // 2, EspacoMoedas.TAMANHO // 2), Moeda.RAIO)
+            Moeda.sprites[(cor, fundo)] = surface.convert()
+        return Moeda.sprites[(cor, fundo)]
+
     def set_posicao(self, x1, y1):
         self.x_pos = x1
         self.y_pos = y1
@@ -305,65 +390,102 @@ class Moeda():
 
     def mover_direita(self, background, step=1):
         self.set_coluna(self.coluna + 1)
-        self.surface.fill((0, 0, 0))
-        background.blit(self.surface, (self.x_pos, self.y_pos))
+        background.blit(Moeda.sprite(None, PRETO), (self.x_pos, self.y_pos))
         self.set_posicao(self.x_pos + step * EspacoMoedas.TAMANHO, self.y_pos)
         self.desenha(background)
 
     def mover_esquerda(self, background):
         self.set_coluna(self.coluna - 1)
-        self.surface.fill((0, 0, 0))
-        background.blit(self.surface, (self.x_pos, self.y_pos))
+        background.blit(Moeda.sprite(None, PRETO), (self.x_pos, self.y_pos))
         self.set_posicao(self.x_pos - EspacoMoedas.TAMANHO, self.y_pos)
         self.desenha(background)
 
     def solta(self, background, numero_linha):
         self.set_linha(numero_linha)
-        self.surface.fill((0, 0, 0))
-        background.blit(self.surface, (self.x_pos, self.y_pos))
+        background.blit(Moeda.sprite(None, PRETO), (self.x_pos, self.y_pos))
         self.set_posicao(self.x_pos, self.y_pos + ((self.linha + 1) * EspacoMoedas.TAMANHO))
-        self.surface.fill((255, 255, 255))
-        background.blit(self.surface, (self.x_pos, self.y_pos))
+        self.fundo = BRANCO
         self.desenha(background)
 
     def get_tipo_moeda(self):
         return self.tipo_moeda
 
     def desenha(self, background):
-        pygame.draw.circle(self.surface, self.cor, (EspacoMoedas.TAMANHO // 2, EspacoMoedas.TAMANHO // 2), Moeda.RAIO)
-        self.surface = self.surface.convert()
-        background.blit(self.surface, (self.x_pos, self.y_pos))
+        background.blit(Moeda.sprite(self.cor, self.fundo), (self.x_pos, self.y_pos))
 
 
 class VisaoJogo(object):
 
-    def __init__(self, width=640, height=400, fps=30):
+    def __init__(self, width=640, height=400, fps=30, arquivo_tabela_q=None, tipo_pc="qlearner", opcoes_pc=None,
+                 livro_aberturas=None, renderizacao_parcial=False, numero_linhas=TAMANHO_BORDA[0],
+                 numero_colunas=TAMANHO_BORDA[1], sequencia_vitoria=None, registro_partidas=None, checkpoint=None,
+                 estado_treino=None):
         """Inicializa pygame, janela, fundo, fonte"""
         pygame.init()
         pygame.display.set_caption("ESC para sair")
+        self.numero_linhas = numero_linhas
+        self.numero_colunas = numero_colunas
+        self.sequencia_vitoria = sequencia_vitoria or LogicaJogo.SEQUENCIA_VITORIA_LENGTH
+        tamanho_espaco = EspacoMoedas.TAMANHO
+        if (Borda.MARGEM_X + numero_colunas * tamanho_espaco <= width and
+                Borda.MARGEM_Y + numero_linhas * tamanho_espaco <= height):
+            self.margens_borda = (Borda.MARGEM_X, Borda.MARGEM_Y)
+        else:
+            # a borda não cabe nas margens padrão: a janela cresce se preciso e a borda fica centralizada, com
+            # espaço acima dela para a moeda que está sendo jogada
+            width = max(width, (numero_colunas + 2) * tamanho_espaco)
+            height = max(height, (numero_linhas + 2) * tamanho_espaco)
+            self.margens_borda = ((width - numero_colunas * tamanho_espaco) // 2,
+                                  (height - numero_linhas * tamanho_espaco + tamanho_espaco) // 2)
         self.width = width
         self.height = height
         self.screen = pygame.display.set_mode((self.width, self.height), pygame.DOUBLEBUF)
-        self.background = pygame.Surface(self.screen.get_size()).convert()
+        self.renderizacao_parcial = renderizacao_parcial
+        if renderizacao_parcial:
+            # criada com o formato da tela, como faria o convert()
+            self.background = FundoRastreado(self.screen.get_size(), 0, self.screen)
+        else:
+            self.background = pygame.Surface(self.screen.get_size()).convert()
         self.clock = pygame.time.Clock()
         self.fps = fps
         self.playtime = 0.0
         self.font = pygame.font.SysFont('mono', 20, bold=True)
         self.pc_treinado = None
         self.lst_vitoria = [0, 0]
+        self.borda_do_jogo = None
+        self.jogadores_treino = None  # (p1, p2) reaproveitados entre as partidas de um mesmo treino
+        self.arquivo_tabela_q = arquivo_tabela_q
+        self.tipo_pc = tipo_pc  # tipo do JogadorPC do modo vs PC
+        self.opcoes_pc = dict(opcoes_pc or {})
+        if tipo_pc == "qlearner":
+            self.opcoes_pc.setdefault('numero_colunas', numero_colunas)
+        elif tipo_pc in ("solver", "mcts"):
+            self.opcoes_pc.setdefault('sequencia_vitoria', self.sequencia_vitoria)
+        self.livro_aberturas = livro_aberturas
+        self.registro_partidas = registro_partidas
+        self.checkpoint = checkpoint
+        self.estado_treino = estado_treino
+        self.partidas_treino = 0
 
     def inicializa_variaveis(self, modo_de_jogo):
-        """Inicializa a borda do jogo e objeto de lógica"""
-        self.borda_do_jogo = Borda(TAMANHO_BORDA[0], TAMANHO_BORDA[1])
+        """Inicializa a borda do jogo e objeto de lógica, reaproveitando os da partida anterior"""
+        if self.borda_do_jogo is None:
+            self.borda_do_jogo = Borda(self.numero_linhas, self.numero_colunas, margem_x=self.margens_borda[0],
+                                       margem_y=self.margens_borda[1])
+            self.logica_jogo = LogicaJogo(self.borda_do_jogo, self.sequencia_vitoria)
+        else:
+            self.borda_do_jogo.reset()
+            self.logica_jogo.reset()
         (self.linhas_bordas, self.colunas_bordas) = self.borda_do_jogo.get_dimensoes()
-        self.logica_jogo = LogicaJogo(self.borda_do_jogo)
         primeiro_tipo_moeda = random.randint(1, 2)
         segundo_tipo_moeda = 2 if primeiro_tipo_moeda == 1 else 1
 
         if modo_de_jogo == "sozinho":
             self.p1 = JogadorHumano(primeiro_tipo_moeda)
             if (self.pc_treinado == None):
-                self.p2 = JogadorPC(segundo_tipo_moeda, "qlearner")
+                self.p2 = JogadorPC(segundo_tipo_moeda, self.tipo_pc, self.livro_aberturas, **self.opcoes_pc)
+                if self.tipo_pc == "qlearner" and self.arquivo_tabela_q and os.path.exists(self.arquivo_tabela_q):
+                    self.p2.jogador.carregar_tabela(self.arquivo_tabela_q)
                 self.pc_treinado = self.p2
             else:
                 self.pc_treinado.set_tipo_moeda(segundo_tipo_moeda)
@@ -371,11 +493,15 @@ class VisaoJogo(object):
         elif modo_de_jogo == "2_player":
             self.p1 = JogadorHumano(primeiro_tipo_moeda)
             self.p2 = JogadorHumano(segundo_tipo_moeda)
-        else:
+        elif self.jogadores_treino is None:
             self.pc_treinado = None
-            self.lst_vitoria = [0, 0]
-            self.p1 = JogadorPC(primeiro_tipo_moeda, "qlearner")
-            self.p2 = JogadorPC(segundo_tipo_moeda, "qlearner")
+            self.p1 = JogadorPC(primeiro_tipo_moeda, "qlearner", numero_colunas=self.numero_colunas)
+            self.p2 = JogadorPC(segundo_tipo_moeda, "qlearner", numero_colunas=self.numero_colunas)
+            self.jogadores_treino = (self.p1, self.p2)
+        else:
+            (self.p1, self.p2) = self.jogadores_treino
+            self.p1.set_tipo_moeda(primeiro_tipo_moeda)
+            self.p2.set_tipo_moeda(segundo_tipo_moeda)
 
     def main_menu(self, iteracoes=30):
         main_menu = True
@@ -408,8 +534,7 @@ class VisaoJogo(object):
 
             milliseconds = self.clock.tick(self.fps)
             self.playtime += milliseconds / 1000.0
-            pygame.display.flip()
-            self.screen.blit(self.background, (0, 0))
+            self.desenha_quadro()
 
         if not jogar_jogo:
             pygame.quit()
@@ -422,6 +547,19 @@ class VisaoJogo(object):
 
     def run(self, modo_jogo, iteracoes=1):
         """Principal loop no jogo"""
+        if modo_jogo == "treino":
+            if self.estado_treino is not None:
+                self.jogadores_treino = self.estado_treino['jogadores']
+                self.lst_vitoria = list(self.estado_treino['lst_vitoria'])
+                self.partidas_treino = self.estado_treino['partidas_jogadas']
+                random.setstate(self.estado_treino['random'])
+                iteracoes -= self.partidas_treino
+                self.estado_treino = None
+            else:
+                # os dois jogadores são criados na primeira partida e continuam aprendendo nas seguintes
+                self.jogadores_treino = None
+                self.lst_vitoria = [0, 0]
+                self.partidas_treino = 0
         while (iteracoes > 0):
             self.inicializa_variaveis(modo_jogo)
             self.background.fill(PRETO)
@@ -449,11 +587,11 @@ class VisaoJogo(object):
                     moeda = Moeda(tipo_atual)
                     moeda.set_posicao(primeiro_espaco_X, primeiro_espaco_Y - EspacoMoedas.TAMANHO)
                     moeda.set_coluna(0)
+                    # depois disso a moeda só é redesenhada quando se move
+                    moeda.desenha(self.background)
                     nao_inicializado = False
                     moeda_inserida = False
 
-                moeda.desenha(self.background)
-
                 jogador_atual = self.p1 if turno_p1 else self.p2
 
                 if not turno_humano:
@@ -488,6 +626,13 @@ class VisaoJogo(object):
                     ganhador_valor = self.logica_jogo.get_ganhador()
                     if (ganhador_valor > 0 and modo_jogo == "treino"):
                         self.lst_vitoria[ganhador_valor - 1] += 1
+                    terminada = (self.borda_do_jogo.ultima_jogada_venceu(self.logica_jogo) or
+                                 self.borda_do_jogo.checa_borda_preenchida())
+                    self.p1.fim_de_partida(self.logica_jogo, terminada)
+                    self.p2.fim_de_partida(self.logica_jogo, terminada)
+                    if self.registro_partidas is not None and terminada:
+                        self.registro_partidas.registra_partida(self.borda_do_jogo, self.logica_jogo, self.p1,
+                                                                self.p2)
                     tela_fim_de_jogo = True
 
                 if moeda_inserida:
@@ -498,18 +643,44 @@ class VisaoJogo(object):
 
                 milliseconds = self.clock.tick(self.fps)
                 self.playtime += milliseconds / 1000.0
-                pygame.display.flip()
-                self.screen.blit(self.background, (0, 0))
+                self.desenha_quadro()
 
             iteracoes -= 1
+            if modo_jogo == "treino":
+                self.partidas_treino += 1
+                if self.checkpoint is not None and self.checkpoint.devido(self.partidas_treino):
+                    self.checkpoint.grava(self.estado_checkpoint())
 
         if modo_jogo == "treino":
+            if self.checkpoint is not None:
+                if self.jogadores_treino is not None and not self.checkpoint.devido(self.partidas_treino):
+                    self.checkpoint.grava(self.estado_checkpoint())
+                self.checkpoint.espera()
             index = self.lst_vitoria.index(max(self.lst_vitoria))
             self.pc_treinado = self.p1 if index == 0 else self.p2
+            if self.arquivo_tabela_q:
+                self.pc_treinado.jogador.salvar_tabela(self.arquivo_tabela_q)
             self.main_menu()
         else:
             self.visao_fim_de_jogo(ganhador)
 
+    def estado_checkpoint(self):
+        return {'partidas_jogadas': self.partidas_treino, 'lst_vitoria': list(self.lst_vitoria),
+                'jogadores': self.jogadores_treino, 'random': random.getstate()}
+
+    def desenha_quadro(self):
+        """Mostra o quadro atual e copia o background para a tela do próximo quadro"""
+        if self.renderizacao_parcial:
+            retangulos = self.background.retira_retangulos_sujos()
+            if not retangulos:
+                return
+            for retangulo in retangulos:
+                self.screen.blit(self.background, retangulo, retangulo)
+            pygame.display.update(retangulos)
+            return
+        pygame.display.flip()
+        self.screen.blit(self.background, (0, 0))
+
     def desenhar_menu(self):
         font = pygame.font.SysFont('mono', 60, bold=True)
         self.titulo_surface = font.render('CONNECT 4', True, PRETO)
@@ -562,8 +733,7 @@ class VisaoJogo(object):
 
             milliseconds = self.clock.tick(self.fps)
             self.playtime += milliseconds / 1000.0
-            pygame.display.flip()
-            self.screen.blit(self.background, (0, 0))
+            self.desenha_quadro()
 
         if not main_menu:
             pygame.quit()
@@ -599,75 +769,10 @@ class VisaoJogo(object):
         self.background.blit(self.quit_surface, ((self.width - fw) // 2, 410))
 
 
-class LogicaJogo():
-    """Seta as condições de vitória e determina o vencedor"""
-    SEQUENCIA_VITORIA_LENGTH = 4
-
-    def __init__(self, borda):
-        self.borda = borda
-        (numero_linhas, numero_colunas) = self.borda.get_dimensoes()
-        self.linhas_bordas = numero_linhas
-        self.colunas_bordas = numero_colunas
-        self.valor_ganhador = 0
-
-    def checa_fim_de_jogo(self):
-        """Checa se o jogo terminou, que pode ter sido por um empato ou um dos 2 jogadores tiver ganhado"""
-        (ultimo_nodo_visitado, valor_jogador) = self.borda.get_ultima_informacao_preenchida()
-        representacao = self.borda.get_representacao()
-        jogador_ganhador = self.pesquisa_ganhador(ultimo_nodo_visitado, representacao)
-        if jogador_ganhador:
-            self.valor_ganhador = valor_jogador
-
-        return ( jogador_ganhador or self.borda.checa_borda_preenchida() )
-
-    def pesquisa_ganhador(self, ultimo_nodo_visitado, representacao):
-        """"Determina se algum dos 2 jogadores ganhou"""
-        for indices in ultimo_nodo_visitado:
-            nodo_atual = representacao[indices[0]][indices[1]]
-            if (nodo_atual.top_left_score == LogicaJogo.SEQUENCIA_VITORIA_LENGTH or
-                    nodo_atual.top_score == LogicaJogo.SEQUENCIA_VITORIA_LENGTH or
-                    nodo_atual.top_right_score == LogicaJogo.SEQUENCIA_VITORIA_LENGTH or
-                    nodo_atual.left_score == LogicaJogo.SEQUENCIA_VITORIA_LENGTH or
-                    nodo_atual.right_score == LogicaJogo.SEQUENCIA_VITORIA_LENGTH or
-                    nodo_atual.bottom_left_score == LogicaJogo.SEQUENCIA_VITORIA_LENGTH or
-                    nodo_atual.bottom_score == LogicaJogo.SEQUENCIA_VITORIA_LENGTH or
-                    nodo_atual.bottom_right_score == LogicaJogo.SEQUENCIA_VITORIA_LENGTH):
-                return True
-
-        return False
-
-    def determina_nome_ganhador(self):
-        if (self.valor_ganhador == 1):
-            return "AZUL"
-        elif (self.valor_ganhador == 2):
-            return "VERMELHO"
-        else:
-            return "Empate"
-
-    def get_ganhador(self):
-        """"Retorna o valor do tipo da moeda do ganhador"""
-        return self.valor_ganhador
-
-
 # region Jogadores
 
-class Player():
-
-    def __init__(self, tipo_moeda):
-        self.tipo_moeda = tipo_moeda
-
-    def movimento_completo(self):
-        """Faz uma mudança e atualiza qualquer parâmetro de aprendizado, se houver"""
-        pass
-
-    def get_tipo_moeda(self):
-        return self.tipo_moeda
-
-    def set_tipo_moeda(self, tipo_moeda):
-        self.tipo_moeda = tipo_moeda
-
-
 class JogadorHumano(Player):
+    tipo_jogador = "humano"
 
     def __init__(self, tipo_moeda):
         Player.__init__(self, tipo_moeda)
@@ -675,16 +780,30 @@ class JogadorHumano(Player):
 
 class JogadorPC(Player):
 
-    def __init__(self, tipo_moeda, tipo_jogador):
+    def __init__(self, tipo_moeda, tipo_jogador, livro_aberturas=None, **opcoes_jogador):
+        """O livro_aberturas, se houver, é consultado antes de o jogador escolher a ação"""
+        self.tipo_jogador = tipo_jogador
+        self.livro_aberturas = livro_aberturas
         if (tipo_jogador == "random"):
             self.jogador = JogadorRandom(tipo_moeda)
+        elif (tipo_jogador == "solver"):
+            self.jogador = JogadorSolver(tipo_moeda, **opcoes_jogador)
+        elif (tipo_jogador == "mcts"):
+            self.jogador = JogadorMCTS(tipo_moeda, **opcoes_jogador)
         else:
-            self.jogador = JogadorQLearningPlayer(tipo_moeda)
+            self.jogador = JogadorQLearningPlayer(tipo_moeda, **opcoes_jogador)
 
     def movimento_completo(self, moeda, borda, logica_jogo, background):
         acoes = borda.get_acoes_disponiveis()
-        estado = borda.get_estado()
-        acao_escolhida = self.escolher_acao(estado, acoes)
+        estado = self.jogador.le_estado(borda)
+        acao_escolhida = None
+        if self.livro_aberturas is not None:
+            acao_escolhida = self.livro_aberturas.consulta(borda.get_estado(), self.get_tipo_moeda())
+        if acao_escolhida not in acoes:
+            acao_escolhida = self.escolher_acao(estado, acoes)
+        elif isinstance(self.jogador, JogadorQLearningPlayer):
+            # a jogada do livro não é exploratória, então não corta os traços do Q(lambda)
+            self.jogador.acao_exploratoria = False
         moeda.mover_direita(background, acao_escolhida)
         moeda.set_coluna(acao_escolhida)
         fim_de_jogo = borda.insere_moeda(moeda, background, logica_jogo)
@@ -695,9 +814,15 @@ class JogadorPC(Player):
     def get_tipo_moeda(self):
         return self.jogador.get_tipo_moeda()
 
+    def set_tipo_moeda(self, tipo_moeda):
+        self.jogador.set_tipo_moeda(tipo_moeda)
+
     def escolher_acao(self, estado, acoes):
         return self.jogador.escolher_acao(estado, acoes)
 
+    def fim_de_partida(self, logica_jogo, terminada=True):
+        self.jogador.fim_de_partida(logica_jogo, terminada)
+
 
 class JogadorRandom(Player):
 
@@ -707,33 +832,154 @@ class JogadorRandom(Player):
     def escolher_acao(self, estado, acoes):
         return random.choice(acoes)
 
-    def aprender(self, borda, acao, fim_de_jogo, logica_jogo):
+    def aprender(self, borda, acoes, acao_escolhida, fim_de_jogo, logica_jogo):
         """O jogador aleatório não aprende com suas ações"""
         pass
 
 
-class JogadorQLearningPlayer(Player):
+class BufferExperiencia():
+    """Buffer circular com as últimas capacidade transições de um jogador"""
 
-    def __init__(self, tipo_moeda, epsilon=0.2, alpha=0.7, gamma=0.9):
+    def __init__(self, capacidade, chaves_inteiras=False, numero_colunas=TAMANHO_BORDA[1]):
+        self.capacidade = capacidade
+        if chaves_inteiras:
+            self.estados = array('Q', bytes(8 * capacidade))
+            self.estados_seguintes = array('Q', bytes(8 * capacidade))
+        else:
+            self.estados = [None] * capacidade
+            self.estados_seguintes = [None] * capacidade
+        self.acoes = array('l', [0]) * capacidade
+        self.recompensas = array('d', bytes(8 * capacidade))
+        if numero_colunas <= 64:
+            self.mascaras = array('Q', bytes(8 * capacidade))
+        else:
+            self.mascaras = [0] * capacidade
+        self.terminais = array('B', bytes(capacidade))
+        self.proximo = 0
+        self.tamanho = 0
+
+    def __len__(self):
+        return self.tamanho
+
+    def adiciona(self, estado, acao, recompensa, estado_seguinte, mascara, fim_de_jogo):
+        i = self.proximo
+        self.estados[i] = estado
+        self.acoes[i] = acao
+        self.recompensas[i] = recompensa
+        self.estados_seguintes[i] = estado_seguinte
+        self.mascaras[i] = mascara
+        self.terminais[i] = fim_de_jogo
+        self.proximo = (i + 1) % self.capacidade
+        self.tamanho = min(self.tamanho + 1, self.capacidade)
+
+    def termina_ultima(self, recompensa):
+        """Fecha a partida na última transição adicionada, com a recompensa final e sem estado seguinte"""
+        i = (self.proximo - 1) % self.capacidade
+        self.recompensas[i] = recompensa
+        self.mascaras[i] = 0
+        self.terminais[i] = True
+
+    def amostra(self, tamanho_lote):
+        """Sorteia, com reposição, os índices de tamanho_lote transições"""
+        return [random.randrange(self.tamanho) for _ in range(tamanho_lote)]
+
+    def indices_ultima_partida(self):
+        """Índices das transições da última partida, da mais recente para a mais antiga"""
+        indices = []
+        i = self.proximo
+        for _ in range(self.tamanho):
+            i = (i - 1) % self.capacidade
+            if indices and self.terminais[i]:
+                break
+            indices.append(i)
+        return indices
+
+
+class JogadorQLearningPlayer(Player):
+    VALOR_Q_INICIAL = 1.0
+    LIMITE_TRACO = 1e-4  # traços de elegibilidade menores que isso são descartados
+
+    def __init__(self, tipo_moeda, epsilon=0.2, alpha=0.7, gamma=0.9, chave_zobrist=False, tabela_compacta=False,
+                 numero_colunas=TAMANHO_BORDA[1], simetria=False, replay=False, capacidade_replay=50000,
+                 lote_replay=32, razao_replay=1.0, lambda_td=0.0, modo_traco="watkins", aprendendo=True,
+                 limite_estados_q=None, memoria_tabela_q=None, idade_maxima_q=None,
+                 valor_inicial_q=VALOR_Q_INICIAL):
+        """modo_traco é "watkins" (Q(lambda)) ou "sarsa" (SARSA(lambda)); com aprendendo=False a tabela não muda"""
         Player.__init__(self, tipo_moeda)
-        self.q = {}
+        self.numero_colunas = numero_colunas
+        self.valor_inicial_q = valor_inicial_q
+        if limite_estados_q is not None or memoria_tabela_q is not None:
+            self.q = TabelaQLimitada(numero_colunas, valor_inicial_q, limite_estados_q, memoria_tabela_q,
+                                     idade_maxima_q)
+        elif tabela_compacta:
+            self.q = TabelaQCompacta(numero_colunas, valor_inicial_q)
+        else:
+            self.q = {}
         self.epsilon = epsilon  # chance de exploração aleatória
         self.alpha = alpha  # taxa de aprendizado
         self.gamma = gamma  # fator de desconto para recompensas futuras
+        self.chave_zobrist = chave_zobrist  # usa a chave inteira da borda no lugar da tupla de tuplas
+        self.simetria = simetria  # guarda um estado e o seu espelho na mesma entrada da tabela
+        self.visitas = None  # quando é um dicionário, conta as atualizações de cada (estado, acao)
+        self.buffer = BufferExperiencia(capacidade_replay, chave_zobrist, numero_colunas) if replay else None
+        self.lote_replay = lote_replay
+        self.razao_replay = razao_replay
+        self.replay_pendente = 0.0  # atualizações sorteadas devidas e ainda não feitas
+        self.transicao_pendente = False  # se a última transição guardada ainda espera o fim da partida
+        self.atualizacoes_replay = 0
+        self.lambda_td = lambda_td
+        self.modo_traco = modo_traco
+        self.tracos = {}  # {(estado, acao): traço} apenas das jogadas da partida atual
+        self.jogada_pendente = None  # (estado, acao) da última jogada, cujo erro de TD espera o próximo estado
+        self.acao_exploratoria = False  # se a última ação escolhida foi sorteada
+        self.aprendendo = aprendendo
+
+    def le_estado(self, borda):
+        if self.chave_zobrist:
+            if self.simetria:
+                return (borda.get_chave(), borda.get_chave_espelhada())
+            return borda.get_chave()
+        return borda.get_estado()
+
+    def le_estado_anterior(self, borda):
+        if self.chave_zobrist:
+            if self.simetria:
+                return (borda.get_chave_anterior(), borda.get_chave_espelhada_anterior())
+            return borda.get_chave_anterior()
+        return borda.get_estado_anterior()
+
+    def canoniza(self, estado):
+        """Retorna (estado canônico, espelhado); o canônico é o menor entre o estado e o seu espelho"""
+        if not self.simetria:
+            return (estado, False)
+        if isinstance(estado[0], int):
+            (chave, chave_espelhada) = estado
+            if chave_espelhada < chave:
+                return (chave_espelhada, True)
+            return (chave, False)
+        espelho = tuple(linha[::-1] for linha in estado)
+        if espelho < estado:
+            return (espelho, True)
+        return (estado, False)
+
+    def espelha_acao(self, acao, espelhado):
+        if espelhado:
+            return self.numero_colunas - 1 - acao
+        return acao
 
     def getQ(self, estado, acao):
-        if self.q.get((estado, acao)) is None:
-            self.q[(estado, acao)] = 1.0
-        return self.q.get((estado, acao))
+        # entradas ainda não atualizadas valem valor_inicial_q, sem serem inseridas na tabela
+        return self.q.get((estado, acao), self.valor_inicial_q)
 
     def escolher_acao(self, estado, acoes):
-        estado_atual = estado
-
         if random.random() <= self.epsilon:
             acao_escolhida = random.choice(acoes)
+            self.acao_exploratoria = True
             return acao_escolhida
 
-        qs = [self.getQ(estado_atual, a) for a in acoes]
+        self.acao_exploratoria = False
+        (estado_atual, espelhado) = self.canoniza(estado)
+        qs = [self.getQ(estado_atual, self.espelha_acao(a, espelhado)) for a in acoes]
         maxQ = max(qs)
 
         if qs.count(maxQ) > 1:
@@ -746,28 +992,475 @@ class JogadorQLearningPlayer(Player):
         return acoes[i]
 
     def aprender(self, borda, acoes, acao_escolhida, fim_de_jogo, logica_jogo):
+        if not self.aprendendo:
+            return
         recompensa = 0
         if (fim_de_jogo):
-            valor_ganhador = logica_jogo.get_ganhador()
-            if valor_ganhador == 0:
-                recompensa = 0.5
-            elif valor_ganhador == self.tipo_moeda:
-                recompensa = 1
-            else:
-                recompensa = -2
-        estado_anterior = borda.get_estado_anterior()
+            recompensa = self.recompensa_final(logica_jogo)
+        (estado_anterior, espelhado) = self.canoniza(self.le_estado_anterior(borda))
+        acoes_anterior = [self.espelha_acao(a, espelhado) for a in acoes]
+        acao_escolhida = self.espelha_acao(acao_escolhida, espelhado)
+        (estado_resultado, espelhado) = self.canoniza(self.le_estado(borda))
+        acoes_resultado = [self.espelha_acao(a, espelhado) for a in acoes]
+        if self.lambda_td:
+            self.atualiza_com_tracos(estado_anterior, acao_escolhida, acoes_anterior, recompensa, fim_de_jogo)
+        else:
+            self.atualiza_q(estado_anterior, acao_escolhida, recompensa, estado_resultado, acoes_resultado)
+
+        if self.buffer is not None:
+            mascara = 0
+            for a in acoes_resultado:
+                mascara |= 1 << a
+            self.buffer.adiciona(estado_anterior, acao_escolhida, recompensa, estado_resultado, mascara, fim_de_jogo)
+            self.transicao_pendente = not fim_de_jogo
+
+    def atualiza_q(self, estado_anterior, acao_escolhida, recompensa, estado_resultado, acoes_resultado):
         anterior = self.getQ(estado_anterior, acao_escolhida)
-        estado_resultado = borda.get_estado()
-        maxqnew = max([self.getQ(estado_resultado, a) for a in acoes])
+        # uma transição que termina a partida sem estado seguinte não tem ações
+        maxqnew = max([self.getQ(estado_resultado, a) for a in acoes_resultado]) if acoes_resultado else 0.0
         self.q[(estado_anterior, acao_escolhida)] = anterior + self.alpha * ((recompensa + self.gamma * maxqnew) - anterior)
+        if self.visitas is not None:
+            self.visitas[(estado_anterior, acao_escolhida)] = self.visitas.get((estado_anterior, acao_escolhida), 0) + 1
+
+    def recompensa_final(self, logica_jogo):
+        valor_ganhador = logica_jogo.get_ganhador()
+        if valor_ganhador == 0:
+            return 0.5
+        elif valor_ganhador == self.tipo_moeda:
+            return 1
+        return -2
+
+    def atualiza_com_tracos(self, estado, acao, acoes, recompensa, fim_de_jogo):
+        """Atualização TD(lambda) da jogada anterior, com o estado em que o jogador decide agora"""
+        if self.jogada_pendente is not None:
+            if self.modo_traco == "sarsa":
+                proximo_q = self.getQ(estado, acao)
+            else:
+                proximo_q = max([self.getQ(estado, a) for a in acoes])
+            self.aplica_tracos(self.gamma * proximo_q - self.getQ(*self.jogada_pendente))
+            if self.modo_traco != "sarsa" and self.acao_exploratoria:
+                # a ação sorteada não segue a política gulosa, então as anteriores não recebem crédito por ela
+                self.tracos.clear()
+        self.tracos[(estado, acao)] = 1.0
+        self.jogada_pendente = (estado, acao)
+        if fim_de_jogo:
+            self.fecha_partida(recompensa)
+
+    def fim_de_partida(self, logica_jogo, terminada=True):
+        """Na partida terminada pelo adversário a última jogada recebe a derrota ou o empate; com replay, a
+        partida é repetida aqui"""
+        if terminada and self.aprendendo:
+            if self.jogada_pendente is not None:
+                self.fecha_partida(self.recompensa_final(logica_jogo))
+            if self.buffer is not None:
+                if self.transicao_pendente:
+                    self.buffer.termina_ultima(self.recompensa_final(logica_jogo))
+                self.repete_experiencias()
+        self.transicao_pendente = False
+        self.jogada_pendente = None
+        self.tracos.clear()
+
+    def fecha_partida(self, recompensa):
+        self.aplica_tracos(recompensa - self.getQ(*self.jogada_pendente))
+        self.jogada_pendente = None
+        self.tracos.clear()
+
+    def aplica_tracos(self, delta):
+        decaimento = self.gamma * self.lambda_td
+        for (chave, traco) in list(self.tracos.items()):
+            self.q[chave] = self.getQ(chave[0], chave[1]) + self.alpha * delta * traco
+            if self.visitas is not None:
+                self.visitas[chave] = self.visitas.get(chave, 0) + 1
+            traco *= decaimento
+            if traco < JogadorQLearningPlayer.LIMITE_TRACO:
+                del self.tracos[chave]
+            else:
+                self.tracos[chave] = traco
+
+    def repete_transicao(self, i):
+        buffer = self.buffer
+        mascara = buffer.mascaras[i]
+        self.atualiza_q(buffer.estados[i], buffer.acoes[i], buffer.recompensas[i], buffer.estados_seguintes[i],
+                        [a for a in range(self.numero_colunas) if mascara >> a & 1])
+
+    def repete_experiencias(self):
+        """Chamado por fim_de_partida: propaga a recompensa final repetindo a partida de trás para frente e
+        faz as atualizações em lote devidas pela razao_replay"""
+        indices_partida = self.buffer.indices_ultima_partida()
+        for i in indices_partida:
+            self.repete_transicao(i)
+        self.atualizacoes_replay += len(indices_partida)
+
+        self.replay_pendente += self.razao_replay * len(indices_partida)
+        while self.replay_pendente >= self.lote_replay and len(self.buffer) >= self.lote_replay:
+            for i in self.buffer.amostra(self.lote_replay):
+                self.repete_transicao(i)
+            self.replay_pendente -= self.lote_replay
+            self.atualizacoes_replay += self.lote_replay
+
+    def linhas_por_chave(self):
+        """Agrupa a tabela Q em {chave Zobrist do estado: valores de todas as ações}"""
+        linhas = {}
+        if isinstance(self.q, dict):
+            itens = self.q.items()
+        else:
+            itens = (((estado, acao), valor) for (estado, valores) in self.q.itens_por_estado()
+                     for (acao, valor) in enumerate(valores))
+        for ((estado, acao), valor) in itens:
+            if isinstance(estado, tuple):
+                zobrist = TabelaZobrist.para_dimensoes(len(estado), len(estado[0]))
+                chave = zobrist.chave_do_estado(estado)
+                if self.simetria:
+                    # no arquivo a orientação canônica é a de menor chave, como em canoniza com chave_zobrist
+                    (estado, espelhado) = self.canoniza(
+                        (chave, zobrist.chave_do_estado(tuple(linha[::-1] for linha in estado))))
+                    acao = self.espelha_acao(acao, espelhado)
+                else:
+                    estado = chave
+            if estado not in linhas:
+                linhas[estado] = [self.valor_inicial_q] * self.numero_colunas
+            linhas[estado][acao] = valor
+        return linhas
+
+    def salvar_tabela(self, caminho):
+        """Grava a tabela Q no formato lido por TabelaQArquivo, substituindo o arquivo de forma atômica"""
+        linhas = self.linhas_por_chave()
+        chaves = array('Q', sorted(linhas))
+        valores = array('d')
+        for chave in chaves:
+            valores.extend(linhas[chave])
+        if sys.byteorder != 'little':
+            chaves.byteswap()
+            valores.byteswap()
+
+        caminho_temporario = caminho + '.tmp'
+        with open(caminho_temporario, 'wb') as arquivo:
+            flags = TabelaQArquivo.FLAG_SIMETRIA if self.simetria else 0
+            arquivo.write(TabelaQArquivo.CABECALHO.pack(TabelaQArquivo.ASSINATURA, TabelaQArquivo.VERSAO,
+                                                        self.numero_colunas, len(chaves), flags))
+            chaves.tofile(arquivo)
+            valores.tofile(arquivo)
+        os.replace(caminho_temporario, caminho)
+
+    def carregar_tabela(self, caminho, mapear=True):
+        """Passa a usar a tabela Q do arquivo, o que também faz o jogador usar as chaves Zobrist como estado
+        e a simetria com que a tabela foi gravada"""
+        tabela = TabelaQArquivo(caminho, mapear)
+        if tabela.numero_colunas != self.numero_colunas:
+            tabela.fechar()
+            raise ValueError('A tabela Q do arquivo foi treinada para %d colunas' % tabela.numero_colunas)
+        tabela.alteracoes.valor_inicial = self.valor_inicial_q
+        self.q = tabela
+        self.chave_zobrist = True
+        self.simetria = tabela.simetria
+
+# endregion
+
+# region Treino sem interface
+
+class TreinoSemInterface(object):
+    """Joga partidas de treino entre dois JogadorPC sem pygame: sem Moeda, sem background e sem limite de fps"""
+
+    def __init__(self, tipo_jogador_p1="qlearner", tipo_jogador_p2="qlearner", tipo_borda="linhas", opcoes_solver=None,
+                 opcoes_mcts=None, numero_linhas=TAMANHO_BORDA[0], numero_colunas=TAMANHO_BORDA[1],
+                 sequencia_vitoria=LogicaJogo.SEQUENCIA_VITORIA_LENGTH, registro_partidas=None, **opcoes_jogador):
+        """tipo_borda é linhas, grafo ou bitboard; as opções de cada tipo de jogador vão para os seus jogadores"""
+        self.tipo_borda = tipo_borda
+        self.numero_linhas = numero_linhas
+        self.numero_colunas = numero_colunas
+        self.sequencia_vitoria = sequencia_vitoria
+        self.registro_partidas = registro_partidas
+        opcoes_jogador.setdefault('numero_colunas', numero_colunas)
+        opcoes_solver = dict(opcoes_solver or {})
+        opcoes_solver.setdefault('sequencia_vitoria', sequencia_vitoria)
+        opcoes_mcts = dict(opcoes_mcts or {})
+        opcoes_mcts.setdefault('sequencia_vitoria', sequencia_vitoria)
+        opcoes_por_tipo = {"qlearner": opcoes_jogador, "solver": opcoes_solver, "mcts": opcoes_mcts}
+        self.p1 = JogadorPC(1, tipo_jogador_p1, **opcoes_por_tipo.get(tipo_jogador_p1, {}))
+        self.p2 = JogadorPC(2, tipo_jogador_p2, **opcoes_por_tipo.get(tipo_jogador_p2, {}))
+        self.borda_do_jogo = None
+        self.pc_treinado = None
+        self.lst_vitoria = [0, 0]
+        self.empates = 0
+        self.partidas_jogadas = 0
+        self.tempo_treino = 0.0
+
+    def inicializa_variaveis(self):
+        """Inicializa a borda lógica do jogo e sorteia as moedas dos jogadores, como em VisaoJogo"""
+        if self.borda_do_jogo is not None:
+            self.borda_do_jogo.reset()
+            self.logica_jogo.reset()
+        else:
+            if self.tipo_borda == "bitboard":
+                self.borda_do_jogo = BordaBitboard(self.numero_linhas, self.numero_colunas)
+            else:
+                self.borda_do_jogo = Borda(self.numero_linhas, self.numero_colunas, sem_interface=True,
+                                           deteccao_grafo=(self.tipo_borda == "grafo"))
+            self.logica_jogo = LogicaJogo(self.borda_do_jogo, self.sequencia_vitoria)
+        primeiro_tipo_moeda = random.randint(1, 2)
+        segundo_tipo_moeda = 2 if primeiro_tipo_moeda == 1 else 1
+        self.p1.set_tipo_moeda(primeiro_tipo_moeda)
+        self.p2.set_tipo_moeda(segundo_tipo_moeda)
+
+    def jogar_partida(self):
+        """Joga uma partida completa e retorna o valor do tipo da moeda do ganhador (0 em caso de empate)"""
+        self.inicializa_variaveis()
+        tipo_atual = random.randint(1, 2)
+        turno_p1 = (self.p1.get_tipo_moeda() == tipo_atual)
+        fim_de_jogo = False
+
+        while not fim_de_jogo:
+            jogador_atual = self.p1 if turno_p1 else self.p2
+            moeda = MoedaLogica(tipo_atual)
+            fim_de_jogo = jogador_atual.movimento_completo(moeda, self.borda_do_jogo, self.logica_jogo, None)
+            tipo_atual = 1 if tipo_atual == 2 else 2
+            turno_p1 = not turno_p1
+        self.p1.fim_de_partida(self.logica_jogo)
+        self.p2.fim_de_partida(self.logica_jogo)
+
+        if self.registro_partidas is not None:
+            self.registro_partidas.registra_partida(self.borda_do_jogo, self.logica_jogo, self.p1, self.p2)
+        return self.logica_jogo.get_ganhador()
+
+    def estado_checkpoint(self):
+        return {'partidas_jogadas': self.partidas_jogadas, 'lst_vitoria': list(self.lst_vitoria),
+                'empates': self.empates, 'jogadores': (self.p1, self.p2), 'random': random.getstate()}
+
+    def restaura(self, estado):
+        """Continua o treino a partir de um estado lido com CheckpointTreino.carrega"""
+        (self.p1, self.p2) = estado['jogadores']
+        self.partidas_jogadas = estado['partidas_jogadas']
+        self.lst_vitoria = list(estado['lst_vitoria'])
+        self.empates = estado.get('empates', 0)
+        random.setstate(estado['random'])
+
+    def treinar(self, iteracoes, intervalo_relatorio=0, checkpoint=None):
+        """Joga as partidas de treino e escolhe o pc_treinado pelo número de vitórias de cada jogador"""
+        inicio = time.perf_counter()
+        for partida in range(1, iteracoes + 1):
+            ganhador_valor = self.jogar_partida()
+            if ganhador_valor == 0:
+                self.empates += 1
+            elif ganhador_valor == self.p1.get_tipo_moeda():
+                self.lst_vitoria[0] += 1
+            else:
+                self.lst_vitoria[1] += 1
+            self.partidas_jogadas += 1
+            if checkpoint is not None and checkpoint.devido(self.partidas_jogadas):
+                checkpoint.grava(self.estado_checkpoint())
+
+            if intervalo_relatorio and partida % intervalo_relatorio == 0:
+                self.tempo_treino += time.perf_counter() - inicio
+                inicio = time.perf_counter()
+                print(self.resumo())
+
+        self.tempo_treino += time.perf_counter() - inicio
+        if checkpoint is not None:
+            if not checkpoint.devido(self.partidas_jogadas):
+                checkpoint.grava(self.estado_checkpoint())
+            checkpoint.espera()
+        index = self.lst_vitoria.index(max(self.lst_vitoria))
+        self.pc_treinado = self.p1 if index == 0 else self.p2
+        # um adversário que não aprende (random, solver ou mcts) não pode ser o pc_treinado
+        if not isinstance(self.pc_treinado.jogador, JogadorQLearningPlayer):
+            self.pc_treinado = self.p2 if index == 0 else self.p1
+
+        return self.pc_treinado
+
+    def resumo(self):
+        partidas_por_segundo = self.partidas_jogadas / self.tempo_treino if self.tempo_treino > 0 else 0.0
+        return "partidas: %d | vitorias p1: %d | vitorias p2: %d | empates: %d | %.1f partidas/s" % (
+            self.partidas_jogadas, self.lst_vitoria[0], self.lst_vitoria[1], self.empates, partidas_por_segundo)
 
 # endregion
 
 
 if __name__ == "__main__":
+    # Connect4_TreinoParalelo e Connect4_Instrumentacao importam Connect4_Main: rodando como script, eles devem usar
+    # este módulo e não carregar uma segunda cópia das classes
+    sys.modules.setdefault('Connect4_Main', sys.modules[__name__])
+    from Connect4_Instrumentacao import Instrumentacao
+    from Connect4_TreinoParalelo import TreinoHogwild, TreinoParalelo
+
     parser = argparse.ArgumentParser()
     parser.add_argument('iterations', nargs='?', default=30, action="store",
                         help="Armazene o número de iterações para treinar o computador")
+    parser.add_argument('--tabela-q', default=None, action="store",
+                        help="Arquivo da tabela Q: carregado pelos modos de jogo e gravado ao fim do treino")
+    parser.add_argument('--livro-aberturas', default=None, action="store",
+                        help="Livro de aberturas consultado pelo computador no modo vs PC")
+    parser.add_argument('--sem-interface', action="store_true",
+                        help="Treina o computador sem abrir a janela do pygame e sem limite de fps")
+    parser.add_argument('--relatorio', default=0, type=int, action="store",
+                        help="Imprime o progresso do treino sem interface a cada N partidas")
+    parser.add_argument('--processos', default=1, type=int, action="store",
+                        help="Número de processos usados pelo treino sem interface")
+    parser.add_argument('--partidas-por-rodada', default=500, type=int, action="store",
+                        help="Partidas que cada processo joga entre duas junções das tabelas Q")
+    parser.add_argument('--hogwild', action="store_true",
+                        help="Com --processos > 1, os processos atualizam as mesmas tabelas Q em memória "
+                             "compartilhada, sem travas, em vez de juntar cópias a cada rodada")
+    parser.add_argument('--capacidade-compartilhada', default=1 << 20, type=int, action="store",
+                        help="Número máximo de estados de cada tabela Q compartilhada do --hogwild")
+    parser.add_argument('--borda', default="linhas", choices=["linhas", "grafo", "bitboard"], action="store",
+                        help="Representação da borda usada no treino sem interface")
+    parser.add_argument('--linhas', default=TAMANHO_BORDA[0], type=int, action="store",
+                        help="Número de linhas da borda")
+    parser.add_argument('--colunas', default=TAMANHO_BORDA[1], type=int, action="store",
+                        help="Número de colunas da borda")
+    parser.add_argument('--sequencia-vitoria', default=LogicaJogo.SEQUENCIA_VITORIA_LENGTH, type=int, action="store",
+                        help="Número de moedas seguidas necessárias para vencer")
+    parser.add_argument('--chave-zobrist', action="store_true",
+                        help="Usa a chave Zobrist da borda como estado na tabela Q")
+    parser.add_argument('--simetria', action="store_true",
+                        help="Guarda um estado e o seu espelho na mesma entrada da tabela Q")
+    parser.add_argument('--tabela-compacta', action="store_true",
+                        help="Guarda a tabela Q com uma linha de valores por estado")
+    parser.add_argument('--limite-estados-q', default=None, type=int, action="store",
+                        help="Número máximo de estados da tabela Q; os menos usados dão lugar aos novos")
+    parser.add_argument('--memoria-tabela-q', default=None, type=float, action="store",
+                        help="Memória máxima da tabela Q em MB, pela estimativa de bytes usados")
+    parser.add_argument('--idade-maxima-q', default=None, type=int, action="store",
+                        help="Estados sem atualização há mais desse número de atualizações podem sair da tabela Q")
+    parser.add_argument('--replay', action="store_true",
+                        help="Guarda as transições em um buffer e as repete em lotes ao fim de cada partida")
+    parser.add_argument('--capacidade-replay', default=50000, type=int, action="store",
+                        help="Número máximo de transições guardadas no buffer de replay de cada jogador")
+    parser.add_argument('--lote-replay', default=32, type=int, action="store",
+                        help="Transições sorteadas do buffer em cada lote de atualizações")
+    parser.add_argument('--razao-replay', default=1.0, type=float, action="store",
+                        help="Atualizações sorteadas do buffer para cada jogada real")
+    parser.add_argument('--lambda-td', default=0.0, type=float, action="store",
+                        help="Lambda dos traços de elegibilidade; 0 mantém a atualização de um passo")
+    parser.add_argument('--modo-traco', default="watkins", choices=["watkins", "sarsa"], action="store",
+                        help="Atualização com traços: Q(lambda) de Watkins ou SARSA(lambda)")
+    parser.add_argument('--valor-inicial-q', default=JogadorQLearningPlayer.VALOR_Q_INICIAL, type=float,
+                        action="store",
+                        help="Valor das ações ainda não atualizadas; use o mesmo ao continuar uma tabela gravada")
+    parser.add_argument('--adversario', default="qlearner", choices=["qlearner", "random", "solver", "mcts"], action="store",
+                        help="Tipo do computador no modo vs PC e do segundo jogador no treino sem interface")
+    parser.add_argument('--profundidade-solver', default=8, type=int, action="store",
+                        help="Profundidade máxima da busca do solver")
+    parser.add_argument('--limite-nodos-solver', default=None, type=int, action="store",
+                        help="Número máximo de nodos visitados pelo solver em cada jogada")
+    parser.add_argument('--tempo-mcts', default=None, type=float, action="store",
+                        help="Segundos de busca da MCTS por jogada; sem ele é usado --playouts-mcts")
+    parser.add_argument('--playouts-mcts', default=2000, type=int, action="store",
+                        help="Número de simulações da MCTS por jogada")
+    parser.add_argument('--registro-partidas', default=None, action="store",
+                        help="Arquivo onde as partidas jogadas são acrescentadas, comprimidas em blocos; não pode ser "
+                             "usado no treino com vários processos")
+    parser.add_argument('--partidas-por-bloco', default=1024, type=int, action="store",
+                        help="Partidas de cada bloco comprimido do registro de partidas")
+    parser.add_argument('--checkpoint', default=None, action="store",
+                        help="Arquivo onde o estado do treino é gravado periodicamente; não pode ser usado no treino "
+                             "com vários processos")
+    parser.add_argument('--intervalo-checkpoint', default=1000, type=int, action="store",
+                        help="Grava o checkpoint a cada N partidas de treino")
+    parser.add_argument('--retomar', action="store_true",
+                        help="Continua o treino do arquivo de --checkpoint, se ele existir; o número de iterações "
+                             "inclui as partidas já jogadas")
+    parser.add_argument('--renderizacao-parcial', action="store_true",
+                        help="Redesenha apenas as áreas da tela que mudaram, sem redesenhar quadros iguais")
+    parser.add_argument('--instrumentar', action="store_true",
+                        help="Mede o tempo de cada fase do laço do jogo e imprime um resumo ao fim")
+    parser.add_argument('--instrumentacao-arquivo', default=None, action="store",
+                        help="Arquivo onde os instantâneos da instrumentação são acrescentados como linhas JSON")
+    parser.add_argument('--instrumentacao-intervalo', default=0, type=int, action="store",
+                        help="Grava um instantâneo da instrumentação a cada N partidas")
     args = parser.parse_args()
-
-    VisaoJogo(1200, 760).main_menu(int(args.iterations))
+    if args.playouts_mcts <= 0 or (args.tempo_mcts is not None and args.tempo_mcts <= 0):
+        parser.error("--playouts-mcts e --tempo-mcts devem ser positivos")
+    opcoes_solver = {'profundidade_maxima': args.profundidade_solver, 'limite_nodos': args.limite_nodos_solver}
+    opcoes_mcts = {'tempo_limite': args.tempo_mcts, 'limite_playouts': args.playouts_mcts}
+    opcoes_aprendizado = {'replay': args.replay, 'capacidade_replay': args.capacidade_replay,
+                          'lote_replay': args.lote_replay, 'razao_replay': args.razao_replay,
+                          'lambda_td': args.lambda_td, 'modo_traco': args.modo_traco,
+                          'limite_estados_q': args.limite_estados_q, 'idade_maxima_q': args.idade_maxima_q,
+                          'valor_inicial_q': args.valor_inicial_q,
+                          'memoria_tabela_q': (int(args.memoria_tabela_q * 1024 * 1024) if args.memoria_tabela_q
+                                               else None)}
+    instrumentacao = None
+    if args.instrumentar or args.instrumentacao_arquivo:
+        # no treino com vários processos apenas o processo principal é medido
+        instrumentacao = Instrumentacao(args.instrumentacao_arquivo, args.instrumentacao_intervalo).ativar()
+    registro_partidas = None
+    if args.registro_partidas:
+        if args.sem_interface and args.processos > 1:
+            parser.error("--registro-partidas não pode ser usado com --processos maior que 1")
+        try:
+            registro_partidas = RegistroPartidas(args.registro_partidas, args.linhas, args.colunas,
+                                                 args.sequencia_vitoria, args.partidas_por_bloco)
+        except ValueError as e:
+            parser.error(str(e))
+    if (args.checkpoint or args.retomar) and args.sem_interface and args.processos > 1:
+        parser.error("--checkpoint e --retomar não podem ser usados com --processos maior que 1")
+    checkpoint = CheckpointTreino(args.checkpoint, args.intervalo_checkpoint) if args.checkpoint else None
+    estado_treino = None
+    if checkpoint is not None and args.retomar and os.path.exists(args.checkpoint):
+        try:
+            estado_treino = CheckpointTreino.carrega(args.checkpoint)
+        except ValueError as e:
+            parser.error(str(e))
+        print("retomando o treino da partida %d" % estado_treino['partidas_jogadas'])
+
+    if args.sem_interface:
+        if args.processos > 1 and args.hogwild:
+            treino = TreinoHogwild(args.processos, args.capacidade_compartilhada, numero_linhas=args.linhas,
+                                   sequencia_vitoria=args.sequencia_vitoria, numero_colunas=args.colunas,
+                                   simetria=args.simetria, **opcoes_aprendizado)
+            if args.tabela_q and os.path.exists(args.tabela_q):
+                treino.carregar_tabela(args.tabela_q)
+        elif args.processos > 1:
+            treino = TreinoParalelo(args.processos, args.partidas_por_rodada, numero_linhas=args.linhas,
+                                    sequencia_vitoria=args.sequencia_vitoria, numero_colunas=args.colunas,
+                                    simetria=args.simetria, **opcoes_aprendizado)
+            if args.tabela_q and os.path.exists(args.tabela_q):
+                treino.carregar_tabela(args.tabela_q)
+        else:
+            treino = TreinoSemInterface(tipo_jogador_p2=args.adversario, tipo_borda=args.borda,
+                                        opcoes_solver=opcoes_solver, opcoes_mcts=opcoes_mcts,
+                                        numero_linhas=args.linhas, numero_colunas=args.colunas,
+                                        sequencia_vitoria=args.sequencia_vitoria,
+                                        chave_zobrist=args.chave_zobrist,
+                                        tabela_compacta=args.tabela_compacta, simetria=args.simetria,
+                                        registro_partidas=registro_partidas, **opcoes_aprendizado)
+            if estado_treino is not None:
+                treino.restaura(estado_treino)
+            elif args.tabela_q and os.path.exists(args.tabela_q):
+                for jogador_pc in (treino.p1, treino.p2):
+                    if isinstance(jogador_pc.jogador, JogadorQLearningPlayer):
+                        jogador_pc.jogador.carregar_tabela(args.tabela_q)
+        if args.processos > 1:
+            treino.treinar(int(args.iterations), args.relatorio)
+        else:
+            treino.treinar(max(0, int(args.iterations) - treino.partidas_jogadas), args.relatorio, checkpoint)
+        print(treino.resumo())
+        if args.adversario in ("solver", "mcts") and args.processos <= 1:
+            print(treino.p2.jogador.resumo())
+        tabela_q = treino.pc_treinado.jogador.q
+        if not isinstance(tabela_q, dict):
+            print("tabela q: %d estados, %.1f KB" % (len(tabela_q), tabela_q.bytes_usados() / 1024.0))
+        if isinstance(tabela_q, TabelaQLimitada):
+            print(tabela_q.resumo())
+        if args.tabela_q:
+            treino.pc_treinado.jogador.salvar_tabela(args.tabela_q)
+    else:
+        opcoes_pc = {"solver": opcoes_solver, "mcts": opcoes_mcts}.get(args.adversario, {})
+        livro_aberturas = LivroAberturas(args.livro_aberturas) if args.livro_aberturas else None
+        VisaoJogo(1200, 760, arquivo_tabela_q=args.tabela_q, tipo_pc=args.adversario, opcoes_pc=opcoes_pc,
+                  livro_aberturas=livro_aberturas, renderizacao_parcial=args.renderizacao_parcial,
+                  numero_linhas=args.linhas, numero_colunas=args.colunas,
+                  sequencia_vitoria=args.sequencia_vitoria, registro_partidas=registro_partidas,
+                  checkpoint=checkpoint, estado_treino=estado_treino).main_menu(int(args.iterations))
+
+    if registro_partidas is not None:
+        registro_partidas.fechar()
+        print("registro de partidas: %d partidas, %d bytes gravados" % (registro_partidas.partidas_registradas,
+                                                                      registro_partidas.bytes_gravados))
+
+    if instrumentacao is not None:
+        instrumentacao.grava()
+        if instrumentacao.arquivo is not None:
+            print(instrumentacao.resumo())
+        instrumentacao.desativar()
@@ -0,0 +1,133 @@
+import queue
+import struct
+import threading
+import zlib
+
+from Connect4_Logica import TAMANHO_BORDA, LogicaJogo
+
+
+class RegistroPartidas(object):
+    """Acrescenta as partidas jogadas a um arquivo, em blocos comprimidos com zlib"""
+    ASSINATURA = b'C4RP'
+    CABECALHO_BLOCO = struct.Struct('<4sBBBIII')
+    PARTIDA = struct.Struct('<BBBBH')
+    TIPOS_JOGADOR = ("humano", "random", "qlearner", "solver", "mcts")
+
+    def __init__(self, caminho, numero_linhas=TAMANHO_BORDA[0], numero_colunas=TAMANHO_BORDA[1],
+                 sequencia_vitoria=LogicaJogo.SEQUENCIA_VITORIA_LENGTH, partidas_por_bloco=1024, nivel_compressao=6):
+        if max(numero_linhas, numero_colunas, sequencia_vitoria) > 255:
+            raise ValueError("O registro de partidas só guarda bordas com até 255 linhas e colunas e sequência de "
+                             "vitória até 255: %dx%d, sequência %d" % (numero_linhas, numero_colunas,
+                                                                        sequencia_vitoria))
+        self.caminho = caminho
+        self.dimensoes = (numero_linhas, numero_colunas, sequencia_vitoria)
+        self.partidas_por_bloco = partidas_por_bloco
+        self.nivel_compressao = nivel_compressao
+        self.bloco = bytearray()
+        self.partidas_no_bloco = 0
+        self.partidas_registradas = 0
+        self.bytes_gravados = 0
+        self.erro = None
+        # poucos blocos na fila: se a gravação ficar para trás, registra passa a esperar por ela
+        self.fila = queue.Queue(maxsize=4)
+        self.arquivo = open(caminho, 'ab')
+        self.escritor = threading.Thread(target=self.grava_blocos, daemon=True)
+        self.escritor.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+    def registra(self, jogadores, primeiro, colunas, ganhador):
+        """jogadores são os tipos dos jogadores das moedas 1 e 2, primeiro é a moeda que começou e colunas é a
+        sequência das colunas jogadas"""
+        self.bloco += RegistroPartidas.PARTIDA.pack(RegistroPartidas.TIPOS_JOGADOR.index(jogadores[0]),
+                                                    RegistroPartidas.TIPOS_JOGADOR.index(jogadores[1]),
+                                                    primeiro, ganhador, len(colunas))
+        self.bloco += bytes(colunas)
+        self.partidas_no_bloco += 1
+        self.partidas_registradas += 1
+        if self.partidas_no_bloco >= self.partidas_por_bloco:
+            self.descarrega()
+
+    def registra_partida(self, borda, logica_jogo, jogador_a, jogador_b):
+        """Registra a partida que acabou de terminar na borda, jogada entre jogador_a e jogador_b"""
+        colunas = borda.get_colunas_jogadas()
+        if not colunas:
+            return
+        primeiro = borda.ultimo_valor if len(colunas) % 2 else 3 - borda.ultimo_valor
+        tipos = {jogador_a.get_tipo_moeda(): jogador_a.tipo_jogador,
+                 jogador_b.get_tipo_moeda(): jogador_b.tipo_jogador}
+        self.registra((tipos[1], tipos[2]), primeiro, colunas, logica_jogo.get_ganhador())
+
+    def descarrega(self):
+        """Entrega o bloco atual à thread de gravação"""
+        if not self.partidas_no_bloco:
+            return
+        if self.erro is not None:
+            raise self.erro
+        self.fila.put((bytes(self.bloco), self.partidas_no_bloco))
+        self.bloco = bytearray()
+        self.partidas_no_bloco = 0
+
+    def grava_blocos(self):
+        while True:
+            item = self.fila.get()
+            if item is None:
+                break
+            (dados, partidas) = item
+            try:
+                comprimido = zlib.compress(dados, self.nivel_compressao)
+                (numero_linhas, numero_colunas, sequencia_vitoria) = self.dimensoes
+                self.arquivo.write(RegistroPartidas.CABECALHO_BLOCO.pack(
+                    RegistroPartidas.ASSINATURA, numero_linhas, numero_colunas, sequencia_vitoria, partidas,
+                    len(comprimido), zlib.crc32(comprimido)))
+                self.arquivo.write(comprimido)
+                self.arquivo.flush()
+                self.bytes_gravados += RegistroPartidas.CABECALHO_BLOCO.size + len(comprimido)
+            except OSError as e:
+                self.erro = e
+
+    def fechar(self):
+        """Grava as partidas pendentes e espera a thread de gravação terminar"""
+        if self.arquivo.closed:
+            return
+        self.descarrega()
+        self.fila.put(None)
+        self.escritor.join()
+        self.arquivo.close()
+        if self.erro is not None:
+            raise self.erro
+
+
+def le_registro_partidas(caminho):
+    """Lê um arquivo de RegistroPartidas um bloco por vez, gerando para cada partida a tupla
+    (dimensoes, jogadores, primeiro, colunas, ganhador), com dimensoes = (linhas, colunas, sequencia_vitoria)"""
+    tamanho_cabecalho = RegistroPartidas.CABECALHO_BLOCO.size
+    tamanho_partida = RegistroPartidas.PARTIDA.size
+    tipos = RegistroPartidas.TIPOS_JOGADOR
+    with open(caminho, 'rb') as arquivo:
+        while True:
+            cabecalho = arquivo.read(tamanho_cabecalho)
+            if len(cabecalho) < tamanho_cabecalho:
+                return
+            (assinatura, numero_linhas, numero_colunas, sequencia_vitoria, partidas, tamanho, crc) = \
+                RegistroPartidas.CABECALHO_BLOCO.unpack(cabecalho)
+            if assinatura != RegistroPartidas.ASSINATURA:
+                raise ValueError('Arquivo de registro de partidas inválido: %s' % caminho)
+            comprimido = arquivo.read(tamanho)
+            if len(comprimido) < tamanho or zlib.crc32(comprimido) != crc:
+                # bloco gravado pela metade no fim do arquivo
+                return
+            dados = zlib.decompress(comprimido)
+            dimensoes = (numero_linhas, numero_colunas, sequencia_vitoria)
+            posicao = 0
+            for _ in range(partidas):
+                (jogador_1, jogador_2, primeiro, ganhador, jogadas) = RegistroPartidas.PARTIDA.unpack_from(dados,
+                                                                                                      posicao)
+                posicao += tamanho_partida
+                yield (dimensoes, (tipos[jogador_1], tipos[jogador_2]), primeiro, dados[posicao:posicao + jogadas],
+                       ganhador)
+                posicao += jogadas
@@ -0,0 +1,259 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from array import array
+
+from Connect4_LivroAberturas import LivroAberturas
+from Connect4_Logica import TAMANHO_BORDA, BordaBitboard, ColunaPreenchidaTotalmente, LogicaJogo, MoedaLogica
+from Connect4_Main import JogadorPC
+
+PORTA_PADRAO = 8765
+
+
+class SessaoJogo(object):
+    """Uma partida entre um cliente e o computador, com a sua própria borda e lógica"""
+
+    def __init__(self, numero_linhas, numero_colunas, sequencia_vitoria, tipo_moeda_cliente):
+        self.borda = BordaBitboard(numero_linhas, numero_colunas)
+        self.logica_jogo = LogicaJogo(self.borda, sequencia_vitoria)
+        self.tipo_moeda_cliente = tipo_moeda_cliente
+        self.tipo_moeda_pc = 3 - tipo_moeda_cliente
+        self.fim_de_jogo = False
+
+    def resposta(self, sessao_id, **campos):
+        resposta = {'sessao': sessao_id, 'estado': [list(linha) for linha in self.borda.get_estado()],
+                    'fim': self.fim_de_jogo, 'ganhador': self.logica_jogo.get_ganhador()}
+        resposta.update(campos)
+        return resposta
+
+
+class ServidorConnect4(object):
+    """Servidor de partidas contra o computador, com uma mensagem JSON por linha e um JogadorPC compartilhado"""
+
+    def __init__(self, jogador_pc, numero_linhas=TAMANHO_BORDA[0], numero_colunas=TAMANHO_BORDA[1],
+                 sequencia_vitoria=LogicaJogo.SEQUENCIA_VITORIA_LENGTH, amostras_latencia=10000,
+                 limite_sessoes=100000, politica=None, lote_minimo=8):
+        self.jogador_pc = jogador_pc
+        self.politica = politica
+        self.lote_minimo = lote_minimo
+        self.pendentes = []  # [(sessao, futuro)] esperando a próxima escolha em lote
+        self.lotes = 0
+        self.jogadas_em_lote = 0
+        self.numero_linhas = numero_linhas
+        self.numero_colunas = numero_colunas
+        self.sequencia_vitoria = sequencia_vitoria
+        self.limite_sessoes = limite_sessoes
+        self.sessoes = {}
+        self.proximo_id = 1
+        # as últimas amostras_latencia latências de jogar, em segundos, em um buffer circular
+        self.latencias = array('d', bytes(8 * amostras_latencia))
+        self.total_latencias = 0
+        self.inicio = time.perf_counter()
+        self.sessoes_iniciadas = 0
+        self.sessoes_terminadas = 0
+        self.conexoes = 0
+
+    def joga_sessao(self, sessao):
+        self.jogador_pc.set_tipo_moeda(sessao.tipo_moeda_pc)
+        moeda = MoedaLogica(sessao.tipo_moeda_pc)
+        sessao.fim_de_jogo = self.jogador_pc.movimento_completo(moeda, sessao.borda, sessao.logica_jogo, None)
+        return moeda.get_coluna()
+
+    async def jogada_pc(self, sessao):
+        if self.politica is None:
+            return self.joga_sessao(sessao)
+        futuro = asyncio.get_running_loop().create_future()
+        self.pendentes.append((sessao, futuro))
+        if len(self.pendentes) == 1:
+            asyncio.get_running_loop().call_soon(self.joga_lote_pendente)
+        return await futuro
+
+    def joga_lote_pendente(self):
+        """Escolhe de uma vez as jogadas de todas as sessões pendentes; o livro de aberturas, se houver, tem
+        prioridade sobre a política. Com menos de lote_minimo pendentes elas são escolhidas uma a uma"""
+        (pendentes, self.pendentes) = (self.pendentes, [])
+        if len(pendentes) < self.lote_minimo:
+            for (sessao, futuro) in pendentes:
+                acao = self.joga_sessao(sessao)
+                if not futuro.cancelled():
+                    futuro.set_result(acao)
+            return
+        (acoes, _) = self.politica.escolher_acoes_bordas([sessao.borda for (sessao, _) in pendentes],
+                                                         self.jogador_pc.jogador.epsilon)
+        livro_aberturas = self.jogador_pc.livro_aberturas
+        for ((sessao, futuro), acao) in zip(pendentes, acoes.tolist()):
+            if livro_aberturas is not None:
+                acao_livro = livro_aberturas.consulta(sessao.borda.get_estado(), sessao.tipo_moeda_pc)
+                if acao_livro in sessao.borda.get_acoes_disponiveis():
+                    acao = acao_livro
+            moeda = MoedaLogica(sessao.tipo_moeda_pc)
+            moeda.set_coluna(acao)
+            sessao.fim_de_jogo = sessao.borda.insere_moeda(moeda, None, sessao.logica_jogo)
+            if not futuro.cancelled():
+                futuro.set_result(acao)
+        self.lotes += 1
+        self.jogadas_em_lote += len(pendentes)
+
+    def termina(self, sessao_id):
+        if self.sessoes.pop(sessao_id, None) is not None:
+            self.sessoes_terminadas += 1
+
+    async def nova_partida(self, pedido, sessoes_da_conexao):
+        if len(self.sessoes) >= self.limite_sessoes:
+            raise ValueError('Limite de sessões atingido')
+        cliente_comeca = pedido.get('cliente_comeca', True)
+        sessao = SessaoJogo(self.numero_linhas, self.numero_colunas, self.sequencia_vitoria,
+                            1 if cliente_comeca else 2)
+        sessao_id = self.proximo_id
+        self.proximo_id += 1
+        self.sessoes[sessao_id] = sessao
+        sessoes_da_conexao.add(sessao_id)
+        self.sessoes_iniciadas += 1
+        campos = {'moeda': sessao.tipo_moeda_cliente}
+        if not cliente_comeca:
+            campos['coluna_pc'] = await self.jogada_pc(sessao)
+        return sessao.resposta(sessao_id, **campos)
+
+    async def jogar(self, pedido):
+        inicio = time.perf_counter()
+        sessao_id = pedido['sessao']
+        sessao = self.sessoes.get(sessao_id)
+        if sessao is None:
+            raise ValueError('Sessão inexistente: %s' % sessao_id)
+        coluna = pedido['coluna']
+        if not isinstance(coluna, int) or not 0 <= coluna < self.numero_colunas:
+            raise ValueError('Coluna inválida: %s' % coluna)
+        moeda = MoedaLogica(sessao.tipo_moeda_cliente)
+        moeda.set_coluna(coluna)
+        sessao.fim_de_jogo = sessao.borda.insere_moeda(moeda, None, sessao.logica_jogo)
+        campos = {}
+        if not sessao.fim_de_jogo:
+            campos['coluna_pc'] = await self.jogada_pc(sessao)
+        resposta = sessao.resposta(sessao_id, **campos)
+        if sessao.fim_de_jogo:
+            self.termina(sessao_id)
+        self.latencias[self.total_latencias % len(self.latencias)] = time.perf_counter() - inicio
+        self.total_latencias += 1
+        return resposta
+
+    def estatisticas(self):
+        amostras = sorted(self.latencias[:min(self.total_latencias, len(self.latencias))])
+        tempo = time.perf_counter() - self.inicio
+
+        def percentil(p):
+            return 1000.0 * amostras[min(len(amostras) - 1, int(p * len(amostras)))] if amostras else 0.0
+
+        return {
+            'sessoes_ativas': len(self.sessoes),
+            'sessoes_iniciadas': self.sessoes_iniciadas,
+            'sessoes_terminadas': self.sessoes_terminadas,
+            'sessoes_por_segundo': self.sessoes_terminadas / tempo if tempo > 0 else 0.0,
+            'jogadas': self.total_latencias,
+            'conexoes': self.conexoes,
+            'jogadas_por_lote': self.jogadas_em_lote / self.lotes if self.lotes else 0.0,
+            'latencia_ms': {'p50': percentil(0.50), 'p90': percentil(0.90), 'p99': percentil(0.99),
+                            'max': 1000.0 * amostras[-1] if amostras else 0.0},
+        }
+
+    async def processa(self, pedido, sessoes_da_conexao):
+        comando = pedido.get('comando')
+        if comando == 'nova_partida':
+            return await self.nova_partida(pedido, sessoes_da_conexao)
+        elif comando == 'jogar':
+            return await self.jogar(pedido)
+        elif comando == 'encerrar':
+            self.termina(pedido['sessao'])
+            sessoes_da_conexao.discard(pedido['sessao'])
+            return {'sessao': pedido['sessao'], 'encerrada': True}
+        elif comando == 'estatisticas':
+            return self.estatisticas()
+        raise ValueError('Comando desconhecido: %s' % comando)
+
+    async def atende(self, leitor, escritor):
+        """Atende uma conexão; as sessões abertas por ela são descartadas quando ela fecha"""
+        self.conexoes += 1
+        sessoes_da_conexao = set()
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                pedido = {}
+                try:
+                    pedido = json.loads(linha)
+                    resposta = await self.processa(pedido, sessoes_da_conexao)
+                except (ValueError, KeyError, TypeError, AttributeError, ColunaPreenchidaTotalmente) as e:
+                    resposta = {'erro': str(e)}
+                if isinstance(pedido, dict) and 'id' in pedido:
+                    resposta['id'] = pedido['id']
+                escritor.write(json.dumps(resposta).encode() + b'\n')
+                await escritor.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for sessao_id in sessoes_da_conexao:
+                self.sessoes.pop(sessao_id, None)
+            self.conexoes -= 1
+            escritor.close()
+
+    async def serve(self, host='127.0.0.1', porta=PORTA_PADRAO):
+        servidor = await asyncio.start_server(self.atende, host, porta, limit=1 << 16, backlog=1024)
+        print("servidor ouvindo em %s:%d" % (host, porta))
+        async with servidor:
+            await servidor.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1', action="store")
+    parser.add_argument('--porta', default=PORTA_PADRAO, type=int, action="store")
+    parser.add_argument('--adversario', default="qlearner", choices=["qlearner", "random", "solver", "mcts"],
+                        action="store", help="Tipo do computador compartilhado por todas as sessões")
+    parser.add_argument('--tabela-q', default=None, action="store",
+                        help="Arquivo da tabela Q do computador qlearner, aberto uma única vez com mmap")
+    parser.add_argument('--livro-aberturas', default=None, action="store",
+                        help="Livro de aberturas consultado pelo computador")
+    parser.add_argument('--profundidade-solver', default=6, type=int, action="store",
+                        help="Profundidade máxima da busca do solver")
+    parser.add_argument('--playouts-mcts', default=500, type=int, action="store",
+                        help="Número de simulações da MCTS por jogada")
+    parser.add_argument('--linhas', default=TAMANHO_BORDA[0], type=int, action="store",
+                        help="Número de linhas da borda")
+    parser.add_argument('--colunas', default=TAMANHO_BORDA[1], type=int, action="store",
+                        help="Número de colunas da borda")
+    parser.add_argument('--sequencia-vitoria', default=LogicaJogo.SEQUENCIA_VITORIA_LENGTH, type=int, action="store",
+                        help="Número de moedas seguidas necessárias para vencer")
+    parser.add_argument('--lote', action="store_true",
+                        help="Escolhe juntas, com o NumPy, as jogadas do qlearner pedidas ao mesmo tempo; só compensa "
+                             "com muitas conexões simultâneas")
+    parser.add_argument('--lote-minimo', default=8, type=int, action="store",
+                        help="Número mínimo de jogadas pendentes para escolhê-las em lote; abaixo disso cada uma é "
+                             "escolhida sozinha, que é mais rápido")
+    parser.add_argument('--limite-sessoes', default=100000, type=int, action="store",
+                        help="Número máximo de sessões abertas ao mesmo tempo")
+    args = parser.parse_args()
+    if args.playouts_mcts <= 0:
+        parser.error("--playouts-mcts deve ser positivo")
+
+    opcoes = {
+        "qlearner": {'epsilon': 0.0, 'aprendendo': False, 'numero_colunas': args.colunas},
+        "solver": {'profundidade_maxima': args.profundidade_solver, 'sequencia_vitoria': args.sequencia_vitoria},
+        "mcts": {'limite_playouts': args.playouts_mcts, 'sequencia_vitoria': args.sequencia_vitoria},
+    }.get(args.adversario, {})
+    livro_aberturas = LivroAberturas(args.livro_aberturas) if args.livro_aberturas else None
+    jogador_pc = JogadorPC(2, args.adversario, livro_aberturas, **opcoes)
+    if args.adversario == "qlearner" and args.tabela_q and os.path.exists(args.tabela_q):
+        jogador_pc.jogador.carregar_tabela(args.tabela_q)
+
+    politica = None
+    if args.lote and args.adversario == "qlearner":
+        from Connect4_Vetorizado import PoliticaVetorizada
+        politica = PoliticaVetorizada(jogador_pc.jogador)
+    servidor = ServidorConnect4(jogador_pc, args.linhas, args.colunas, args.sequencia_vitoria,
+                                limite_sessoes=args.limite_sessoes, politica=politica, lote_minimo=args.lote_minimo)
+    try:
+        asyncio.run(servidor.serve(args.host, args.porta))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,199 @@
+import time
+
+from Connect4_Logica import BordaBitboard, LogicaJogo, Player
+
+
+class OrcamentoEsgotado(Exception):
+    """Interrompe a busca de um jogador quando o seu limite de nodos para a jogada é atingido"""
+    pass
+
+
+class JogadorSolver(Player):
+    """Busca negamax com poda alfa-beta sobre bitboards, com aprofundamento iterativo e tabela de transposição"""
+    VITORIA = 1000000
+    EXATO = 0
+    LIMITE_INFERIOR = 1
+    LIMITE_SUPERIOR = 2
+
+    def __init__(self, tipo_moeda, profundidade_maxima=8, limite_nodos=None, tamanho_tabela=262147,
+                 sequencia_vitoria=LogicaJogo.SEQUENCIA_VITORIA_LENGTH):
+        Player.__init__(self, tipo_moeda)
+        self.profundidade_maxima = profundidade_maxima
+        self.limite_nodos = limite_nodos
+        self.tamanho_tabela = tamanho_tabela
+        self.sequencia_vitoria = sequencia_vitoria
+        self.dimensoes = None
+        self.nodos = 0
+        self.nodos_total = 0
+        self.tempo_total = 0.0
+        self.consultas_tabela = 0
+        self.acertos_tabela = 0
+        self.profundidade_alcancada = 0
+        self.valor_escolhido = 0  # valor da última jogada escolhida, do ponto de vista de quem jogou
+
+    def prepara_dimensoes(self, numero_linhas, numero_colunas):
+        """Calcula as máscaras das colunas e limpa a tabela de transposição quando o tamanho da borda muda"""
+        if self.dimensoes == (numero_linhas, numero_colunas):
+            return
+        self.dimensoes = (numero_linhas, numero_colunas)
+        self.borda = BordaBitboard(numero_linhas, numero_colunas)
+        altura_coluna = self.borda.altura_coluna
+        self.total_espacos = numero_linhas * numero_colunas
+        self.base = [1 << (j * altura_coluna) for j in range(numero_colunas)]
+        self.mascaras_colunas = [((1 << numero_linhas) - 1) << (j * altura_coluna) for j in range(numero_colunas)]
+        self.topos = [1 << (numero_linhas - 1 + j * altura_coluna) for j in range(numero_colunas)]
+        self.ordem = sorted(range(numero_colunas), key=lambda j: abs(2 * j - (numero_colunas - 1)))
+        self.pesos = [numero_colunas - abs(2 * j - (numero_colunas - 1)) for j in range(numero_colunas)]
+
+        self.tabela_chaves = [None] * self.tamanho_tabela
+        self.tabela_valores = [0] * self.tamanho_tabela
+        self.tabela_profundidades = [-1] * self.tamanho_tabela
+        self.tabela_flags = [JogadorSolver.EXATO] * self.tamanho_tabela
+        self.tabela_melhores = [-1] * self.tamanho_tabela
+
+    def posicao_do_estado(self, estado):
+        """Converte um estado de Borda.get_estado em (moedas de quem joga, moedas ocupadas, número de jogadas)"""
+        self.prepara_dimensoes(len(estado), len(estado[0]))
+        numero_linhas = len(estado)
+        posicao = 0
+        mascara = 0
+        for (i, linha) in enumerate(estado):
+            for (j, tipo_moeda) in enumerate(linha):
+                if tipo_moeda:
+                    bit = 1 << (j * self.borda.altura_coluna + numero_linhas - 1 - i)
+                    mascara |= bit
+                    if tipo_moeda == self.tipo_moeda:
+                        posicao |= bit
+        return (posicao, mascara, bin(mascara).count('1'))
+
+    def venceria(self, posicao, mascara, coluna):
+        jogada = (mascara + self.base[coluna]) & self.mascaras_colunas[coluna]
+        return self.borda.checa_sequencia(posicao | jogada, self.sequencia_vitoria)
+
+    def avalia(self, posicao, mascara):
+        oponente = posicao ^ mascara
+        valor = 0
+        for j in range(len(self.pesos)):
+            coluna = self.mascaras_colunas[j]
+            valor += self.pesos[j] * (bin(posicao & coluna).count('1') - bin(oponente & coluna).count('1'))
+        return valor
+
+    def negamax(self, posicao, mascara, jogadas, profundidade, alfa, beta):
+        """Valor da posição para quem joga; vitórias mais rápidas valem mais"""
+        self.nodos += 1
+        if self.limite_nodos and self.nodos > self.limite_nodos:
+            raise OrcamentoEsgotado()
+        if jogadas == self.total_espacos:
+            return 0
+        for coluna in self.ordem:
+            if not mascara & self.topos[coluna] and self.venceria(posicao, mascara, coluna):
+                return JogadorSolver.VITORIA - jogadas
+        if profundidade == 0:
+            return self.avalia(posicao, mascara)
+
+        chave = posicao + mascara
+        # com um tamanho primo todos os bits da chave influenciam o índice
+        indice = chave % self.tamanho_tabela
+        melhor_coluna = -1
+        self.consultas_tabela += 1
+        if self.tabela_chaves[indice] == chave:
+            self.acertos_tabela += 1
+            melhor_coluna = self.tabela_melhores[indice]
+            if self.tabela_profundidades[indice] >= profundidade:
+                valor = self.tabela_valores[indice]
+                flag = self.tabela_flags[indice]
+                if flag == JogadorSolver.EXATO:
+                    return valor
+                elif flag == JogadorSolver.LIMITE_INFERIOR:
+                    alfa = max(alfa, valor)
+                else:
+                    beta = min(beta, valor)
+                if alfa >= beta:
+                    return valor
+
+        alfa_original = alfa
+        melhor_valor = -JogadorSolver.VITORIA - 1
+        ordem = self.ordem if melhor_coluna < 0 else [melhor_coluna] + [j for j in self.ordem if j != melhor_coluna]
+        for coluna in ordem:
+            if mascara & self.topos[coluna]:
+                continue
+            valor = -self.negamax(posicao ^ mascara, mascara | (mascara + self.base[coluna]), jogadas + 1,
+                                  profundidade - 1, -beta, -alfa)
+            if valor > melhor_valor:
+                melhor_valor = valor
+                melhor_coluna = coluna
+            alfa = max(alfa, valor)
+            if alfa >= beta:
+                break
+
+        # substitui a entrada guardada apenas por uma busca de profundidade igual ou maior
+        if self.tabela_chaves[indice] is None or self.tabela_chaves[indice] == chave or \
+                profundidade >= self.tabela_profundidades[indice]:
+            if melhor_valor <= alfa_original:
+                flag = JogadorSolver.LIMITE_SUPERIOR
+            elif melhor_valor >= beta:
+                flag = JogadorSolver.LIMITE_INFERIOR
+            else:
+                flag = JogadorSolver.EXATO
+            self.tabela_chaves[indice] = chave
+            self.tabela_valores[indice] = melhor_valor
+            self.tabela_profundidades[indice] = profundidade
+            self.tabela_flags[indice] = flag
+            self.tabela_melhores[indice] = melhor_coluna
+
+        return melhor_valor
+
+    def escolher_acao(self, estado, acoes):
+        inicio = time.perf_counter()
+        self.nodos = 0
+        (posicao, mascara, jogadas) = self.posicao_do_estado(estado)
+        ordem_raiz = [j for j in self.ordem if j in acoes]
+        melhor_acao = ordem_raiz[0]
+
+        for coluna in ordem_raiz:
+            if self.venceria(posicao, mascara, coluna):
+                self.valor_escolhido = JogadorSolver.VITORIA - jogadas
+                self.tempo_total += time.perf_counter() - inicio
+                return coluna
+
+        try:
+            for profundidade in range(1, self.profundidade_maxima + 1):
+                alfa = -JogadorSolver.VITORIA - 1
+                acao_profundidade = ordem_raiz[0]
+                for coluna in ordem_raiz:
+                    valor = -self.negamax(posicao ^ mascara, mascara | (mascara + self.base[coluna]), jogadas + 1,
+                                          profundidade - 1, -JogadorSolver.VITORIA - 1, -alfa)
+                    if valor > alfa:
+                        alfa = valor
+                        acao_profundidade = coluna
+                melhor_acao = acao_profundidade
+                self.valor_escolhido = alfa
+                self.profundidade_alcancada = profundidade
+                # a próxima iteração começa pela melhor ação desta
+                ordem_raiz = [melhor_acao] + [j for j in ordem_raiz if j != melhor_acao]
+                if abs(alfa) > JogadorSolver.VITORIA - self.total_espacos - 1 or \
+                        jogadas + profundidade >= self.total_espacos:
+                    break
+        except OrcamentoEsgotado:
+            pass
+
+        self.nodos_total += self.nodos
+        self.tempo_total += time.perf_counter() - inicio
+        return melhor_acao
+
+    def aprender(self, borda, acoes, acao_escolhida, fim_de_jogo, logica_jogo):
+        """O solver não aprende com suas ações"""
+        pass
+
+    def estatisticas(self):
+        return {
+            'nodos': self.nodos_total,
+            'nodos_por_segundo': self.nodos_total / self.tempo_total if self.tempo_total > 0 else 0.0,
+            'taxa_acerto_tabela': self.acertos_tabela / self.consultas_tabela if self.consultas_tabela else 0.0,
+            'profundidade_alcancada': self.profundidade_alcancada,
+        }
+
+    def resumo(self):
+        return "solver: %(nodos)d nodos | %(nodos_por_segundo).0f nodos/s | acertos na tabela: " \
+               "%(taxa_acerto_tabela).1f%% | profundidade: %(profundidade_alcancada)d" % dict(
+                   self.estatisticas(), taxa_acerto_tabela=100 * self.estatisticas()['taxa_acerto_tabela'])
@@ -0,0 +1,515 @@
+import bisect
+import mmap
+import os
+import struct
+import sys
+from array import array
+from multiprocessing import shared_memory
+
+
+class TabelaQCompacta():
+    """Tabela Q com uma linha contígua de numero_colunas valores por estado, indexada por (estado, acao)"""
+
+    def __init__(self, numero_colunas, valor_inicial=1.0):
+        self.numero_colunas = numero_colunas
+        self.valor_inicial = valor_inicial
+        self.indices = {}
+        self.valores = array('d')
+        self.bytes_chaves = 0
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __contains__(self, chave):
+        return chave[0] in self.indices
+
+    def get(self, chave, default=None):
+        (estado, acao) = chave
+        linha = self.indices.get(estado)
+        if linha is None:
+            return default
+        return self.valores[linha * self.numero_colunas + acao]
+
+    def __getitem__(self, chave):
+        valor = self.get(chave)
+        if valor is None:
+            raise KeyError(chave)
+        return valor
+
+    def __setitem__(self, chave, valor):
+        (estado, acao) = chave
+        self.valores[self.indice_linha(estado) * self.numero_colunas + acao] = valor
+
+    def indice_linha(self, estado):
+        """Retorna o índice da linha do estado, criando-a com o valor inicial se ela ainda não existir"""
+        linha = self.indices.get(estado)
+        if linha is None:
+            linha = len(self.indices)
+            self.indices[estado] = linha
+            self.valores.extend([self.valor_inicial] * self.numero_colunas)
+            self.bytes_chaves += self.bytes_do_estado(estado)
+        return linha
+
+    @staticmethod
+    def bytes_do_estado(estado):
+        if isinstance(estado, tuple):
+            return sys.getsizeof(estado) + sum(sys.getsizeof(x) for x in estado)
+        return sys.getsizeof(estado)
+
+    def set_linha(self, estado, valores):
+        inicio = self.indice_linha(estado) * self.numero_colunas
+        self.valores[inicio:inicio + self.numero_colunas] = array('d', valores)
+
+    def linha(self, estado):
+        """Retorna os valores de todas as ações do estado, ou None se o estado nunca foi atualizado"""
+        linha = self.indices.get(estado)
+        if linha is None:
+            return None
+        inicio = linha * self.numero_colunas
+        return self.valores[inicio:inicio + self.numero_colunas]
+
+    def bytes_usados(self):
+        """Estimativa da memória usada: dicionário de índices, chaves e array de valores"""
+        return (sys.getsizeof(self.indices) + self.bytes_chaves +
+                self.valores.buffer_info()[1] * self.valores.itemsize)
+
+    def itens_por_estado(self):
+        """Itera sobre (estado, valores de todas as ações)"""
+        for estado in self.indices:
+            yield (estado, self.linha(estado))
+
+
+class TabelaQLimitada(TabelaQCompacta):
+    """TabelaQCompacta com no máximo capacidade estados ou memoria_maxima bytes, que reaproveita linhas por CLOCK"""
+    LIMITE_CONTADOR = 7
+
+    def __init__(self, numero_colunas, valor_inicial=1.0, capacidade=None, memoria_maxima=None, idade_maxima=None):
+        TabelaQCompacta.__init__(self, numero_colunas, valor_inicial)
+        if capacidade is None and memoria_maxima is None:
+            raise ValueError('A tabela Q limitada precisa de uma capacidade ou de uma memória máxima')
+        self.capacidade = capacidade
+        self.memoria_maxima = memoria_maxima
+        self.idade_maxima = idade_maxima
+        self.linha_inicial = array('d', [valor_inicial] * numero_colunas)
+        self.estados = []  # estado de cada linha, para tirá-lo do dicionário quando a linha é reaproveitada
+        self.contadores = array('B')
+        self.ultima_atualizacao = array('Q')
+        self.relogio = 0  # número de atualizações feitas; é o tempo de ultima_atualizacao
+        self.ponteiro = 0
+        self.consultas = 0
+        self.acertos = 0
+        self.remocoes = 0
+
+    def get(self, chave, default=None):
+        self.consultas += 1
+        linha = self.indices.get(chave[0])
+        if linha is None:
+            return default
+        self.acertos += 1
+        return self.valores[linha * self.numero_colunas + chave[1]]
+
+    def __setitem__(self, chave, valor):
+        (estado, acao) = chave
+        linha = self.indice_linha(estado)
+        self.valores[linha * self.numero_colunas + acao] = valor
+        self.toca(linha)
+
+    def set_linha(self, estado, valores):
+        linha = self.indice_linha(estado)
+        inicio = linha * self.numero_colunas
+        self.valores[inicio:inicio + self.numero_colunas] = array('d', valores)
+        self.toca(linha)
+
+    def toca(self, linha):
+        self.relogio += 1
+        self.ultima_atualizacao[linha] = self.relogio
+        if self.contadores[linha] < TabelaQLimitada.LIMITE_CONTADOR:
+            self.contadores[linha] += 1
+
+    def cheia(self):
+        return (self.capacidade is not None and len(self.indices) >= self.capacidade) or \
+            (self.memoria_maxima is not None and self.bytes_usados() >= self.memoria_maxima)
+
+    def indice_linha(self, estado):
+        linha = self.indices.get(estado)
+        if linha is not None:
+            return linha
+        if self.indices and self.cheia():
+            linha = self.escolhe_linha_removida()
+            inicio = linha * self.numero_colunas
+            self.valores[inicio:inicio + self.numero_colunas] = self.linha_inicial
+            self.estados[linha] = estado
+            self.contadores[linha] = 0
+        else:
+            linha = len(self.estados)
+            self.estados.append(estado)
+            self.valores.extend(self.linha_inicial)
+            self.contadores.append(0)
+            self.ultima_atualizacao.append(self.relogio)
+        self.indices[estado] = linha
+        self.bytes_chaves += self.bytes_do_estado(estado)
+        return linha
+
+    def escolhe_linha_removida(self):
+        """Avança o ponteiro do CLOCK até uma linha que pode sair, tira o seu estado da tabela e retorna a linha"""
+        total = len(self.estados)
+        while True:
+            linha = self.ponteiro
+            self.ponteiro = (linha + 1) % total
+            if self.contadores[linha] == 0:
+                break
+            if self.idade_maxima is not None and self.relogio - self.ultima_atualizacao[linha] > self.idade_maxima:
+                break
+            inicio = linha * self.numero_colunas
+            if self.valores[inicio:inicio + self.numero_colunas] == self.linha_inicial:
+                break
+            self.contadores[linha] -= 1
+        estado = self.estados[linha]
+        del self.indices[estado]
+        self.bytes_chaves -= self.bytes_do_estado(estado)
+        self.remocoes += 1
+        return linha
+
+    def bytes_usados(self):
+        """Estimativa de TabelaQCompacta.bytes_usados mais a lista de estados e os contadores de cada linha"""
+        return (TabelaQCompacta.bytes_usados(self) + sys.getsizeof(self.estados) +
+                len(self.estados) * (self.contadores.itemsize + self.ultima_atualizacao.itemsize))
+
+    def estatisticas(self):
+        return {
+            'estados': len(self.indices),
+            'bytes': self.bytes_usados(),
+            'consultas': self.consultas,
+            'taxa_acerto': self.acertos / self.consultas if self.consultas else 0.0,
+            'remocoes': self.remocoes,
+        }
+
+    def resumo(self):
+        return "tabela q limitada: %(estados)d estados | %(bytes)d bytes | acertos: %(taxa_acerto).1f%% | " \
+               "remoções: %(remocoes)d" % dict(self.estatisticas(),
+                                                taxa_acerto=100 * self.estatisticas()['taxa_acerto'])
+
+
+class TabelaQArquivo():
+    """Tabela Q de um arquivo gravado por JogadorQLearningPlayer.salvar_tabela, consultada por busca binária"""
+    ASSINATURA = b'C4QT'
+    VERSAO = 1
+    CABECALHO = struct.Struct('<4sIIQI')
+    FLAG_SIMETRIA = 1
+
+    def __init__(self, caminho, mapear=True):
+        self.caminho = caminho
+        self.mapear = mapear
+        self.arquivo = open(caminho, 'rb')
+        cabecalho = self.arquivo.read(TabelaQArquivo.CABECALHO.size)
+        if len(cabecalho) < TabelaQArquivo.CABECALHO.size:
+            self.arquivo.close()
+            raise ValueError('Arquivo de tabela Q inválido: %s' % caminho)
+        (assinatura, versao, self.numero_colunas, self.numero_estados, flags) = TabelaQArquivo.CABECALHO.unpack(
+            cabecalho)
+        self.simetria = bool(flags & TabelaQArquivo.FLAG_SIMETRIA)
+
+        inicio_chaves = TabelaQArquivo.CABECALHO.size
+        inicio_valores = inicio_chaves + 8 * self.numero_estados
+        fim_valores = inicio_valores + 8 * self.numero_estados * self.numero_colunas
+        # um arquivo truncado ou com lixo no fim não tem o tamanho indicado pelo cabeçalho
+        if (assinatura != TabelaQArquivo.ASSINATURA or versao != TabelaQArquivo.VERSAO or
+                os.fstat(self.arquivo.fileno()).st_size != fim_valores):
+            self.arquivo.close()
+            raise ValueError('Arquivo de tabela Q inválido: %s' % caminho)
+        self.mapa = None
+        if mapear and self.numero_estados > 0 and sys.byteorder == 'little':
+            self.mapa = mmap.mmap(self.arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+            memoria = memoryview(self.mapa)
+            self.chaves = memoria[inicio_chaves:inicio_valores].cast('Q')
+            self.valores = memoria[inicio_valores:fim_valores].cast('d')
+        else:
+            self.chaves = array('Q')
+            self.chaves.fromfile(self.arquivo, self.numero_estados)
+            self.valores = array('d')
+            self.valores.fromfile(self.arquivo, self.numero_estados * self.numero_colunas)
+            if sys.byteorder != 'little':
+                self.chaves.byteswap()
+                self.valores.byteswap()
+            self.arquivo.close()
+
+        self.alteracoes = TabelaQCompacta(self.numero_colunas)
+
+    def __getstate__(self):
+        """Usado pelos checkpoints: o arquivo não é alterado, então bastam o caminho e as alterações"""
+        return {'caminho': self.caminho, 'mapear': self.mapear, 'alteracoes': self.alteracoes}
+
+    def __setstate__(self, estado):
+        self.__init__(estado['caminho'], estado['mapear'])
+        self.alteracoes = estado['alteracoes']
+
+    def fechar(self):
+        if self.mapa is not None:
+            self.chaves.release()
+            self.valores.release()
+            self.mapa.close()
+            self.mapa = None
+        self.arquivo.close()
+
+    def indice_no_arquivo(self, estado):
+        i = bisect.bisect_left(self.chaves, estado)
+        if i < self.numero_estados and self.chaves[i] == estado:
+            return i
+        return None
+
+    def __len__(self):
+        novos = sum(1 for estado in self.alteracoes.indices if self.indice_no_arquivo(estado) is None)
+        return self.numero_estados + novos
+
+    def __contains__(self, chave):
+        return chave[0] in self.alteracoes or self.indice_no_arquivo(chave[0]) is not None
+
+    def get(self, chave, default=None):
+        valor = self.alteracoes.get(chave)
+        if valor is not None:
+            return valor
+        i = self.indice_no_arquivo(chave[0])
+        if i is None:
+            return default
+        return self.valores[i * self.numero_colunas + chave[1]]
+
+    def __getitem__(self, chave):
+        valor = self.get(chave)
+        if valor is None:
+            raise KeyError(chave)
+        return valor
+
+    def __setitem__(self, chave, valor):
+        estado = chave[0]
+        if estado not in self.alteracoes.indices:
+            # copia a linha do arquivo antes da primeira alteração do estado
+            linha = self.linha(estado)
+            if linha is not None:
+                for acao in range(self.numero_colunas):
+                    self.alteracoes[(estado, acao)] = linha[acao]
+        self.alteracoes[chave] = valor
+
+    def linha(self, estado):
+        linha = self.alteracoes.linha(estado)
+        if linha is not None:
+            return linha
+        i = self.indice_no_arquivo(estado)
+        if i is None:
+            return None
+        inicio = i * self.numero_colunas
+        return self.valores[inicio:inicio + self.numero_colunas]
+
+    def bytes_usados(self):
+        """Memória fora do arquivo mapeado: apenas as alterações feitas desde que ele foi aberto"""
+        if self.mapa is None:
+            return (self.chaves.buffer_info()[1] * self.chaves.itemsize +
+                    self.valores.buffer_info()[1] * self.valores.itemsize + self.alteracoes.bytes_usados())
+        return self.alteracoes.bytes_usados()
+
+    def itens_por_estado(self):
+        for i in range(self.numero_estados):
+            estado = self.chaves[i]
+            if estado not in self.alteracoes.indices:
+                inicio = i * self.numero_colunas
+                yield (estado, self.valores[inicio:inicio + self.numero_colunas])
+        for item in self.alteracoes.itens_por_estado():
+            yield item
+
+
+class TabelaQCompartilhada():
+    """Tabela Q em memória compartilhada, alterada por vários processos sem travas (Hogwild), sobre chaves Zobrist"""
+    CARGA_MAXIMA = 0.9
+    # capacidade, numero_colunas, processos, se a borda vazia já tem linha, valor_inicial e estados carregados
+    CAMPOS_CABECALHO = 6
+    CONTADORES = 3  # atualizações, inserções e descartados de cada processo
+
+    def __init__(self, numero_colunas, capacidade, processos=1, valor_inicial=1.0):
+        """Cria um bloco novo para capacidade estados, arredondada para cima para uma potência de 2"""
+        capacidade = TabelaQCompartilhada.arredonda_capacidade(capacidade)
+        tamanho = 8 * (TabelaQCompartilhada.CAMPOS_CABECALHO + TabelaQCompartilhada.CONTADORES * processos +
+                       capacidade + (capacidade + 1) * numero_colunas)
+        self.memoria = shared_memory.SharedMemory(create=True, size=tamanho)
+        self.dono = True
+        struct.pack_into('<qqqqdq', self.memoria.buf, 0, capacidade, numero_colunas, processos, 0, valor_inicial, 0)
+        self.mapeia(0)
+        self.valores[:] = array('d', [valor_inicial]) * len(self.valores)
+
+    @staticmethod
+    def arredonda_capacidade(capacidade):
+        return 1 << max(4, (capacidade - 1).bit_length())
+
+    @staticmethod
+    def cabem(estados, capacidade):
+        """Se uma tabela criada com capacidade comporta estados estados carregados"""
+        return estados <= int(TabelaQCompartilhada.CARGA_MAXIMA * TabelaQCompartilhada.arredonda_capacidade(capacidade))
+
+    @staticmethod
+    def conecta(nome, processo):
+        """Abre em outro processo o bloco de nome memoria.name; processo é o índice dos contadores que ele usa"""
+        tabela = TabelaQCompartilhada.__new__(TabelaQCompartilhada)
+        tabela.memoria = shared_memory.SharedMemory(name=nome)
+        tabela.dono = False
+        tabela.mapeia(processo)
+        return tabela
+
+    def mapeia(self, processo):
+        buffer = self.memoria.buf
+        fim_cabecalho = 8 * TabelaQCompartilhada.CAMPOS_CABECALHO
+        self.cabecalho = buffer[:fim_cabecalho].cast('q')
+        (self.capacidade, self.numero_colunas, self.processos) = self.cabecalho[:3]
+        self.valor_inicial = struct.unpack_from('<d', buffer, 8 * 4)[0]
+        self.mascara = self.capacidade - 1
+        fim_contadores = fim_cabecalho + 8 * TabelaQCompartilhada.CONTADORES * self.processos
+        fim_chaves = fim_contadores + 8 * self.capacidade
+        self.contadores = buffer[fim_cabecalho:fim_contadores].cast('q')
+        self.chaves = buffer[fim_contadores:fim_chaves].cast('Q')
+        self.valores = buffer[fim_chaves:fim_chaves + 8 * (self.capacidade + 1) * self.numero_colunas].cast('d')
+        self.processo = processo
+        self.base_contadores = TabelaQCompartilhada.CONTADORES * processo
+        self.atualiza_cota()
+
+    def atualiza_cota(self):
+        livres = int(TabelaQCompartilhada.CARGA_MAXIMA * self.capacidade) - self.cabecalho[5]
+        self.cota_insercoes = livres // self.processos
+
+    def fechar(self):
+        """Solta o bloco neste processo e, no processo que o criou, o apaga"""
+        for visao in (self.cabecalho, self.contadores, self.chaves, self.valores):
+            visao.release()
+        self.memoria.close()
+        if self.dono:
+            self.memoria.unlink()
+
+    def carrega(self, linhas):
+        """Copia as linhas [(estado, valores)] para a tabela antes de os processos se conectarem, sem gastar as
+        cotas; os processos dividem o espaço que sobra"""
+        carregados = self.cabecalho[5]
+        try:
+            for (estado, valores) in linhas:
+                if estado == 0:
+                    self.cabecalho[3] = 1
+                    i = self.capacidade
+                else:
+                    i = estado & self.mascara
+                    while self.chaves[i] != 0 and self.chaves[i] != estado:
+                        i = (i + 1) & self.mascara
+                    if self.chaves[i] == 0:
+                        if carregados >= int(TabelaQCompartilhada.CARGA_MAXIMA * self.capacidade):
+                            raise ValueError('A tabela compartilhada não comporta mais que %d estados carregados'
+                                             % carregados)
+                        self.chaves[i] = estado
+                        carregados += 1
+                inicio = i * self.numero_colunas
+                self.valores[inicio:inicio + self.numero_colunas] = array('d', valores)
+        finally:
+            # mesmo depois do erro as cotas não podem contar com os espaços já ocupados
+            self.cabecalho[5] = carregados
+            self.atualiza_cota()
+
+    def espaco(self, estado):
+        """Índice da linha do estado, ou None se ele não está na tabela"""
+        if estado == 0:
+            return self.capacidade if self.cabecalho[3] else None
+        chaves = self.chaves
+        i = estado & self.mascara
+        while True:
+            chave = chaves[i]
+            if chave == estado:
+                return i
+            if chave == 0:
+                return None
+            i = (i + 1) & self.mascara
+
+    def espaco_para_escrita(self, estado):
+        """Índice da linha do estado, ocupando um espaço vazio se ele ainda não está na tabela, ou None se a tabela
+        está cheia"""
+        if estado == 0:
+            self.cabecalho[3] = 1
+            return self.capacidade
+        chaves = self.chaves
+        i = estado & self.mascara
+        while True:
+            chave = chaves[i]
+            if chave == estado:
+                return i
+            if chave == 0:
+                break
+            i = (i + 1) & self.mascara
+        if self.contadores[self.base_contadores + 1] >= self.cota_insercoes:
+            self.contadores[self.base_contadores + 2] += 1
+            return None
+        chaves[i] = estado
+        self.contadores[self.base_contadores + 1] += 1
+        return i
+
+    def __len__(self):
+        return self.capacidade - self.chaves.tolist().count(0) + self.cabecalho[3]
+
+    def __contains__(self, chave):
+        return self.espaco(chave[0]) is not None
+
+    def get(self, chave, default=None):
+        (estado, acao) = chave
+        i = self.espaco(estado)
+        if i is None:
+            return default
+        return self.valores[i * self.numero_colunas + acao]
+
+    def __getitem__(self, chave):
+        valor = self.get(chave)
+        if valor is None:
+            raise KeyError(chave)
+        return valor
+
+    def __setitem__(self, chave, valor):
+        (estado, acao) = chave
+        i = self.espaco_para_escrita(estado)
+        if i is not None:
+            self.valores[i * self.numero_colunas + acao] = valor
+            self.contadores[self.base_contadores] += 1
+
+    def set_linha(self, estado, valores):
+        i = self.espaco_para_escrita(estado)
+        if i is not None:
+            inicio = i * self.numero_colunas
+            self.valores[inicio:inicio + self.numero_colunas] = array('d', valores)
+            self.contadores[self.base_contadores] += 1
+
+    def linha(self, estado):
+        i = self.espaco(estado)
+        if i is None:
+            return None
+        inicio = i * self.numero_colunas
+        return self.valores[inicio:inicio + self.numero_colunas].tolist()
+
+    def bytes_usados(self):
+        return self.memoria.size
+
+    def itens_por_estado(self):
+        chaves = self.chaves.tolist()
+        if self.cabecalho[3]:
+            chaves.append(0)
+        for (i, estado) in enumerate(chaves):
+            if estado or i == self.capacidade:
+                inicio = i * self.numero_colunas
+                yield (estado, self.valores[inicio:inicio + self.numero_colunas].tolist())
+
+    def para_compacta(self):
+        """Copia a tabela para uma TabelaQCompacta, que continua válida depois de o bloco ser apagado"""
+        tabela = TabelaQCompacta(self.numero_colunas, self.valor_inicial)
+        for (estado, valores) in self.itens_por_estado():
+            tabela.set_linha(estado, valores)
+        return tabela
+
+    def estatisticas(self):
+        estados = len(self)
+        contadores = self.contadores.tolist()
+        passo = TabelaQCompartilhada.CONTADORES
+        return {
+            'capacidade': self.capacidade,
+            'estados': estados,
+            'carga': estados / self.capacidade,
+            'atualizacoes': contadores[0::passo],
+            'insercoes': contadores[1::passo],
+            'descartados': contadores[2::passo],
+        }
@@ -0,0 +1,225 @@
+import argparse
+import ast
+import itertools
+import json
+import math
+import multiprocessing
+import random
+import time
+
+from Connect4_LivroAberturas import LivroAberturas
+from Connect4_Logica import TAMANHO_BORDA, BordaBitboard, LogicaJogo, MoedaLogica
+from Connect4_Main import JogadorPC
+
+TIPOS_AGENTE = ("random", "qlearner", "solver", "mcts")
+
+agentes_do_processo = None
+dimensoes_do_processo = None
+
+
+def le_agente(especificacao):
+    """Converte "nome=tipo:opcao=valor,opcao=valor" em (nome, tipo, opcoes)"""
+    if '=' in especificacao.split(':', 1)[0]:
+        (nome, definicao) = especificacao.split('=', 1)
+    else:
+        (nome, definicao) = (especificacao, especificacao)
+    (tipo, _, texto_opcoes) = definicao.partition(':')
+    if tipo not in TIPOS_AGENTE:
+        raise ValueError('Tipo de agente desconhecido: %s' % tipo)
+    opcoes = {}
+    for item in filter(None, texto_opcoes.split(',')):
+        (chave, _, valor) = item.partition('=')
+        try:
+            opcoes[chave] = ast.literal_eval(valor)
+        except (ValueError, SyntaxError):
+            opcoes[chave] = valor
+    return (nome, tipo, opcoes)
+
+
+def cria_jogador(tipo, opcoes, numero_colunas, sequencia_vitoria):
+    """Cria o JogadorPC de um agente; um qlearner joga sem explorar e sem alterar a sua tabela"""
+    opcoes = dict(opcoes)
+    caminho_tabela = opcoes.pop('tabela', None)
+    caminho_livro = opcoes.pop('livro', None)
+    if tipo == "qlearner":
+        opcoes.setdefault('epsilon', 0.0)
+        opcoes.setdefault('aprendendo', False)
+        opcoes.setdefault('numero_colunas', numero_colunas)
+    elif tipo in ("solver", "mcts"):
+        opcoes.setdefault('sequencia_vitoria', sequencia_vitoria)
+    livro_aberturas = LivroAberturas(caminho_livro) if caminho_livro else None
+    jogador = JogadorPC(1, tipo, livro_aberturas, **opcoes)
+    if caminho_tabela:
+        jogador.jogador.carregar_tabela(caminho_tabela)
+    return jogador
+
+
+def inicializa_processo(agentes, dimensoes):
+    global agentes_do_processo, dimensoes_do_processo
+    (numero_linhas, numero_colunas, sequencia_vitoria) = dimensoes
+    agentes_do_processo = [cria_jogador(tipo, opcoes, numero_colunas, sequencia_vitoria)
+                           for (_, tipo, opcoes) in agentes]
+    dimensoes_do_processo = dimensoes
+
+
+def joga_partida(tarefa):
+    """Joga uma partida entre os agentes de índices primeiro e segundo (primeiro começa) e retorna
+    (primeiro, segundo, resultado), com resultado 1 se o primeiro venceu, 0.5 no empate e 0 se perdeu"""
+    (primeiro, segundo, semente) = tarefa
+    (numero_linhas, numero_colunas, sequencia_vitoria) = dimensoes_do_processo
+    random.seed(semente)
+    borda = BordaBitboard(numero_linhas, numero_colunas)
+    logica_jogo = LogicaJogo(borda, sequencia_vitoria)
+    jogadores = (agentes_do_processo[primeiro], agentes_do_processo[segundo])
+    jogadores[0].set_tipo_moeda(1)
+    jogadores[1].set_tipo_moeda(2)
+    fim_de_jogo = False
+    vez = 0
+    while not fim_de_jogo:
+        fim_de_jogo = jogadores[vez].movimento_completo(MoedaLogica(vez + 1), borda, logica_jogo, None)
+        vez = 1 - vez
+    ganhador = logica_jogo.get_ganhador()
+    return (primeiro, segundo, 1.0 if ganhador == 1 else 0.5 if ganhador == 0 else 0.0)
+
+
+def monta_tarefas(numero_agentes, modo, partidas_por_par, semente):
+    """Cada par joga partidas_por_par partidas; as duas partidas de cada semente trocam quem começa"""
+    if modo == "desafio":
+        pares = [(0, j) for j in range(1, numero_agentes)]
+    else:
+        pares = list(itertools.combinations(range(numero_agentes), 2))
+    tarefas = []
+    for (indice_par, (a, b)) in enumerate(pares):
+        for partida in range(partidas_por_par):
+            semente_partida = semente + indice_par * partidas_por_par + partida // 2
+            tarefas.append((a, b, semente_partida) if partida % 2 == 0 else (b, a, semente_partida))
+    return tarefas
+
+
+def ajusta_elo(resultados, numero_agentes, iteracoes=200):
+    """Ratings Elo de máxima verossimilhança, com média 0; resultados é {(a, b): [vitorias, empates, derrotas]}"""
+    pontos = [0.0] * numero_agentes
+    partidas = {}
+    for ((a, b), (vitorias, empates, derrotas)) in resultados.items():
+        total = vitorias + empates + derrotas + 1
+        pontos[a] += vitorias + 0.5 * empates + 0.5
+        pontos[b] += derrotas + 0.5 * empates + 0.5
+        partidas[(a, b)] = total
+    forcas = [1.0] * numero_agentes
+    for _ in range(iteracoes):
+        for i in range(numero_agentes):
+            denominador = 0.0
+            for ((a, b), total) in partidas.items():
+                if i == a or i == b:
+                    denominador += total / (forcas[a] + forcas[b])
+            if denominador > 0:
+                forcas[i] = pontos[i] / denominador
+        media = sum(math.log(f) for f in forcas) / numero_agentes
+        forcas = [f / math.exp(media) for f in forcas]
+    return [400.0 * math.log10(f) for f in forcas]
+
+
+def intervalos_elo(resultados, numero_agentes, amostras=200, confianca=0.95, semente=0):
+    """Intervalo de confiança de cada rating por bootstrap: cada par é reamostrado com as suas proporções de
+    vitórias, empates e derrotas e os ratings são ajustados de novo"""
+    gerador = random.Random(semente)
+    ratings_amostras = [[] for _ in range(numero_agentes)]
+    for _ in range(amostras):
+        reamostrados = {}
+        for (par, (vitorias, empates, derrotas)) in resultados.items():
+            total = vitorias + empates + derrotas
+            contagem = [0, 0, 0]
+            for _ in range(total):
+                sorteio = gerador.random() * total
+                contagem[0 if sorteio < vitorias else 1 if sorteio < vitorias + empates else 2] += 1
+            reamostrados[par] = contagem
+        for (i, rating) in enumerate(ajusta_elo(reamostrados, numero_agentes, iteracoes=50)):
+            ratings_amostras[i].append(rating)
+    intervalos = []
+    for ratings in ratings_amostras:
+        ratings.sort()
+        corte = int((1 - confianca) / 2 * len(ratings))
+        intervalos.append((ratings[corte], ratings[len(ratings) - 1 - corte]))
+    return intervalos
+
+
+def torneio(agentes, modo="todos", partidas_por_par=100, processos=1, semente=0, numero_linhas=TAMANHO_BORDA[0],
+            numero_colunas=TAMANHO_BORDA[1], sequencia_vitoria=LogicaJogo.SEQUENCIA_VITORIA_LENGTH):
+    """Joga o torneio entre os agentes [(nome, tipo, opcoes)] e retorna um dicionário com os resultados"""
+    tarefas = monta_tarefas(len(agentes), modo, partidas_por_par, semente)
+    dimensoes = (numero_linhas, numero_colunas, sequencia_vitoria)
+    resultados = {}
+    inicio = time.perf_counter()
+    pool = multiprocessing.Pool(processos, inicializa_processo, (agentes, dimensoes))
+    try:
+        for (primeiro, segundo, resultado) in pool.imap_unordered(joga_partida, tarefas, chunksize=8):
+            # guardado do ponto de vista do agente de menor índice do par
+            (a, b, pontos_a) = (primeiro, segundo, resultado) if primeiro < segundo else \
+                (segundo, primeiro, 1.0 - resultado)
+            contagem = resultados.setdefault((a, b), [0, 0, 0])
+            contagem[0 if pontos_a == 1.0 else 1 if pontos_a == 0.5 else 2] += 1
+    finally:
+        pool.terminate()
+        pool.join()
+    tempo = time.perf_counter() - inicio
+
+    ratings = ajusta_elo(resultados, len(agentes))
+    intervalos = intervalos_elo(resultados, len(agentes), semente=semente)
+    return {
+        'agentes': [nome for (nome, _, _) in agentes],
+        'partidas': len(tarefas),
+        'tempo': tempo,
+        'partidas_por_segundo': len(tarefas) / tempo if tempo > 0 else 0.0,
+        'pares': [{'a': agentes[a][0], 'b': agentes[b][0], 'vitorias_a': v, 'empates': e, 'vitorias_b': d}
+                  for ((a, b), (v, e, d)) in sorted(resultados.items())],
+        'elo': [{'agente': agentes[i][0], 'elo': ratings[i], 'intervalo': intervalos[i]}
+                for i in range(len(agentes))],
+    }
+
+
+def imprime_relatorio(relatorio):
+    print("%-24s %-24s %6s %6s %6s %7s" % ("A", "B", "V(A)", "E", "V(B)", "pontos A"))
+    for par in relatorio['pares']:
+        total = par['vitorias_a'] + par['empates'] + par['vitorias_b']
+        print("%-24s %-24s %6d %6d %6d %6.1f%%" % (par['a'], par['b'], par['vitorias_a'], par['empates'],
+                                                   par['vitorias_b'],
+                                                   100.0 * (par['vitorias_a'] + 0.5 * par['empates']) / total))
+    print()
+    for item in sorted(relatorio['elo'], key=lambda item: -item['elo']):
+        print("%-24s elo %7.1f  (IC 95%%: %7.1f a %7.1f)" % (item['agente'], item['elo'], item['intervalo'][0],
+                                                           item['intervalo'][1]))
+    print("\n%d partidas em %.1f s | %.1f partidas/s" % (relatorio['partidas'], relatorio['tempo'],
+                                                      relatorio['partidas_por_segundo']))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('agentes', nargs='+', action="store",
+                        help="Agentes no formato nome=tipo:opcao=valor,... (tipos: %s); por exemplo "
+                             "treinado=qlearner:tabela=q.c4qt ou forte=solver:profundidade_maxima=6"
+                             % ", ".join(TIPOS_AGENTE))
+    parser.add_argument('--modo', default="todos", choices=["todos", "desafio"], action="store",
+                        help="Todos contra todos, ou desafio: o primeiro agente contra cada um dos outros")
+    parser.add_argument('--partidas', default=100, type=int, action="store",
+                        help="Partidas por par de agentes, alternando quem começa")
+    parser.add_argument('--processos', default=multiprocessing.cpu_count(), type=int, action="store",
+                        help="Número de processos que jogam as partidas")
+    parser.add_argument('--semente', default=0, type=int, action="store",
+                        help="Semente da primeira partida; as seguintes usam sementes consecutivas")
+    parser.add_argument('--linhas', default=TAMANHO_BORDA[0], type=int, action="store",
+                        help="Número de linhas da borda")
+    parser.add_argument('--colunas', default=TAMANHO_BORDA[1], type=int, action="store",
+                        help="Número de colunas da borda")
+    parser.add_argument('--sequencia-vitoria', default=LogicaJogo.SEQUENCIA_VITORIA_LENGTH, type=int, action="store",
+                        help="Número de moedas seguidas necessárias para vencer")
+    parser.add_argument('--saida', default=None, action="store",
+                        help="Arquivo JSON com o relatório do torneio")
+    args = parser.parse_args()
+
+    agentes = [le_agente(especificacao) for especificacao in args.agentes]
+    relatorio = torneio(agentes, args.modo, args.partidas, args.processos, args.semente, args.linhas, args.colunas,
+                        args.sequencia_vitoria)
+    imprime_relatorio(relatorio)
+    if args.saida:
+        with open(args.saida, 'w') as arquivo:
+            json.dump(relatorio, arquivo, indent=2)
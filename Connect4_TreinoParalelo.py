@@ -0,0 +1,324 @@
+import multiprocessing
+import multiprocessing.connection
+import random
+import time
+
+from Connect4_Logica import TAMANHO_BORDA, LogicaJogo
+from Connect4_Main import JogadorPC, JogadorQLearningPlayer, TreinoSemInterface
+from Connect4_TabelasQ import TabelaQArquivo, TabelaQCompacta, TabelaQCompartilhada, TabelaQLimitada
+
+
+def processo_treino_paralelo(conexao, semente, opcoes_treino):
+    """Laço de um processo de TreinoParalelo: aplica as linhas recebidas, joga as partidas e devolve as mudanças"""
+    random.seed(semente)
+    treino = TreinoSemInterface(tipo_borda="bitboard", **opcoes_treino)
+    jogadores = (treino.p1.jogador, treino.p2.jogador)
+    while True:
+        mensagem = conexao.recv()
+        if mensagem is None:
+            break
+        (partidas, atualizacoes) = mensagem
+        for (jogador, linhas) in zip(jogadores, atualizacoes):
+            for (chave, valores) in linhas.items():
+                jogador.q.set_linha(chave, valores)
+            jogador.visitas = {}
+
+        lst_vitoria_anterior = list(treino.lst_vitoria)
+        empates_anterior = treino.empates
+        inicio = time.perf_counter()
+        treino.treinar(partidas)
+        tempo = time.perf_counter() - inicio
+
+        mudancas = []
+        for jogador in jogadores:
+            linhas = {}
+            for ((chave, acao), visitas) in jogador.visitas.items():
+                if chave not in linhas:
+                    valores = jogador.q.linha(chave)
+                    if valores is None:
+                        # o estado já saiu de uma tabela Q limitada
+                        continue
+                    linhas[chave] = (list(valores), [0] * jogador.numero_colunas)
+                linhas[chave][1][acao] = visitas
+            mudancas.append(linhas)
+        vitorias = [treino.lst_vitoria[0] - lst_vitoria_anterior[0], treino.lst_vitoria[1] - lst_vitoria_anterior[1]]
+        conexao.send((mudancas, vitorias, treino.empates - empates_anterior, partidas, tempo))
+    conexao.close()
+
+
+class TreinoParalelo(object):
+    """Treino sem interface em vários processos, cada um com a sua cópia das tabelas Q, juntadas a cada rodada"""
+
+    def __init__(self, processos, partidas_por_rodada=500, semente=None, numero_linhas=TAMANHO_BORDA[0],
+                 sequencia_vitoria=LogicaJogo.SEQUENCIA_VITORIA_LENGTH, **opcoes_jogador):
+        self.numero_linhas = numero_linhas
+        self.sequencia_vitoria = sequencia_vitoria
+        opcoes_jogador['chave_zobrist'] = True
+        opcoes_jogador['tabela_compacta'] = True
+        self.opcoes_jogador = opcoes_jogador
+        self.processos = processos
+        self.partidas_por_rodada = partidas_por_rodada
+        self.semente = semente if semente is not None else random.randrange(2 ** 32)
+        numero_colunas = opcoes_jogador.get('numero_colunas', TAMANHO_BORDA[1])
+        limites = (opcoes_jogador.get('limite_estados_q'), opcoes_jogador.get('memoria_tabela_q'),
+                   opcoes_jogador.get('idade_maxima_q'))
+        valor_inicial = opcoes_jogador.get('valor_inicial_q', JogadorQLearningPlayer.VALOR_Q_INICIAL)
+        if limites[0] is not None or limites[1] is not None:
+            # as tabelas mestras têm os mesmos limites das tabelas dos processos
+            self.tabelas = [TabelaQLimitada(numero_colunas, valor_inicial, *limites) for _ in range(2)]
+        else:
+            self.tabelas = [TabelaQCompacta(numero_colunas, valor_inicial) for _ in range(2)]
+        self.pc_treinado = None
+        self.lst_vitoria = [0, 0]
+        self.empates = 0
+        self.partidas_jogadas = 0
+        self.tempo_treino = 0.0
+        self.partidas_por_processo = [0] * processos
+        self.tempo_por_processo = [0.0] * processos
+
+    def carregar_tabela(self, caminho):
+        """Começa o treino da tabela Q do arquivo: as duas tabelas mestras recebem as suas linhas, que são enviadas
+        aos processos na primeira rodada, e os processos passam a usar a simetria com que ela foi gravada"""
+        tabela = TabelaQArquivo(caminho, mapear=False)
+        if tabela.numero_colunas != self.tabelas[0].numero_colunas:
+            raise ValueError('A tabela Q do arquivo foi treinada para %d colunas' % tabela.numero_colunas)
+        self.opcoes_jogador['simetria'] = tabela.simetria
+        for (estado, valores) in tabela.itens_por_estado():
+            for mestra in self.tabelas:
+                mestra.set_linha(estado, valores)
+
+    def junta_mudancas(self, mudancas_por_processo):
+        """Troca cada ação atualizada na rodada pela média dos valores dos processos ponderada pelas visitas da
+        rodada e retorna as linhas alteradas"""
+        atualizacoes = []
+        for slot in range(2):
+            tabela = self.tabelas[slot]
+            numero_colunas = tabela.numero_colunas
+            medias = {}  # {chave: (média dos valores, visitas somadas)} de cada ação
+            for mudancas in mudancas_por_processo:
+                for (chave, (valores, visitas_acoes)) in mudancas[slot].items():
+                    if chave not in medias:
+                        medias[chave] = ([0.0] * numero_colunas, [0] * numero_colunas)
+                    (media, visitas) = medias[chave]
+                    for acao in range(numero_colunas):
+                        if visitas_acoes[acao]:
+                            visitas[acao] += visitas_acoes[acao]
+                            if visitas[acao] == visitas_acoes[acao]:
+                                # o primeiro processo entra com o valor exato, então um processo só repete o
+                                # treino em série
+                                media[acao] = valores[acao]
+                            else:
+                                media[acao] += (valores[acao] - media[acao]) * visitas_acoes[acao] / visitas[acao]
+            alteradas = {}
+            for (chave, (media, visitas)) in medias.items():
+                linha = list(tabela.linha(chave) or [tabela.valor_inicial] * numero_colunas)
+                for acao in range(numero_colunas):
+                    if visitas[acao]:
+                        linha[acao] = media[acao]
+                tabela.set_linha(chave, linha)
+                alteradas[chave] = linha
+            atualizacoes.append(alteradas)
+        return atualizacoes
+
+    def treinar(self, iteracoes, intervalo_relatorio=0):
+        conexoes = []
+        processos = []
+        for i in range(self.processos):
+            (conexao_principal, conexao_processo) = multiprocessing.Pipe()
+            processo = multiprocessing.Process(target=processo_treino_paralelo,
+                                               args=(conexao_processo, self.semente + i,
+                                                     dict(self.opcoes_jogador, numero_linhas=self.numero_linhas,
+                                                          sequencia_vitoria=self.sequencia_vitoria)))
+            processo.daemon = True
+            processo.start()
+            conexoes.append(conexao_principal)
+            processos.append(processo)
+
+        # na primeira rodada os processos recebem as linhas que as tabelas mestras já tiverem
+        atualizacoes = [dict(tabela.itens_por_estado()) for tabela in self.tabelas]
+        restantes = iteracoes
+        proximo_relatorio = intervalo_relatorio
+        inicio = time.perf_counter()
+        try:
+            while restantes > 0:
+                partidas_rodada = []
+                for conexao in conexoes:
+                    partidas = min(self.partidas_por_rodada, restantes)
+                    restantes -= partidas
+                    partidas_rodada.append(partidas)
+                    conexao.send((partidas, atualizacoes))
+
+                mudancas_por_processo = []
+                for (i, conexao) in enumerate(conexoes):
+                    (mudancas, vitorias, empates, partidas, tempo) = conexao.recv()
+                    mudancas_por_processo.append(mudancas)
+                    self.lst_vitoria[0] += vitorias[0]
+                    self.lst_vitoria[1] += vitorias[1]
+                    self.empates += empates
+                    self.partidas_jogadas += partidas
+                    self.partidas_por_processo[i] += partidas
+                    self.tempo_por_processo[i] += tempo
+                atualizacoes = self.junta_mudancas(mudancas_por_processo)
+
+                if intervalo_relatorio and self.partidas_jogadas >= proximo_relatorio:
+                    self.tempo_treino = time.perf_counter() - inicio
+                    proximo_relatorio += intervalo_relatorio
+                    print(self.resumo())
+        finally:
+            for conexao in conexoes:
+                conexao.send(None)
+            for processo in processos:
+                processo.join()
+        self.tempo_treino = time.perf_counter() - inicio
+
+        index = self.lst_vitoria.index(max(self.lst_vitoria))
+        self.pc_treinado = JogadorPC(index + 1, "qlearner", **self.opcoes_jogador)
+        self.pc_treinado.jogador.q = self.tabelas[index]
+
+        return self.pc_treinado
+
+    def resumo(self):
+        partidas_por_segundo = self.partidas_jogadas / self.tempo_treino if self.tempo_treino > 0 else 0.0
+        por_processo = " ".join("%.1f" % (partidas / tempo if tempo > 0 else 0.0)
+                                for (partidas, tempo) in zip(self.partidas_por_processo, self.tempo_por_processo))
+        return "partidas: %d | vitorias p1: %d | vitorias p2: %d | empates: %d | %.1f partidas/s | por processo: %s" % (
+            self.partidas_jogadas, self.lst_vitoria[0], self.lst_vitoria[1], self.empates, partidas_por_segundo,
+            por_processo)
+
+
+def processo_treino_hogwild(conexao, nomes_tabelas, processo, semente, partidas, progresso, opcoes_treino):
+    """Processo de TreinoHogwild: joga as suas partidas atualizando diretamente as tabelas compartilhadas"""
+    random.seed(semente)
+    treino = TreinoSemInterface(tipo_borda="bitboard", **opcoes_treino)
+    tabelas = [TabelaQCompartilhada.conecta(nome, processo) for nome in nomes_tabelas]
+    (treino.p1.jogador.q, treino.p2.jogador.q) = tabelas
+    inicio = time.perf_counter()
+    restantes = partidas
+    try:
+        while restantes > 0:
+            bloco = min(TreinoHogwild.PARTIDAS_POR_BLOCO, restantes)
+            treino.treinar(bloco)
+            restantes -= bloco
+            progresso[4 * processo:4 * processo + 4] = [treino.partidas_jogadas, treino.lst_vitoria[0],
+                                                        treino.lst_vitoria[1], treino.empates]
+    finally:
+        for tabela in tabelas:
+            tabela.fechar()
+    conexao.send(time.perf_counter() - inicio)
+    conexao.close()
+
+
+class TreinoHogwild(object):
+    """Treino sem interface em vários processos que atualizam as mesmas tabelas Q em TabelaQCompartilhada"""
+    PARTIDAS_POR_BLOCO = 50  # partidas de um processo entre duas atualizações do seu progresso
+    INTERVALO_ACOMPANHAMENTO = 0.5  # segundos entre duas leituras dos contadores pelo processo principal
+
+    def __init__(self, processos, capacidade=1 << 20, semente=None, numero_linhas=TAMANHO_BORDA[0],
+                 sequencia_vitoria=LogicaJogo.SEQUENCIA_VITORIA_LENGTH, **opcoes_jogador):
+        self.numero_linhas = numero_linhas
+        self.sequencia_vitoria = sequencia_vitoria
+        opcoes_jogador['chave_zobrist'] = True
+        opcoes_jogador['tabela_compacta'] = True
+        # as tabelas compartilhadas têm capacidade fixa no lugar dos limites de TabelaQLimitada
+        for opcao in ('limite_estados_q', 'memoria_tabela_q', 'idade_maxima_q'):
+            opcoes_jogador.pop(opcao, None)
+        self.opcoes_jogador = opcoes_jogador
+        self.numero_colunas = opcoes_jogador.get('numero_colunas', TAMANHO_BORDA[1])
+        self.processos = processos
+        self.capacidade = capacidade
+        self.semente = semente if semente is not None else random.randrange(2 ** 32)
+        self.pc_treinado = None
+        self.lst_vitoria = [0, 0]
+        self.empates = 0
+        self.partidas_jogadas = 0
+        self.tempo_treino = 0.0
+        self.partidas_por_processo = [0] * processos
+        self.tempo_por_processo = [0.0] * processos
+        self.estatisticas_tabelas = []
+        self.linhas_iniciais = []
+
+    def carregar_tabela(self, caminho):
+        """Começa o treino da tabela Q do arquivo: as suas linhas são copiadas para as duas tabelas compartilhadas
+        antes de os processos começarem, e os processos passam a usar a simetria com que ela foi gravada"""
+        tabela = TabelaQArquivo(caminho, mapear=False)
+        if tabela.numero_colunas != self.numero_colunas:
+            raise ValueError('A tabela Q do arquivo foi treinada para %d colunas' % tabela.numero_colunas)
+        if not TabelaQCompartilhada.cabem(len(tabela), self.capacidade):
+            raise ValueError('A tabela Q do arquivo tem %d estados, mais do que cabe na capacidade compartilhada '
+                             'de %d' % (len(tabela), self.capacidade))
+        self.opcoes_jogador['simetria'] = tabela.simetria
+        self.linhas_iniciais = list(tabela.itens_por_estado())
+
+    def treinar(self, iteracoes, intervalo_relatorio=0):
+        valor_inicial = self.opcoes_jogador.get('valor_inicial_q', JogadorQLearningPlayer.VALOR_Q_INICIAL)
+        tabelas = [TabelaQCompartilhada(self.numero_colunas, self.capacidade, self.processos, valor_inicial)
+                   for _ in range(2)]
+        # partidas, vitórias de p1, vitórias de p2 e empates de cada processo
+        progresso = multiprocessing.RawArray('q', 4 * self.processos)
+        conexoes = []
+        processos = []
+        proximo_relatorio = intervalo_relatorio
+        inicio = time.perf_counter()
+        try:
+            for tabela in tabelas:
+                tabela.carrega(self.linhas_iniciais)
+            for i in range(self.processos):
+                (conexao_principal, conexao_processo) = multiprocessing.Pipe(duplex=False)
+                partidas = iteracoes // self.processos + (1 if i < iteracoes % self.processos else 0)
+                processo = multiprocessing.Process(target=processo_treino_hogwild,
+                                                   args=(conexao_processo, [tabela.memoria.name for tabela in tabelas],
+                                                         i, self.semente + i, partidas, progresso,
+                                                         dict(self.opcoes_jogador, numero_linhas=self.numero_linhas,
+                                                              sequencia_vitoria=self.sequencia_vitoria)))
+                processo.daemon = True
+                processo.start()
+                # sem a cópia do principal, a conexão chega ao fim se o processo morrer sem responder
+                conexao_processo.close()
+                conexoes.append(conexao_principal)
+                processos.append(processo)
+
+            pendentes = {conexao: i for (i, conexao) in enumerate(conexoes)}
+            while pendentes:
+                for conexao in multiprocessing.connection.wait(list(pendentes),
+                                                               TreinoHogwild.INTERVALO_ACOMPANHAMENTO):
+                    self.tempo_por_processo[pendentes.pop(conexao)] = conexao.recv()
+                self.partidas_por_processo = list(progresso[0::4])
+                self.partidas_jogadas = sum(self.partidas_por_processo)
+                self.lst_vitoria = [sum(progresso[1::4]), sum(progresso[2::4])]
+                self.empates = sum(progresso[3::4])
+                if intervalo_relatorio and self.partidas_jogadas >= proximo_relatorio:
+                    self.tempo_treino = time.perf_counter() - inicio
+                    self.estatisticas_tabelas = [tabela.estatisticas() for tabela in tabelas]
+                    while proximo_relatorio <= self.partidas_jogadas:
+                        proximo_relatorio += intervalo_relatorio
+                    print(self.resumo())
+            self.tempo_treino = time.perf_counter() - inicio
+            self.estatisticas_tabelas = [tabela.estatisticas() for tabela in tabelas]
+
+            index = self.lst_vitoria.index(max(self.lst_vitoria))
+            self.pc_treinado = JogadorPC(index + 1, "qlearner", **self.opcoes_jogador)
+            self.pc_treinado.jogador.q = tabelas[index].para_compacta()
+        finally:
+            for processo in processos:
+                processo.join()
+            for tabela in tabelas:
+                tabela.fechar()
+
+        return self.pc_treinado
+
+    def resumo(self):
+        partidas_por_segundo = self.partidas_jogadas / self.tempo_treino if self.tempo_treino > 0 else 0.0
+        linhas = ["partidas: %d | vitorias p1: %d | vitorias p2: %d | empates: %d | %.1f partidas/s" % (
+            self.partidas_jogadas, self.lst_vitoria[0], self.lst_vitoria[1], self.empates, partidas_por_segundo)]
+        if self.estatisticas_tabelas:
+            atualizacoes = [sum(valores) for valores in
+                            zip(*(estatisticas['atualizacoes'] for estatisticas in self.estatisticas_tabelas))]
+            # um processo que já terminou é medido pelo seu próprio tempo
+            tempos = [tempo or self.tempo_treino for tempo in self.tempo_por_processo]
+            linhas.append("atualizações/s por processo: %s" % " ".join(
+                "%.0f" % (total / tempo if tempo > 0 else 0.0) for (total, tempo) in zip(atualizacoes, tempos)))
+            for (slot, estatisticas) in enumerate(self.estatisticas_tabelas):
+                linhas.append("tabela p%d: %d estados | carga %.1f%% | descartados: %d" % (
+                    slot + 1, estatisticas['estados'], 100.0 * estatisticas['carga'],
+                    sum(estatisticas['descartados'])))
+        return "\n".join(linhas)
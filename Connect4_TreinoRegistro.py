@@ -0,0 +1,115 @@
+import argparse
+import os
+import time
+
+from Connect4_Logica import TAMANHO_BORDA, BordaBitboard, LogicaJogo, MoedaLogica
+from Connect4_Main import JogadorQLearningPlayer
+from Connect4_RegistroPartidas import le_registro_partidas
+
+
+class TreinoRegistro(object):
+    """Treina um JogadorQLearningPlayer com as partidas de arquivos de RegistroPartidas, sem jogá-las de novo"""
+
+    def __init__(self, jogador, lados=(1, 2), tipos=None):
+        self.jogador = jogador
+        self.lados = lados
+        self.tipos = tipos
+        self.bordas = {}  # {dimensoes: (borda, logica_jogo)} reaproveitadas entre as partidas
+        self.partidas = 0
+        self.partidas_ignoradas = 0
+        self.jogadas = 0
+        self.tempo = 0.0
+
+    def borda_para(self, dimensoes):
+        if dimensoes not in self.bordas:
+            (numero_linhas, numero_colunas, sequencia_vitoria) = dimensoes
+            borda = BordaBitboard(numero_linhas, numero_colunas)
+            self.bordas[dimensoes] = (borda, LogicaJogo(borda, sequencia_vitoria))
+        return self.bordas[dimensoes]
+
+    def aprende_partida(self, dimensoes, primeiro, colunas, lados):
+        (borda, logica_jogo) = self.borda_para(dimensoes)
+        for lado in lados:
+            self.jogador.set_tipo_moeda(lado)
+            borda.reset()
+            logica_jogo.reset()
+            tipo_atual = primeiro
+            for coluna in colunas:
+                acoes = borda.get_acoes_disponiveis() if tipo_atual == lado else None
+                moeda = MoedaLogica(tipo_atual)
+                moeda.set_coluna(coluna)
+                fim_de_jogo = borda.insere_moeda(moeda, None, logica_jogo)
+                if tipo_atual == lado:
+                    self.jogador.aprender(borda, acoes, coluna, fim_de_jogo, logica_jogo)
+                    self.jogadas += 1
+                if fim_de_jogo:
+                    break
+                tipo_atual = 3 - tipo_atual
+            self.jogador.fim_de_partida(logica_jogo)
+
+    def treinar(self, caminhos, limite_partidas=None, intervalo_relatorio=0):
+        inicio = time.perf_counter()
+        for caminho in caminhos:
+            for (dimensoes, jogadores, primeiro, colunas, _) in le_registro_partidas(caminho):
+                if limite_partidas is not None and self.partidas >= limite_partidas:
+                    break
+                lados = [lado for lado in self.lados if self.tipos is None or jogadores[lado - 1] in self.tipos]
+                if dimensoes[1] != self.jogador.numero_colunas or not lados:
+                    self.partidas_ignoradas += 1
+                    continue
+                self.aprende_partida(dimensoes, primeiro, colunas, lados)
+                self.partidas += 1
+                if intervalo_relatorio and self.partidas % intervalo_relatorio == 0:
+                    self.tempo = time.perf_counter() - inicio
+                    print(self.resumo())
+        self.tempo = time.perf_counter() - inicio
+
+    def resumo(self):
+        partidas_por_segundo = self.partidas / self.tempo if self.tempo > 0 else 0.0
+        return "partidas: %d | ignoradas: %d | jogadas aprendidas: %d | %.1f partidas/s" % (
+            self.partidas, self.partidas_ignoradas, self.jogadas, partidas_por_segundo)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('registros', nargs='+', action="store",
+                        help="Arquivos gravados com --registro-partidas, lidos em ordem")
+    parser.add_argument('--tabela-q', default=None, action="store",
+                        help="Arquivo da tabela Q: continuada se existir e gravada ao fim do treino")
+    parser.add_argument('--lados', default="ambos", choices=["1", "2", "ambos"], action="store",
+                        help="Moeda cujas jogadas são aprendidas")
+    parser.add_argument('--tipos', default=None, action="store",
+                        help="Tipos de jogador separados por vírgula (humano, random, qlearner, solver, mcts) cujas "
+                             "jogadas são aprendidas; por padrão todos")
+    parser.add_argument('--colunas', default=TAMANHO_BORDA[1], type=int, action="store",
+                        help="Número de colunas das partidas aprendidas; as outras são ignoradas")
+    parser.add_argument('--limite-partidas', default=None, type=int, action="store",
+                        help="Número máximo de partidas lidas")
+    parser.add_argument('--relatorio', default=0, type=int, action="store",
+                        help="Imprime o progresso a cada N partidas")
+    parser.add_argument('--chave-zobrist', action="store_true",
+                        help="Usa a chave Zobrist da borda como estado na tabela Q")
+    parser.add_argument('--simetria', action="store_true",
+                        help="Guarda um estado e o seu espelho na mesma entrada da tabela Q")
+    parser.add_argument('--tabela-compacta', action="store_true",
+                        help="Guarda a tabela Q com uma linha de valores por estado")
+    parser.add_argument('--lambda-td', default=0.0, type=float, action="store",
+                        help="Lambda dos traços de elegibilidade; 0 mantém a atualização de um passo")
+    parser.add_argument('--limite-estados-q', default=None, type=int, action="store",
+                        help="Número máximo de estados da tabela Q; os menos usados dão lugar aos novos")
+    parser.add_argument('--valor-inicial-q', default=JogadorQLearningPlayer.VALOR_Q_INICIAL, type=float,
+                        action="store", help="Valor das ações ainda não atualizadas")
+    args = parser.parse_args()
+
+    jogador = JogadorQLearningPlayer(1, numero_colunas=args.colunas, chave_zobrist=args.chave_zobrist,
+                                     simetria=args.simetria, tabela_compacta=args.tabela_compacta,
+                                     lambda_td=args.lambda_td, limite_estados_q=args.limite_estados_q,
+                                     valor_inicial_q=args.valor_inicial_q)
+    if args.tabela_q and os.path.exists(args.tabela_q):
+        jogador.carregar_tabela(args.tabela_q)
+    lados = (1, 2) if args.lados == "ambos" else (int(args.lados),)
+    treino = TreinoRegistro(jogador, lados, args.tipos.split(',') if args.tipos else None)
+    treino.treinar(args.registros, args.limite_partidas, args.relatorio)
+    print(treino.resumo())
+    if args.tabela_q:
+        jogador.salvar_tabela(args.tabela_q)
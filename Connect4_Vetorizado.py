@@ -0,0 +1,309 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from Connect4_Logica import TAMANHO_BORDA, ColunaPreenchidaTotalmente, LogicaJogo, TabelaZobrist
+from Connect4_Main import JogadorQLearningPlayer
+from Connect4_TabelasQ import TabelaQArquivo
+
+
+class AmbienteVetorizado(object):
+    """Simula numero_jogos partidas de Connect 4 ao mesmo tempo com arrays do NumPy"""
+
+    def __init__(self, numero_jogos, numero_linhas=TAMANHO_BORDA[0], numero_colunas=TAMANHO_BORDA[1],
+                 sequencia_vitoria=LogicaJogo.SEQUENCIA_VITORIA_LENGTH, semente=None):
+        if (numero_linhas + 1) * numero_colunas > 64:
+            raise ValueError('A borda %dx%d não cabe em um bitboard de 64 bits' % (numero_linhas, numero_colunas))
+        self.numero_jogos = numero_jogos
+        self.numero_linhas = numero_linhas
+        self.numero_colunas = numero_colunas
+        self.sequencia_vitoria = sequencia_vitoria
+        self.altura_coluna = numero_linhas + 1
+        self.total_espacos = numero_linhas * numero_colunas
+        self.direcoes = [np.uint64(d) for d in (1, self.altura_coluna, self.altura_coluna - 1, self.altura_coluna + 1)]
+        self.zobrist = np.array(TabelaZobrist.para_dimensoes(numero_linhas, numero_colunas).valores, dtype=np.uint64)
+        self.rng = np.random.default_rng(semente)
+
+        self.posicoes = np.zeros((numero_jogos, 2), dtype=np.uint64)
+        self.alturas = np.zeros((numero_jogos, numero_colunas), dtype=np.int64)
+        self.jogadas = np.zeros(numero_jogos, dtype=np.int64)
+        self.jogador_atual = np.ones(numero_jogos, dtype=np.int64)
+        self.chaves = np.zeros(numero_jogos, dtype=np.uint64)
+        self.chaves_espelhadas = np.zeros(numero_jogos, dtype=np.uint64)
+        self.terminados = np.zeros(numero_jogos, dtype=bool)
+        self.ganhadores = np.zeros(numero_jogos, dtype=np.int64)
+        self.reset()
+
+    def reset(self, indices=None):
+        """Reinicia as partidas indicadas (todas por padrão), sorteando quem começa como em VisaoJogo.run"""
+        if indices is None:
+            indices = np.arange(self.numero_jogos)
+        self.posicoes[indices] = 0
+        self.alturas[indices] = 0
+        self.jogadas[indices] = 0
+        self.jogador_atual[indices] = self.rng.integers(1, 3, size=len(indices))
+        self.chaves[indices] = 0
+        self.chaves_espelhadas[indices] = 0
+        self.terminados[indices] = False
+        self.ganhadores[indices] = 0
+
+    def acoes_legais(self):
+        """Máscara (numero_jogos, numero_colunas) das colunas que ainda aceitam moedas nas partidas em andamento"""
+        return (self.alturas < self.numero_linhas) & ~self.terminados[:, None]
+
+    def checa_sequencia(self, posicoes):
+        """Vetor de booleanos indicando quais bitboards têm sequencia_vitoria bits seguidos em alguma direção"""
+        venceu = np.zeros(len(posicoes), dtype=bool)
+        for direcao in self.direcoes:
+            sequencia = posicoes.copy()
+            deslocamento = direcao
+            for k in range(1, self.sequencia_vitoria):
+                sequencia &= posicoes >> deslocamento
+                deslocamento = deslocamento + direcao
+            venceu |= sequencia != 0
+        return venceu
+
+    def step(self, acoes):
+        """Joga a ação de cada partida em andamento e retorna (recompensas, terminados)"""
+        acoes = np.asarray(acoes, dtype=np.int64)
+        indices = np.nonzero(~self.terminados)[0]
+        colunas = acoes[indices]
+        alturas = self.alturas[indices, colunas]
+        if np.any(alturas >= self.numero_linhas):
+            raise ColunaPreenchidaTotalmente('Coluna já está preenchida!')
+
+        jogadores = self.jogador_atual[indices]
+        bits = np.left_shift(np.uint64(1), (colunas * self.altura_coluna + alturas).astype(np.uint64))
+        self.posicoes[indices, jogadores - 1] |= bits
+        linhas = self.numero_linhas - 1 - alturas
+        self.chaves[indices] ^= self.zobrist[jogadores, linhas, colunas]
+        self.chaves_espelhadas[indices] ^= self.zobrist[jogadores, linhas, self.numero_colunas - 1 - colunas]
+        self.alturas[indices, colunas] += 1
+        self.jogadas[indices] += 1
+
+        venceu = self.checa_sequencia(self.posicoes[indices, jogadores - 1])
+        preenchida = self.jogadas[indices] == self.total_espacos
+        recompensas = np.zeros(self.numero_jogos)
+        recompensas[indices[venceu]] = 1.0
+        recompensas[indices[preenchida & ~venceu]] = 0.5
+        self.ganhadores[indices[venceu]] = jogadores[venceu]
+        self.terminados[indices] = venceu | preenchida
+        self.jogador_atual[indices] = 3 - jogadores
+
+        return (recompensas, self.terminados.copy())
+
+
+class PoliticaVetorizada(object):
+    """Política epsilon-greedy de um JogadorQLearningPlayer avaliada para muitas chaves Zobrist de uma vez"""
+
+    def __init__(self, jogador):
+        self.numero_colunas = jogador.numero_colunas
+        self.simetria = jogador.simetria
+        self.valor_inicial = jogador.valor_inicial_q
+        tabela = jogador.q
+        if isinstance(tabela, TabelaQArquivo) and not tabela.alteracoes.indices:
+            self.chaves = np.frombuffer(tabela.chaves, dtype=np.uint64)
+            self.valores = np.frombuffer(tabela.valores, dtype=np.float64).reshape(-1, self.numero_colunas)
+        else:
+            linhas = jogador.linhas_por_chave()
+            self.chaves = np.array(sorted(linhas), dtype=np.uint64)
+            self.valores = np.array([linhas[int(chave)] for chave in self.chaves],
+                                    dtype=np.float64).reshape(-1, self.numero_colunas)
+        self.rng = np.random.default_rng()
+        self.constroi_indice()
+
+    def constroi_indice(self):
+        """Monta a tabela hash com sondagem linear: cada espaço guarda a posição + 1 de uma chave em self.chaves e
+        0 marca um espaço vazio. As chaves Zobrist são aleatórias, então os seus bits baixos já servem de hash."""
+        tamanho = 1 << max(4, (2 * len(self.chaves) - 1).bit_length())
+        self.mascara_indice = tamanho - 1
+        self.indice = np.zeros(tamanho, dtype=np.int64)
+        pendentes = np.arange(len(self.chaves))
+        espacos = (self.chaves & np.uint64(self.mascara_indice)).astype(np.int64)
+        while len(pendentes):
+            # entre as chaves que disputam o mesmo espaço livre fica a primeira; as outras seguem para o próximo
+            livres = np.flatnonzero(self.indice[espacos] == 0)
+            (_, primeiras) = np.unique(espacos[livres], return_index=True)
+            colocadas = livres[primeiras]
+            self.indice[espacos[colocadas]] = pendentes[colocadas] + 1
+            restantes = np.ones(len(pendentes), dtype=bool)
+            restantes[colocadas] = False
+            pendentes = pendentes[restantes]
+            espacos = (espacos[restantes] + 1) & self.mascara_indice
+
+    def posicoes_das_chaves(self, chaves):
+        """Posição de cada chave em self.chaves, ou -1 para as chaves que não estão na tabela"""
+        posicoes = np.full(len(chaves), -1, dtype=np.int64)
+        if not len(self.chaves):
+            return posicoes
+        pendentes = np.arange(len(chaves))
+        espacos = (chaves & np.uint64(self.mascara_indice)).astype(np.int64)
+        while len(pendentes):
+            indices = self.indice[espacos]
+            ocupado = indices != 0
+            encontrado = ocupado & (self.chaves[indices - 1] == chaves[pendentes])
+            posicoes[pendentes[encontrado]] = indices[encontrado] - 1
+            continua = ocupado & ~encontrado
+            pendentes = pendentes[continua]
+            espacos = (espacos[continua] + 1) & self.mascara_indice
+        return posicoes
+
+    def valores_q(self, chaves, chaves_espelhadas=None):
+        """Retorna a matriz (len(chaves), numero_colunas) dos valores Q, com o valor inicial nos estados não vistos"""
+        chaves = np.asarray(chaves, dtype=np.uint64)
+        espelhado = np.zeros(len(chaves), dtype=bool)
+        if self.simetria and chaves_espelhadas is not None:
+            espelhado = np.asarray(chaves_espelhadas, dtype=np.uint64) < chaves
+            chaves = np.where(espelhado, chaves_espelhadas, chaves)
+
+        q = np.full((len(chaves), self.numero_colunas), self.valor_inicial)
+        posicoes = self.posicoes_das_chaves(chaves)
+        encontrado = posicoes >= 0
+        q[encontrado] = self.valores[posicoes[encontrado]]
+        q[espelhado] = q[espelhado, ::-1]
+        return q
+
+    def escolher_acoes(self, chaves, mascaras, epsilon=0.0, rng=None, chaves_espelhadas=None):
+        """Escolhe uma ação epsilon-greedy por estado e retorna (acoes, valores Q das ações escolhidas)"""
+        rng = rng if rng is not None else self.rng
+        mascaras = np.asarray(mascaras)
+        if mascaras.ndim == 1:
+            mascaras = (mascaras.astype(np.int64)[:, None] >> np.arange(self.numero_colunas)) & 1
+        mascaras = mascaras.astype(bool, copy=False)
+        q = np.where(mascaras, self.valores_q(chaves, chaves_espelhadas), -np.inf)
+        melhores = (q == q.max(axis=1, keepdims=True)) & mascaras
+        sorteio = rng.random(q.shape)
+        acoes = np.argmax(sorteio * melhores, axis=1)
+
+        explorar = rng.random(len(q)) < epsilon
+        if np.any(explorar):
+            acoes[explorar] = np.argmax(sorteio[explorar] * mascaras[explorar], axis=1)
+
+        return (acoes, q[np.arange(len(q)), acoes])
+
+    def escolher_acoes_bordas(self, bordas, epsilon=0.0, rng=None):
+        """escolher_acoes para as posições atuais de uma lista de bordas"""
+        (chaves, chaves_espelhadas, mascaras) = estados_das_bordas(bordas)
+        return self.escolher_acoes(chaves, mascaras, epsilon, rng, chaves_espelhadas)
+
+
+def estados_das_bordas(bordas):
+    """Retorna (chaves, chaves espelhadas, mascaras) de uma lista de Borda ou BordaBitboard com as mesmas
+    dimensões, no formato de PoliticaVetorizada.escolher_acoes"""
+    quantidade = len(bordas)
+    chaves = np.fromiter((borda.get_chave() for borda in bordas), dtype=np.uint64, count=quantidade)
+    chaves_espelhadas = np.fromiter((borda.get_chave_espelhada() for borda in bordas), dtype=np.uint64,
+                                    count=quantidade)
+    if not quantidade:
+        return (chaves, chaves_espelhadas, np.zeros((0, 0), dtype=bool))
+    numero_linhas = bordas[0].get_dimensoes()[0]
+    mascaras = np.array([borda.alturas for borda in bordas]) < numero_linhas
+    return (chaves, chaves_espelhadas, mascaras)
+
+
+def joga_lote(ambiente, politicas, epsilon=0.0, registrar_transicoes=False):
+    """Joga até o fim todas as partidas do ambiente e retorna (ganhadores, transicoes)"""
+    transicoes = []
+    while not np.all(ambiente.terminados):
+        mascaras = ambiente.acoes_legais()
+        acoes = np.argmax(ambiente.rng.random(mascaras.shape) * mascaras, axis=1)
+        for tipo_moeda in (1, 2):
+            politica = politicas[tipo_moeda]
+            vez = (ambiente.jogador_atual == tipo_moeda) & ~ambiente.terminados
+            if politica is not None and np.any(vez):
+                (acoes[vez], _) = politica.escolher_acoes(ambiente.chaves[vez], mascaras[vez], epsilon, ambiente.rng,
+                                                          ambiente.chaves_espelhadas[vez])
+
+        ativos = np.nonzero(~ambiente.terminados)[0]
+        jogadores = ambiente.jogador_atual[ativos]
+        chaves = ambiente.chaves[ativos]
+        (recompensas, terminados) = ambiente.step(acoes)
+        if registrar_transicoes:
+            transicoes.append((jogadores, chaves, acoes[ativos], recompensas[ativos], ambiente.chaves[ativos],
+                               terminados[ativos]))
+
+    return (ambiente.ganhadores.copy(), transicoes)
+
+
+def posicoes_aleatorias(quantidade, numero_linhas=TAMANHO_BORDA[0], numero_colunas=TAMANHO_BORDA[1], semente=None):
+    """Retorna (chaves, chaves espelhadas, mascaras) de quantidade posições de partidas aleatórias em andamento"""
+    ambiente = AmbienteVetorizado(min(quantidade, 4096), numero_linhas, numero_colunas, semente=semente)
+    partes = ([], [], [])
+    coletadas = 0
+    while coletadas < quantidade:
+        if np.all(ambiente.terminados):
+            ambiente.reset()
+        ativos = ~ambiente.terminados
+        mascaras = ambiente.acoes_legais()
+        partes[0].append(ambiente.chaves[ativos])
+        partes[1].append(ambiente.chaves_espelhadas[ativos])
+        partes[2].append(mascaras[ativos])
+        coletadas += int(np.count_nonzero(ativos))
+        ambiente.step(np.argmax(ambiente.rng.random(mascaras.shape) * mascaras, axis=1))
+    return tuple(np.concatenate(parte)[:quantidade] for parte in partes)
+
+
+def compara_escolha(jogador, politica, chaves, chaves_espelhadas, mascaras):
+    """Posições por segundo de um laço de escolher_acao do jogador (com chaves Zobrist) e de uma única chamada de
+    escolher_acoes da política para as mesmas posições"""
+    if jogador.simetria:
+        estados = [(int(chave), int(espelhada)) for (chave, espelhada) in zip(chaves, chaves_espelhadas)]
+    else:
+        estados = [int(chave) for chave in chaves]
+    acoes = [np.flatnonzero(mascara).tolist() for mascara in mascaras]
+    inicio = time.perf_counter()
+    for (estado, acoes_estado) in zip(estados, acoes):
+        jogador.escolher_acao(estado, acoes_estado)
+    tempo_laco = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    politica.escolher_acoes(chaves, mascaras, jogador.epsilon, chaves_espelhadas=chaves_espelhadas)
+    tempo_lote = time.perf_counter() - inicio
+    return {'posicoes': len(chaves), 'posicoes_por_segundo_laco': len(chaves) / tempo_laco,
+            'posicoes_por_segundo_lote': len(chaves) / tempo_lote, 'aceleracao': tempo_laco / tempo_lote}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jogos', default=4096, type=int, action="store",
+                        help="Número de partidas simuladas ao mesmo tempo")
+    parser.add_argument('--lotes', default=10, type=int, action="store",
+                        help="Quantas vezes o lote de partidas é jogado")
+    parser.add_argument('--tabela-q', default=None, action="store",
+                        help="Arquivo de tabela Q usado pela moeda 1; sem ele as duas moedas jogam aleatoriamente")
+    parser.add_argument('--epsilon', default=0.0, type=float, action="store",
+                        help="Chance de exploração aleatória da política da tabela Q")
+    parser.add_argument('--comparar-escolha', default=0, type=int, action="store",
+                        help="Compara a escolha de ação em lote com um laço de escolher_acao nesse número de "
+                             "posições, em vez de jogar as partidas")
+    args = parser.parse_args()
+
+    politicas = {1: None, 2: None}
+    jogador = JogadorQLearningPlayer(1, epsilon=args.epsilon, chave_zobrist=True)
+    if args.tabela_q:
+        jogador.carregar_tabela(args.tabela_q)
+        politicas[1] = PoliticaVetorizada(jogador)
+
+    if args.comparar_escolha:
+        resultado = compara_escolha(jogador, PoliticaVetorizada(jogador),
+                                    *posicoes_aleatorias(args.comparar_escolha, semente=0))
+        print("%d posições | laço: %.0f posições/s | lote: %.0f posições/s | %.1fx" % (
+            resultado['posicoes'], resultado['posicoes_por_segundo_laco'], resultado['posicoes_por_segundo_lote'],
+            resultado['aceleracao']))
+        sys.exit(0)
+
+    ambiente = AmbienteVetorizado(args.jogos, semente=0)
+    vitorias = np.zeros(3, dtype=np.int64)
+    jogadas = 0
+    inicio = time.perf_counter()
+    for _ in range(args.lotes):
+        ambiente.reset()
+        (ganhadores, _) = joga_lote(ambiente, politicas, args.epsilon)
+        vitorias += np.bincount(ganhadores, minlength=3)
+        jogadas += int(ambiente.jogadas.sum())
+    tempo = time.perf_counter() - inicio
+
+    print("partidas: %d | vitorias moeda 1: %d | vitorias moeda 2: %d | empates: %d | %.0f jogadas/s" % (
+        args.jogos * args.lotes, vitorias[1], vitorias[2], vitorias[0], jogadas / tempo))
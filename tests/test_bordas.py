@@ -0,0 +1,153 @@
+import random
+
+import pytest
+
+from Connect4_Logica import BordaBitboard, LogicaJogo, MoedaLogica
+from Connect4_Main import Borda
+
+# (linhas, colunas, sequência de vitória)
+DIMENSOES = [(7, 6, 4), (6, 7, 4), (4, 5, 3), (5, 4, 4), (8, 9, 5)]
+
+
+def cria_bordas(numero_linhas, numero_colunas, sequencia_vitoria):
+    """Retorna [(borda, logica_jogo)] para as bordas de linhas, de grafo e bitboard"""
+    bordas = [Borda(numero_linhas, numero_colunas, sem_interface=True),
+              Borda(numero_linhas, numero_colunas, sem_interface=True, deteccao_grafo=True),
+              BordaBitboard(numero_linhas, numero_colunas)]
+    return [(borda, LogicaJogo(borda, sequencia_vitoria)) for borda in bordas]
+
+
+def estado_espelhado(estado):
+    return tuple(linha[::-1] for linha in estado)
+
+
+def joga(borda, logica_jogo, coluna, tipo_moeda):
+    moeda = MoedaLogica(tipo_moeda)
+    moeda.set_coluna(coluna)
+    return borda.insere_moeda(moeda, None, logica_jogo)
+
+
+@pytest.mark.parametrize('semente', range(20))
+@pytest.mark.parametrize('dimensoes', DIMENSOES)
+def test_partidas_aleatorias_iguais_nas_tres_bordas(dimensoes, semente):
+    gerador = random.Random(semente)
+    bordas = cria_bordas(*dimensoes)
+    (referencia, _) = bordas[0]
+    zobrist = referencia.zobrist
+    tipo_moeda = gerador.randint(1, 2)
+    fim_de_jogo = False
+    while not fim_de_jogo:
+        acoes = referencia.get_acoes_disponiveis()
+        coluna = gerador.choice(acoes)
+        chave_anterior = referencia.get_chave()
+        resultados = [joga(borda, logica_jogo, coluna, tipo_moeda) for (borda, logica_jogo) in bordas]
+        assert len(set(resultados)) == 1
+        fim_de_jogo = resultados[0]
+
+        estado = referencia.get_estado()
+        for (borda, logica_jogo) in bordas:
+            assert borda.get_estado() == estado
+            assert borda.get_acoes_disponiveis() == [j for j in acoes if not borda.checa_coluna_preenchida(j)]
+            assert borda.get_chave() == zobrist.chave_do_estado(estado)
+            assert borda.get_chave_espelhada() == zobrist.chave_do_estado(estado_espelhado(estado))
+            assert borda.get_chave_anterior() == chave_anterior
+            assert borda.get_colunas_jogadas() == referencia.get_colunas_jogadas()
+            assert logica_jogo.get_ganhador() == bordas[0][1].get_ganhador()
+        tipo_moeda = 1 if tipo_moeda == 2 else 2
+
+    (_, logica_jogo) = bordas[0]
+    if logica_jogo.get_ganhador() == 0:
+        assert referencia.checa_borda_preenchida()
+
+
+def test_borda_vazia_tem_chave_zero():
+    for (borda, _) in cria_bordas(6, 7, 4):
+        assert borda.get_chave() == 0
+        assert borda.get_chave_espelhada() == 0
+        assert borda.zobrist.chave_do_estado(borda.get_estado()) == 0
+
+
+@pytest.mark.parametrize('dimensoes', DIMENSOES)
+def test_bit_sentinela_separa_as_colunas(dimensoes):
+    """O topo de uma coluna e a base da seguinte não formam uma sequência vertical"""
+    (numero_linhas, numero_colunas, sequencia_vitoria) = dimensoes
+    borda = BordaBitboard(numero_linhas, numero_colunas)
+    logica_jogo = LogicaJogo(borda, sequencia_vitoria)
+    metade = sequencia_vitoria // 2
+    for _ in range(numero_linhas - metade):
+        borda.insere_na_coluna(0, 2)
+    for _ in range(metade):
+        borda.insere_na_coluna(0, 1)
+    for _ in range(sequencia_vitoria - metade - 1):
+        borda.insere_na_coluna(1, 1)
+    assert not borda.ultima_jogada_venceu(logica_jogo)
+    # sem o bit sentinela os bits seguidos do jogador 1 passariam de uma coluna para a outra
+    posicao = borda.get_representacao()[1]
+    sem_sentinela = posicao | (1 << numero_linhas)
+    assert borda.checa_sequencia(sem_sentinela, sequencia_vitoria)
+
+    # a última coluna não passa do limite da borda e também não vence pela direção horizontal com a primeira
+    borda.reset()
+    for _ in range(sequencia_vitoria - 1):
+        borda.insere_na_coluna(numero_colunas - 1, 1)
+    assert not borda.ultima_jogada_venceu(logica_jogo)
+    borda.insere_na_coluna(numero_colunas - 1, 1)
+    assert borda.ultima_jogada_venceu(logica_jogo)
+
+
+@pytest.mark.parametrize('semente', range(10))
+@pytest.mark.parametrize('dimensoes', DIMENSOES)
+def test_remove_ultima_moeda_desfaz_a_jogada(dimensoes, semente):
+    (numero_linhas, numero_colunas, sequencia_vitoria) = dimensoes
+    gerador = random.Random(semente)
+    borda = BordaBitboard(numero_linhas, numero_colunas)
+    logica_jogo = LogicaJogo(borda, sequencia_vitoria)
+    historico = [(borda.get_estado(), borda.get_chave(), borda.get_chave_espelhada(), list(borda.posicoes),
+                  borda.ultimo_valor)]
+    tipo_moeda = 1
+    while not borda.checa_borda_preenchida():
+        coluna = gerador.choice(borda.get_acoes_disponiveis())
+        borda.insere_na_coluna(coluna, tipo_moeda)
+        # desfazer e refazer a jogada deixa a borda como estava
+        estado = borda.get_estado()
+        assert borda.get_estado_anterior() == historico[-1][0]
+        assert borda.remove_ultima_moeda() == coluna
+        assert (borda.get_estado(), borda.get_chave(), borda.get_chave_espelhada(), list(borda.posicoes),
+                borda.ultimo_valor) == historico[-1]
+        borda.insere_na_coluna(coluna, tipo_moeda)
+        assert borda.get_estado() == estado
+        historico.append((estado, borda.get_chave(), borda.get_chave_espelhada(), list(borda.posicoes),
+                          borda.ultimo_valor))
+        # a partida continua depois de uma vitória para desfazer a borda cheia
+        borda.ultima_jogada_venceu(logica_jogo)
+        tipo_moeda = 1 if tipo_moeda == 2 else 2
+
+    while borda.historico:
+        historico.pop()
+        borda.remove_ultima_moeda()
+        assert (borda.get_estado(), borda.get_chave(), borda.get_chave_espelhada(), list(borda.posicoes),
+                borda.ultimo_valor) == historico[-1]
+    assert borda.get_chave() == 0
+    assert borda.numero_espacos_preenchidos == 0
+    assert borda.alturas == [0] * numero_colunas
+
+
+@pytest.mark.parametrize('semente', range(10))
+@pytest.mark.parametrize('dimensoes', DIMENSOES)
+def test_mascara_de_acoes_tem_o_proximo_espaco_de_cada_coluna(dimensoes, semente):
+    (numero_linhas, numero_colunas, _) = dimensoes
+    gerador = random.Random(semente)
+    borda = BordaBitboard(numero_linhas, numero_colunas)
+    tipo_moeda = 1
+    while True:
+        esperada = 0
+        for j in borda.get_acoes_disponiveis():
+            esperada |= 1 << (j * borda.altura_coluna + borda.alturas[j])
+        assert borda.get_mascara_acoes() == esperada
+        assert borda.get_mascara_acoes() & borda.get_mascara_ocupada() == 0
+        if borda.checa_borda_preenchida():
+            break
+        borda.insere_na_coluna(gerador.choice(borda.get_acoes_disponiveis()), tipo_moeda)
+        tipo_moeda = 1 if tipo_moeda == 2 else 2
+    assert borda.get_mascara_acoes() == 0
+    assert borda.get_acoes_disponiveis() == []
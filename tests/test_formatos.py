@@ -0,0 +1,305 @@
+import os
+import pickle
+import random
+
+import pytest
+
+from Connect4_Checkpoint import CheckpointTreino
+from Connect4_LivroAberturas import LivroAberturas, enumera_posicoes
+from Connect4_Logica import BordaBitboard, LogicaJogo, TabelaZobrist
+from Connect4_Main import JogadorQLearningPlayer, TreinoSemInterface
+from Connect4_RegistroPartidas import RegistroPartidas, le_registro_partidas
+from Connect4_TabelasQ import TabelaQArquivo
+
+
+def estado_espelhado(estado):
+    return tuple(linha[::-1] for linha in estado)
+
+
+def treina(partidas, semente=0, **opcoes):
+    random.seed(semente)
+    treino = TreinoSemInterface(tipo_borda="bitboard", **opcoes)
+    treino.treinar(partidas)
+    return treino
+
+
+def trunca(caminho, bytes_removidos):
+    with open(caminho, 'r+b') as arquivo:
+        arquivo.truncate(os.path.getsize(caminho) - bytes_removidos)
+
+
+# region Tabela Q (C4QT)
+
+@pytest.mark.parametrize('mapear', [True, False])
+@pytest.mark.parametrize('opcoes', [{}, {'chave_zobrist': True}, {'chave_zobrist': True, 'tabela_compacta': True},
+                                    {'limite_estados_q': 500}])
+def test_tabela_q_volta_igual_do_arquivo(tmp_path, opcoes, mapear):
+    jogador = treina(30, **opcoes).p1.jogador
+    caminho = str(tmp_path / 'q.c4qt')
+    jogador.salvar_tabela(caminho)
+
+    carregado = JogadorQLearningPlayer(1)
+    carregado.carregar_tabela(caminho, mapear)
+    assert isinstance(carregado.q, TabelaQArquivo)
+    assert carregado.chave_zobrist and not carregado.simetria
+    assert carregado.linhas_por_chave() == jogador.linhas_por_chave()
+    assert len(carregado.q) == len(jogador.linhas_por_chave())
+    carregado.q.fechar()
+
+
+def test_alteracoes_da_tabela_do_arquivo_sao_gravadas(tmp_path):
+    jogador = treina(30, chave_zobrist=True).p1.jogador
+    caminho = str(tmp_path / 'q.c4qt')
+    jogador.salvar_tabela(caminho)
+    carregado = JogadorQLearningPlayer(1)
+    carregado.carregar_tabela(caminho)
+
+    chave_existente = next(iter(jogador.linhas_por_chave()))
+    carregado.q[(chave_existente, 2)] = -0.5
+    carregado.q[(12345, 0)] = 0.25
+    esperado = jogador.linhas_por_chave()
+    esperado[chave_existente][2] = -0.5
+    esperado[12345] = [JogadorQLearningPlayer.VALOR_Q_INICIAL] * carregado.numero_colunas
+    esperado[12345][0] = 0.25
+    assert carregado.linhas_por_chave() == esperado
+
+    caminho_novo = str(tmp_path / 'q2.c4qt')
+    carregado.salvar_tabela(caminho_novo)
+    carregado.q.fechar()
+    releitura = JogadorQLearningPlayer(1)
+    releitura.carregar_tabela(caminho_novo)
+    assert releitura.linhas_por_chave() == esperado
+    releitura.q.fechar()
+
+
+def test_simetria_e_canonizada_pela_chave_ao_gravar(tmp_path):
+    """Com estados em tuplas o espelho canônico é o menor na ordem das tuplas; no arquivo é o de menor chave"""
+    jogador = treina(60, simetria=True).p1.jogador
+    caminho = str(tmp_path / 'q.c4qt')
+    jogador.salvar_tabela(caminho)
+    carregado = JogadorQLearningPlayer(1)
+    carregado.carregar_tabela(caminho)
+    assert carregado.simetria
+
+    (numero_linhas, numero_colunas) = (len(next(iter(jogador.q))[0]), jogador.numero_colunas)
+    zobrist = TabelaZobrist.para_dimensoes(numero_linhas, numero_colunas)
+    orientacoes_diferentes = 0
+    for (estado, acao) in list(jogador.q):
+        for orientacao in (estado, estado_espelhado(estado)):
+            chaves = (zobrist.chave_do_estado(orientacao), zobrist.chave_do_estado(estado_espelhado(orientacao)))
+            (canonico, espelhado) = jogador.canoniza(orientacao)
+            (chave_canonica, chave_espelhada) = carregado.canoniza(chaves)
+            if espelhado != chave_espelhada:
+                orientacoes_diferentes += 1
+            for a in range(numero_colunas):
+                assert (carregado.getQ(chave_canonica, carregado.espelha_acao(a, chave_espelhada)) ==
+                        jogador.getQ(canonico, jogador.espelha_acao(a, espelhado)))
+    # a tabela tem estados cuja orientação canônica muda de uma ordem para a outra
+    assert orientacoes_diferentes > 0
+    carregado.q.fechar()
+
+
+@pytest.mark.parametrize('mapear', [True, False])
+def test_tabela_q_truncada_ou_corrompida(tmp_path, mapear):
+    jogador = treina(10, chave_zobrist=True).p1.jogador
+    caminho = str(tmp_path / 'q.c4qt')
+    jogador.salvar_tabela(caminho)
+    with open(caminho, 'rb') as arquivo:
+        conteudo = arquivo.read()
+
+    corrompidos = {
+        'vazio': b'',
+        'cabecalho_pela_metade': conteudo[:TabelaQArquivo.CABECALHO.size // 2],
+        'sem_o_fim_dos_valores': conteudo[:-8],
+        'lixo_no_fim': conteudo + b'\0',
+        'assinatura': b'XXXX' + conteudo[4:],
+        'versao': conteudo[:4] + bytes([TabelaQArquivo.VERSAO + 1]) + conteudo[5:],
+    }
+    for (nome, dados) in corrompidos.items():
+        caminho_corrompido = str(tmp_path / (nome + '.c4qt'))
+        with open(caminho_corrompido, 'wb') as arquivo:
+            arquivo.write(dados)
+        with pytest.raises(ValueError):
+            TabelaQArquivo(caminho_corrompido, mapear)
+
+
+def test_tabela_q_de_outro_numero_de_colunas(tmp_path):
+    jogador = treina(10, chave_zobrist=True).p1.jogador
+    caminho = str(tmp_path / 'q.c4qt')
+    jogador.salvar_tabela(caminho)
+    with pytest.raises(ValueError):
+        JogadorQLearningPlayer(1, numero_colunas=jogador.numero_colunas + 1).carregar_tabela(caminho)
+
+# endregion
+
+# region Livro de aberturas (C4LA)
+
+@pytest.mark.parametrize('dimensoes', [(6, 7), (7, 6), (4, 5)])
+def test_livro_volta_igual_e_consulta_os_espelhos(tmp_path, dimensoes):
+    (numero_linhas, numero_colunas) = dimensoes
+    gerador = random.Random(1)
+    posicoes = {}
+    estados = []
+    for (chave, estado, tipo_moeda) in enumera_posicoes(numero_linhas, numero_colunas, 4):
+        posicoes[chave] = (gerador.randrange(numero_colunas), gerador.randint(-100, 100))
+        estados.append((chave, estado, tipo_moeda))
+    caminho = str(tmp_path / 'livro.c4la')
+    LivroAberturas.grava(caminho, numero_linhas, numero_colunas, posicoes)
+
+    livro = LivroAberturas(caminho)
+    assert (livro.numero_linhas, livro.numero_colunas) == dimensoes
+    assert len(livro) == len(posicoes)
+    assert {chave: (coluna, valor) for (chave, coluna, valor) in zip(livro.chaves, livro.colunas, livro.valores)} == \
+        posicoes
+    for (chave, estado, tipo_moeda) in estados:
+        coluna = posicoes[chave][0]
+        assert livro.consulta(estado, tipo_moeda) == coluna
+        if estado_espelhado(estado) != estado:
+            assert livro.consulta(estado_espelhado(estado), tipo_moeda) == numero_colunas - 1 - coluna
+    outra_dimensao = tuple((0,) * (numero_colunas + 1) for _ in range(numero_linhas))
+    assert livro.consulta(outra_dimensao, 1) is None
+
+
+def test_livro_truncado_ou_corrompido(tmp_path):
+    caminho = str(tmp_path / 'livro.c4la')
+    LivroAberturas.grava(caminho, 6, 7, {chave: (3, 0) for (chave, _, _) in enumera_posicoes(6, 7, 3)})
+    with open(caminho, 'rb') as arquivo:
+        conteudo = arquivo.read()
+    for dados in (b'', conteudo[:10], conteudo[:-1], conteudo + b'\0', b'XXXX' + conteudo[4:]):
+        with open(caminho, 'wb') as arquivo:
+            arquivo.write(dados)
+        with pytest.raises(ValueError):
+            LivroAberturas(caminho)
+
+# endregion
+
+# region Registro de partidas (C4RP)
+
+def partidas_aleatorias(quantidade, semente=0):
+    gerador = random.Random(semente)
+    tipos = RegistroPartidas.TIPOS_JOGADOR
+    return [((gerador.choice(tipos), gerador.choice(tipos)), gerador.randint(1, 2),
+             [gerador.randrange(7) for _ in range(gerador.randint(1, 42))], gerador.randint(0, 2))
+            for _ in range(quantidade)]
+
+
+def test_registro_volta_igual_em_varios_blocos(tmp_path):
+    caminho = str(tmp_path / 'partidas.c4rp')
+    partidas = partidas_aleatorias(23)
+    with RegistroPartidas(caminho, 6, 7, 4, partidas_por_bloco=5) as registro:
+        for partida in partidas[:10]:
+            registro.registra(*partida)
+    # um segundo registro acrescenta blocos ao mesmo arquivo
+    with RegistroPartidas(caminho, 6, 7, 4, partidas_por_bloco=5) as registro:
+        for partida in partidas[10:]:
+            registro.registra(*partida)
+    assert registro.partidas_registradas == 13
+
+    lidas = list(le_registro_partidas(caminho))
+    assert [(jogadores, primeiro, list(colunas), ganhador) for (_, jogadores, primeiro, colunas, ganhador) in lidas] \
+        == partidas
+    assert {dimensoes for (dimensoes, _, _, _, _) in lidas} == {(6, 7, 4)}
+
+
+def test_registro_ignora_o_ultimo_bloco_gravado_pela_metade(tmp_path):
+    caminho = str(tmp_path / 'partidas.c4rp')
+    partidas = partidas_aleatorias(12)
+    with RegistroPartidas(caminho, partidas_por_bloco=4) as registro:
+        for partida in partidas:
+            registro.registra(*partida)
+    trunca(caminho, 3)
+    assert len(list(le_registro_partidas(caminho))) == 8
+
+    with open(caminho, 'r+b') as arquivo:
+        arquivo.write(b'XXXX')
+    with pytest.raises(ValueError):
+        list(le_registro_partidas(caminho))
+
+
+def test_registro_das_partidas_de_treino_reproduz_os_ganhadores(tmp_path):
+    caminho = str(tmp_path / 'partidas.c4rp')
+    with RegistroPartidas(caminho, partidas_por_bloco=16) as registro:
+        treino = treina(40, registro_partidas=registro, tipo_jogador_p2="random")
+    lidas = list(le_registro_partidas(caminho))
+    assert len(lidas) == 40
+    assert sum(1 for (_, _, _, _, ganhador) in lidas if ganhador == 0) == treino.empates
+    for ((numero_linhas, numero_colunas, sequencia_vitoria), jogadores, primeiro, colunas, ganhador) in lidas:
+        assert sorted(jogadores) == ["qlearner", "random"]
+        borda = BordaBitboard(numero_linhas, numero_colunas)
+        logica_jogo = LogicaJogo(borda, sequencia_vitoria)
+        tipo_moeda = primeiro
+        for (i, coluna) in enumerate(colunas):
+            borda.insere_na_coluna(coluna, tipo_moeda)
+            venceu = borda.ultima_jogada_venceu(logica_jogo)
+            assert venceu == (i == len(colunas) - 1 and ganhador != 0)
+            tipo_moeda = 3 - tipo_moeda
+        if ganhador:
+            assert borda.ultimo_valor == ganhador
+        else:
+            assert borda.checa_borda_preenchida()
+
+# endregion
+
+# region Checkpoints
+
+@pytest.mark.parametrize('opcoes', [{}, {'tabela_compacta': True, 'chave_zobrist': True, 'lambda_td': 0.5},
+                                    {'replay': True}])
+def test_checkpoint_continua_o_treino_como_se_nao_tivesse_parado(tmp_path, opcoes):
+    caminho = str(tmp_path / 'treino.ckpt')
+    continuo = treina(40, semente=3, **opcoes)
+
+    random.seed(3)
+    primeira_metade = TreinoSemInterface(tipo_borda="bitboard", **opcoes)
+    checkpoint = CheckpointTreino(caminho, intervalo=20)
+    primeira_metade.treinar(20, checkpoint=checkpoint)
+    assert checkpoint.gravados == 1 and checkpoint.falhas == 0
+
+    retomado = TreinoSemInterface(tipo_borda="bitboard", **opcoes)
+    retomado.restaura(CheckpointTreino.carrega(caminho))
+    assert retomado.partidas_jogadas == 20
+    retomado.treinar(20)
+    assert (retomado.lst_vitoria, retomado.empates) == (continuo.lst_vitoria, continuo.empates)
+    for (jogador_pc, jogador_pc_continuo) in ((retomado.p1, continuo.p1), (retomado.p2, continuo.p2)):
+        assert jogador_pc.jogador.linhas_por_chave() == jogador_pc_continuo.jogador.linhas_por_chave()
+
+
+def test_checkpoint_com_tabela_do_arquivo_guarda_as_alteracoes(tmp_path):
+    caminho_tabela = str(tmp_path / 'q.c4qt')
+    treina(20, chave_zobrist=True).p1.jogador.salvar_tabela(caminho_tabela)
+    treino = TreinoSemInterface(tipo_borda="bitboard", chave_zobrist=True)
+    for jogador_pc in (treino.p1, treino.p2):
+        jogador_pc.jogador.carregar_tabela(caminho_tabela)
+    treino.treinar(10)
+    caminho = str(tmp_path / 'treino.ckpt')
+    checkpoint = CheckpointTreino(caminho)
+    checkpoint.grava(treino.estado_checkpoint())
+    checkpoint.espera()
+
+    estado = CheckpointTreino.carrega(caminho)
+    (p1, _) = estado['jogadores']
+    assert isinstance(p1.jogador.q, TabelaQArquivo)
+    assert len(p1.jogador.q.alteracoes) > 0
+    assert p1.jogador.linhas_por_chave() == treino.p1.jogador.linhas_por_chave()
+
+
+def test_checkpoint_truncado_ou_de_outra_versao(tmp_path):
+    caminho = str(tmp_path / 'treino.ckpt')
+    treino = treina(5)
+    checkpoint = CheckpointTreino(caminho)
+    checkpoint.grava(treino.estado_checkpoint())
+    checkpoint.espera()
+    trunca(caminho, 10)
+    with pytest.raises(ValueError):
+        CheckpointTreino.carrega(caminho)
+
+    with open(caminho, 'wb') as arquivo:
+        pickle.dump(dict(treino.estado_checkpoint(), versao=CheckpointTreino.VERSAO + 1), arquivo)
+    with pytest.raises(ValueError):
+        CheckpointTreino.carrega(caminho)
+
+    with open(caminho, 'wb') as arquivo:
+        arquivo.write(b'')
+    with pytest.raises(ValueError):
+        CheckpointTreino.carrega(caminho)
+
+# endregion
@@ -0,0 +1,267 @@
+import multiprocessing
+
+import pytest
+
+from Connect4_TabelasQ import TabelaQCompartilhada, TabelaQLimitada
+
+# region TabelaQCompartilhada
+
+@pytest.fixture
+def compartilhada():
+    tabelas = []
+
+    def cria(capacidade=16, processos=1, numero_colunas=7, valor_inicial=1.0):
+        tabela = TabelaQCompartilhada(numero_colunas, capacidade, processos, valor_inicial)
+        tabelas.append(tabela)
+        return tabela
+    yield cria
+    for tabela in tabelas:
+        tabela.fechar()
+
+
+def test_compartilhada_guarda_a_chave_zero_fora_das_chaves(compartilhada):
+    tabela = compartilhada()
+    assert (0, 3) not in tabela
+    assert tabela.get((0, 3)) is None
+    assert len(tabela) == 0
+
+    tabela[(0, 3)] = 0.5
+    assert (0, 3) in tabela
+    assert tabela[(0, 3)] == 0.5
+    # as outras ações da linha começam com o valor inicial
+    assert tabela.linha(0) == [1.0, 1.0, 1.0, 0.5, 1.0, 1.0, 1.0]
+    assert len(tabela) == 1
+    assert tabela.chaves.tolist().count(0) == tabela.capacidade
+    assert list(tabela.itens_por_estado()) == [(0, [1.0, 1.0, 1.0, 0.5, 1.0, 1.0, 1.0])]
+    assert tabela.estatisticas()['insercoes'] == [0]
+
+
+def test_compartilhada_chaves_que_colidem(compartilhada):
+    tabela = compartilhada(capacidade=16)
+    # todas caem no último espaço e a sondagem linear dá a volta para o começo da tabela
+    chaves = [15 + 16 * k for k in range(1, 6)]
+    for (acao, chave) in enumerate(chaves):
+        tabela[(chave, acao)] = -float(acao)
+    for (acao, chave) in enumerate(chaves):
+        assert tabela[(chave, acao)] == -float(acao)
+        assert tabela.get((chave, (acao + 1) % 7)) == 1.0
+    assert sorted(tabela.chaves.tolist())[-5:] == sorted(chaves)
+    assert tabela.chaves[15] == chaves[0]
+    assert tabela.chaves.tolist()[:4] == chaves[1:]
+    # uma chave ausente que colide para de procurar no primeiro espaço vazio
+    assert tabela.get((15 + 16 * 9, 0)) is None
+    assert len(tabela) == 5
+
+
+def test_compartilhada_cota_esgotada_descarta_e_deixa_espaco_vazio(compartilhada):
+    tabela = compartilhada(capacidade=16)
+    limite = int(TabelaQCompartilhada.CARGA_MAXIMA * 16)
+    assert tabela.cota_insercoes == limite
+    for chave in range(1, 31):
+        tabela[(chave, 0)] = 0.0
+        # uma chave já presente continua sendo atualizada depois de a cota acabar
+        tabela[(1, 1)] = float(chave)
+
+    assert len(tabela) == limite
+    assert tabela.chaves.tolist().count(0) == 16 - limite
+    assert tabela[(1, 1)] == 30.0
+    assert tabela.get((30, 0)) is None
+    assert tabela.get((12345, 0)) is None
+    estatisticas = tabela.estatisticas()
+    assert estatisticas['insercoes'] == [limite]
+    assert estatisticas['descartados'] == [30 - limite]
+    assert estatisticas['atualizacoes'] == [limite + 30]
+    assert estatisticas['estados'] == limite
+    assert estatisticas['carga'] == limite / 16
+
+
+def test_compartilhada_divide_a_cota_entre_os_processos(compartilhada):
+    tabela = compartilhada(capacidade=64, processos=2)
+    outra = TabelaQCompartilhada.conecta(tabela.memoria.name, 1)
+    try:
+        cota = int(TabelaQCompartilhada.CARGA_MAXIMA * 64) // 2
+        assert tabela.cota_insercoes == outra.cota_insercoes == cota
+        for chave in range(1, 100):
+            (tabela if chave % 2 else outra)[(chave, 0)] = float(chave)
+        estatisticas = tabela.estatisticas()
+        assert estatisticas['insercoes'] == [cota, cota]
+        assert estatisticas['descartados'] == [50 - cota, 49 - cota]
+        assert len(outra) == len(tabela) == 2 * cota
+        assert outra[(1, 0)] == 1.0 and tabela[(2, 0)] == 2.0
+    finally:
+        outra.fechar()
+
+
+def processo_insere(nome, chaves):
+    tabela = TabelaQCompartilhada.conecta(nome, 1)
+    for chave in chaves:
+        tabela.set_linha(chave, [float(chave)] * tabela.numero_colunas)
+    tabela.fechar()
+
+
+def test_compartilhada_vista_por_outro_processo(compartilhada):
+    tabela = compartilhada(capacidade=256, processos=2)
+    processo = multiprocessing.Process(target=processo_insere, args=(tabela.memoria.name, [0, 5, 261]))
+    processo.start()
+    processo.join()
+    assert processo.exitcode == 0
+    assert tabela.linha(0) == [0.0] * 7
+    assert tabela.linha(261) == [261.0] * 7
+    assert tabela.estatisticas()['insercoes'] == [0, 2]
+    assert len(tabela) == 3
+
+
+def test_compartilhada_carrega_sem_gastar_as_cotas(compartilhada):
+    tabela = compartilhada(capacidade=32, processos=2)
+    linhas = [(0, [0.5] * 7)] + [(chave * 32, [float(chave)] * 7) for chave in range(1, 11)]
+    tabela.carrega(linhas)
+    # carregar de novo as mesmas chaves só sobrescreve as linhas
+    tabela.carrega([(32, [-1.0] * 7)])
+
+    limite = int(TabelaQCompartilhada.CARGA_MAXIMA * 32)
+    assert tabela.cabecalho[5] == 10
+    assert tabela.cota_insercoes == (limite - 10) // 2
+    estatisticas = tabela.estatisticas()
+    assert estatisticas['estados'] == 11
+    assert estatisticas['insercoes'] == [0, 0]
+    assert estatisticas['atualizacoes'] == [0, 0]
+    assert tabela.linha(0) == [0.5] * 7
+    assert tabela.linha(32) == [-1.0] * 7
+    assert tabela.linha(320) == [10.0] * 7
+    assert dict(tabela.itens_por_estado()) == dict([(32, [-1.0] * 7)] + linhas[2:] + linhas[:1])
+    compacta = tabela.para_compacta()
+    assert {estado: list(valores) for (estado, valores) in compacta.itens_por_estado()} == \
+        dict(tabela.itens_por_estado())
+
+    outra = TabelaQCompartilhada.conecta(tabela.memoria.name, 1)
+    try:
+        assert outra.cota_insercoes == tabela.cota_insercoes
+        assert outra.linha(320) == [10.0] * 7
+    finally:
+        outra.fechar()
+
+
+def test_compartilhada_recusa_carregar_alem_da_carga_maxima(compartilhada):
+    tabela = compartilhada(capacidade=16)
+    limite = int(TabelaQCompartilhada.CARGA_MAXIMA * 16)
+    assert TabelaQCompartilhada.cabem(limite, 16)
+    assert not TabelaQCompartilhada.cabem(limite + 1, 16)
+    # a borda vazia fica fora das chaves e não conta para a carga
+    tabela.carrega([(0, [0.0] * 7)] + [(chave, [0.0] * 7) for chave in range(1, limite - 1)])
+    assert tabela.cota_insercoes == 2
+    with pytest.raises(ValueError):
+        tabela.carrega([(chave, [0.0] * 7) for chave in range(limite - 1, limite + 3)])
+    # as linhas carregadas antes do erro ficam e gastam o resto da carga
+    assert tabela.cabecalho[5] == limite
+    assert tabela.cota_insercoes == 0
+    assert len(tabela) == limite + 1
+    assert tabela.chaves.tolist().count(0) == 16 - limite
+    tabela[(99, 0)] = 0.0
+    assert tabela.get((99, 0)) is None
+    assert tabela.estatisticas()['descartados'] == [1]
+
+# endregion
+
+# region TabelaQLimitada
+
+def test_limitada_precisa_de_um_limite():
+    with pytest.raises(ValueError):
+        TabelaQLimitada(7)
+
+
+def test_limitada_reaproveita_as_linhas_alem_da_capacidade():
+    tabela = TabelaQLimitada(7, capacidade=3)
+    for estado in range(1, 4):
+        tabela[(estado, 0)] = float(estado)
+    assert tabela.remocoes == 0
+
+    for estado in range(4, 11):
+        tabela[(estado, 2)] = float(estado)
+        assert len(tabela.estados) == len(tabela.indices) == 3
+        assert len(tabela.valores) == 3 * 7
+        assert len(tabela.contadores) == len(tabela.ultima_atualizacao) == 3
+        assert estado - 3 not in tabela.indices
+        assert tabela.remocoes == estado - 3
+    # a linha reaproveitada volta para o valor inicial antes de receber o novo valor
+    assert tabela.indices[10] == 0
+    assert tabela.estados == [10, 8, 9]
+    assert list(tabela.valores[:7]) == [1.0, 1.0, 10.0, 1.0, 1.0, 1.0, 1.0]
+    assert tabela.get((10, 0)) == 1.0
+    assert tabela.get((1, 0)) is None
+    assert tabela.estatisticas() == {
+        'estados': 3,
+        'bytes': tabela.bytes_usados(),
+        'consultas': 2,
+        'taxa_acerto': 0.5,
+        'remocoes': 7,
+    }
+
+
+def test_limitada_remove_a_primeira_linha_com_contador_zero():
+    tabela = TabelaQLimitada(7, capacidade=3)
+    for estado in range(1, 4):
+        tabela[(estado, 0)] = 0.0
+    # a primeira volta do ponteiro zera os contadores e a linha 0 sai
+    tabela[(4, 0)] = 0.0
+    assert 1 not in tabela.indices
+    assert list(tabela.contadores) == [1, 0, 0]
+    assert tabela.ponteiro == 1
+
+    tabela[(2, 1)] = 0.0
+    tabela[(2, 2)] = 0.0
+    tabela[(5, 0)] = 0.0
+    # a linha 1 foi atualizada e só perde uma chance; a linha 2 tinha o contador zerado
+    assert tabela.indices == {4: 0, 2: 1, 5: 2}
+    assert list(tabela.contadores) == [1, 1, 1]
+    assert tabela.remocoes == 2
+
+
+def test_limitada_remove_a_linha_so_com_valores_iniciais():
+    tabela = TabelaQLimitada(7, valor_inicial=0.5, capacidade=2)
+    tabela[(1, 0)] = 0.0
+    tabela[(1, 0)] = 0.0
+    # a linha 1 foi atualizada, mas só com o valor inicial, que é o que ela teria ao ser recriada
+    tabela.set_linha(2, [0.5] * 7)
+    tabela[(3, 0)] = 0.0
+    assert tabela.indices == {1: 0, 3: 1}
+    assert list(tabela.contadores) == [1, 1]
+    assert tabela.remocoes == 1
+
+
+def test_limitada_remove_a_linha_mais_velha_que_a_idade_maxima():
+    tabela = TabelaQLimitada(7, capacidade=2, idade_maxima=3)
+    for _ in range(5):
+        tabela[(1, 0)] = 0.0
+    for _ in range(5):
+        tabela[(2, 0)] = 0.0
+    # a linha 0 tem o contador alto, mas ficou 5 atualizações sem ser tocada
+    assert list(tabela.contadores) == [5, 5]
+    tabela[(3, 0)] = 0.0
+    assert tabela.indices == {3: 0, 2: 1}
+    assert list(tabela.contadores) == [1, 5]
+    assert tabela.remocoes == 1
+
+    sem_idade = TabelaQLimitada(7, capacidade=2)
+    for estado in (1, 2):
+        for _ in range(5):
+            sem_idade[(estado, 0)] = 0.0
+    sem_idade[(3, 0)] = 0.0
+    # sem idade máxima o ponteiro precisa dar voltas até zerar um contador
+    assert sem_idade.indices == {3: 0, 2: 1}
+    assert list(sem_idade.contadores) == [1, 0]
+
+
+def test_limitada_por_memoria_maxima():
+    referencia = TabelaQLimitada(7, capacidade=10)
+    for estado in range(1, 11):
+        referencia[(estado, 0)] = 0.0
+    limite = referencia.bytes_usados()
+
+    tabela = TabelaQLimitada(7, memoria_maxima=limite)
+    for estado in range(1, 51):
+        tabela[(estado, 0)] = 0.0
+    assert len(tabela.estados) == len(tabela.indices) == 10
+    assert tabela.remocoes == 40
+    assert all(estado in tabela.indices for estado in range(41, 51))
+
+# endregion